@@ -0,0 +1,232 @@
+"""
+Admission Control
+Per-dependency concurrency limits with bounded, prioritized wait queues.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from enum import Enum
+from typing import Dict, Any, Optional
+
+class Priority(Enum):
+    """Traffic lanes, served in declaration order."""
+    INTERACTIVE = "interactive"
+    BATCH = "batch"
+
+# Lane of the request currently being served, so nested dependency calls
+# inherit the priority of the /ask call that triggered them
+current_priority: ContextVar[Priority] = ContextVar("current_priority", default=Priority.INTERACTIVE)
+
+class AdmissionRejected(Exception):
+    """Raised when a dependency's wait queue is full or the wait timed out."""
+
+    def __init__(self, dependency: str, retry_after: int, reason: str = "queue full"):
+        super().__init__(f"{dependency} is overloaded ({reason}), retry after {retry_after}s")
+        self.dependency = dependency
+        self.retry_after = retry_after
+        self.reason = reason
+
+# Upper bounds (seconds) of the queue-time histogram buckets
+QUEUE_TIME_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class DependencyLimiter:
+    """Concurrency limiter for a single downstream dependency."""
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int,
+                 max_wait: float = 10.0, batch_queue_share: float = 0.5):
+        """Initialize the limiter.
+
+        Args:
+            name: Dependency name used in metrics and errors
+            max_concurrency: Calls allowed to run at the same time
+            max_queue: Calls allowed to wait for a slot across all lanes
+            max_wait: Seconds a call may wait before it is rejected
+            batch_queue_share: Fraction of the queue batch traffic may occupy
+        """
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.batch_queue_limit = max(1, int(max_queue * batch_queue_share)) if max_queue else 0
+        self.in_flight = 0
+        self._waiters = {priority: deque() for priority in Priority}
+
+        self.admitted = 0
+        self.rejected = 0
+        self.queue_time_total = 0.0
+        self.queue_time_max = 0.0
+        self.queue_time_buckets = [0] * (len(QUEUE_TIME_BUCKETS) + 1)
+        self.service_time_ewma = 1.0
+
+    @property
+    def queued(self) -> int:
+        """Number of calls currently waiting for a slot."""
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    def _lane_full(self, priority: Priority) -> bool:
+        if self.queued >= self.max_queue:
+            return True
+        if priority == Priority.BATCH:
+            return len(self._waiters[Priority.BATCH]) >= self.batch_queue_limit
+        return False
+
+    def retry_after(self) -> int:
+        """Estimate when a slot is likely to free up, in whole seconds."""
+        backlog = (self.queued + 1) / max(1, self.max_concurrency)
+        return max(1, math.ceil(backlog * self.service_time_ewma))
+
+    async def acquire(self, priority: Priority = Priority.INTERACTIVE) -> float:
+        """Wait for a slot.
+
+        Returns:
+            float: Seconds spent queued
+
+        Raises:
+            AdmissionRejected: If the lane is full or the wait exceeds max_wait
+        """
+        start = time.monotonic()
+        if self.in_flight < self.max_concurrency and not self.queued:
+            self.in_flight += 1
+            self._record_admit(0.0)
+            return 0.0
+
+        if self._lane_full(priority):
+            self.rejected += 1
+            raise AdmissionRejected(self.name, self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self._discard(priority, waiter)
+            self.rejected += 1
+            raise AdmissionRejected(self.name, self.retry_after(), reason="wait timed out")
+        except asyncio.CancelledError:
+            # The slot may already have been handed to us; pass it on
+            if not self._discard(priority, waiter) and waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+
+        waited = time.monotonic() - start
+        self._record_admit(waited)
+        return waited
+
+    def release(self, service_time: Optional[float] = None):
+        """Free a slot and hand it to the next waiter, interactive lane first."""
+        if service_time is not None:
+            self.service_time_ewma = 0.8 * self.service_time_ewma + 0.2 * service_time
+        for priority in Priority:
+            waiters = self._waiters[priority]
+            while waiters:
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    # Slot ownership transfers to the waiter; in_flight is unchanged
+                    waiter.set_result(None)
+                    return
+        self.in_flight -= 1
+
+    def _discard(self, priority: Priority, waiter: asyncio.Future) -> bool:
+        try:
+            self._waiters[priority].remove(waiter)
+            return True
+        except ValueError:
+            return False
+
+    def _record_admit(self, waited: float):
+        self.admitted += 1
+        self.queue_time_total += waited
+        self.queue_time_max = max(self.queue_time_max, waited)
+        for i, bound in enumerate(QUEUE_TIME_BUCKETS):
+            if waited <= bound:
+                self.queue_time_buckets[i] += 1
+                break
+        else:
+            self.queue_time_buckets[-1] += 1
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority = Priority.INTERACTIVE):
+        """Hold a slot for the duration of the block."""
+        await self.acquire(priority)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current limiter state and queue-time metrics."""
+        buckets = {f"le_{bound}": count for bound, count in zip(QUEUE_TIME_BUCKETS, self.queue_time_buckets)}
+        buckets["le_inf"] = self.queue_time_buckets[-1]
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": {priority.value: len(self._waiters[priority]) for priority in Priority},
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "queue_time_avg": self.queue_time_total / self.admitted if self.admitted else 0.0,
+            "queue_time_max": self.queue_time_max,
+            "queue_time_buckets": buckets,
+        }
+
+# Default (concurrency, queue) per dependency, overridable via
+# ADMISSION_<NAME>_CONCURRENCY and ADMISSION_<NAME>_QUEUE
+DEFAULT_LIMITS = {
+    "llm": (8, 32),
+    "weather_agent": (16, 64),
+    "wardrobe_agent": (8, 32),
+    "db": (10, 50),
+}
+
+class AdmissionController:
+    """Registry of limiters, one per downstream dependency."""
+
+    def __init__(self, limits: Dict[str, tuple] = None, max_wait: float = None):
+        """Initialize the controller.
+
+        Args:
+            limits: Mapping of dependency name to (max_concurrency, max_queue)
+            max_wait: Seconds a call may wait for a slot before rejection
+        """
+        limits = limits or DEFAULT_LIMITS
+        max_wait = max_wait if max_wait is not None else float(os.getenv('ADMISSION_MAX_WAIT', 10.0))
+        self.limiters = {}
+        for name, (concurrency, queue) in limits.items():
+            prefix = f"ADMISSION_{name.upper()}"
+            self.limiters[name] = DependencyLimiter(
+                name,
+                max_concurrency=int(os.getenv(f"{prefix}_CONCURRENCY", concurrency)),
+                max_queue=int(os.getenv(f"{prefix}_QUEUE", queue)),
+                max_wait=max_wait,
+            )
+
+    def limiter(self, dependency: str) -> DependencyLimiter:
+        """Get the limiter for a dependency."""
+        return self.limiters[dependency]
+
+    def slot(self, dependency: str, priority: Priority = None):
+        """Hold a slot on a dependency for the duration of an async block.
+
+        The priority defaults to the lane of the current request.
+        """
+        return self.limiters[dependency].slot(priority or current_priority.get())
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Metrics for every dependency."""
+        return {name: limiter.snapshot() for name, limiter in self.limiters.items()}
+
+# Global admission controller
+_admission_controller = None
+
+def get_admission_controller() -> AdmissionController:
+    """Get the global admission controller, creating it on first use."""
+    global _admission_controller
+    if _admission_controller is None:
+        _admission_controller = AdmissionController()
+    return _admission_controller
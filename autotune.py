@@ -0,0 +1,239 @@
+"""
+Model Autotuner
+Runs a fixed suite of agent prompts against every model a local backend can
+serve, measures prompt-eval and generation throughput, latency and memory,
+checks the answers, and writes the fastest passing model per agent to the
+autotune file that LLMConfig reads.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from llm_config import AUTOTUNE_FILE, LLMConfig, LLMProvider
+from local_llm_service import LocalLLMService
+from schemas import RecommendationRequest, WardrobeRecommendation, WeatherReading, parse_structured, temperature_band
+from utils.util import load_instruction_from_file
+
+LOCAL_PROVIDERS = (LLMProvider.OLLAMA, LLMProvider.VLLM, LLMProvider.LOCAL)
+
+INSTRUCTION_FILES = {
+    "weather_agent": "agent_instructions/weather_agent_instructions.txt",
+    "wardrobe_agent": "agent_instructions/wardrobe_agent_instructions.txt",
+}
+
+# Tool output the wardrobe cases recommend from, as list_wardrobe_items returns it
+WARDROBE_ITEMS = [
+    ("Bonobos", "Linen Shirt", "Light Blue", "Shirt", "Tops", "100% Linen", "Summer", "Casual"),
+    ("Bonobos", "Stretch Washed Chino Shorts", "Olive", "Shorts", "Bottoms", "98% Cotton, 2% Elastane", "Summer", "Casual"),
+    ("Cuts Clothing", "Classic Crew T-Shirt", "White", "T-Shirt", "Tops", "100% Premium Cotton", "All Season", "Essential"),
+    ("Cuts Clothing", "The Performance Short", "Black", "Shorts", "Bottoms", "Performance Stretch", "Summer", "Athletic"),
+    ("Bonobos", "Merino Wool Crewneck Sweater", "Forest Green", "Sweater", "Tops", "100% Merino Wool", "Fall/Winter", "Business Casual"),
+    ("Bonobos", "Wool Cashmere Overcoat", "Camel", "Coat", "Outerwear", "Wool Cashmere Blend", "Fall/Winter", "Business"),
+    ("Bonobos", "Corduroy Pants", "Burgundy", "Pants", "Bottoms", "100% Cotton Corduroy", "Fall/Winter", "Casual"),
+    ("Cole Haan", "Grandpro Tennis Sneaker", "White", "Sneakers", "Footwear", "Leather", "All Season", "Athletic"),
+    ("Cole Haan", "Zerogrand Wingtip Oxford", "Brown", "Dress Shoes", "Footwear", "Leather and Mesh", "All Season", "Business Casual"),
+]
+WARDROBE_COLUMNS = ("brand", "item_name", "color", "garment_type", "garment_category", "fabric", "season", "style")
+WARDROBE_TABLE = "\n".join("\t".join(row) for row in [WARDROBE_COLUMNS, *WARDROBE_ITEMS])
+
+class Case:
+    """One prompt of the suite and the check its answer must pass."""
+
+    def __init__(self, name: str, prompt: str, check: Callable[[str], Optional[str]]):
+        """Initialize the case.
+
+        Args:
+            name: Case name for reports
+            prompt: User prompt sent with the agent's instructions as system prompt
+            check: Returns why an answer is wrong, or None if it passes
+        """
+        self.name = name
+        self.prompt = prompt
+        self.check = check
+
+def _parse(model, text: str):
+    return parse_structured(model, [SimpleNamespace(text=text)])
+
+def weather_case(city: str, temperature: float, recorded_at: str) -> Case:
+    """Turn a weather_data row into a WeatherReading."""
+    prompt = (f"What is the weather in {city}?\n\nquery_database returned:\n"
+              f"name\ttemp\ttimestamp\n{city}\t{temperature}\t{recorded_at}")
+
+    def check(text: str) -> Optional[str]:
+        reading = _parse(WeatherReading, text)
+        if reading is None:
+            return "not a WeatherReading"
+        if reading.city.lower() != city.lower():
+            return f"city {reading.city!r}, expected {city!r}"
+        if abs(reading.temperature - temperature) > 0.05:
+            return f"temperature {reading.temperature}, expected {temperature}"
+        return None
+
+    return Case(f"weather:{city}", prompt, check)
+
+def wardrobe_case(city: str, temperature: float, style: str = None) -> Case:
+    """Recommend items for a reading from a fixed wardrobe."""
+    request = RecommendationRequest(reading=WeatherReading(city=city, temperature=temperature), style=style)
+    prompt = f"{request.model_dump_json()}\n\nlist_wardrobe_items returned:\n{WARDROBE_TABLE}"
+    expected_band = temperature_band(temperature)
+    styles = {row[1]: row[7] for row in WARDROBE_ITEMS}
+
+    def check(text: str) -> Optional[str]:
+        recommendation = _parse(WardrobeRecommendation, text)
+        if recommendation is None:
+            return "not a WardrobeRecommendation"
+        if recommendation.band != expected_band:
+            return f"band {recommendation.band.value}, expected {expected_band.value}"
+        if not recommendation.items:
+            return "no items"
+        invented = [item.item_name for item in recommendation.items if item.item_name not in styles]
+        if invented:
+            return f"items not in the wardrobe: {invented}"
+        if style and any(styles[item.item_name] != style for item in recommendation.items):
+            return f"items outside style {style!r}"
+        return None
+
+    return Case(f"wardrobe:{city}:{style or 'any'}", prompt, check)
+
+SUITE = {
+    "weather_agent": [
+        weather_case("Atlanta", 84.2, "2025-07-14T15:00:00+00:00"),
+        weather_case("Chicago", 38.5, "2025-01-09T12:30:00+00:00"),
+    ],
+    "wardrobe_agent": [
+        wardrobe_case("Atlanta", 84.2),
+        wardrobe_case("Chicago", 38.5),
+        wardrobe_case("Atlanta", 84.2, style="Casual"),
+    ],
+}
+
+def _percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))] if ordered else 0.0
+
+async def tune_model(service: LocalLLMService, agent: str, model: str, runs: int, max_tokens: int) -> Dict[str, Any]:
+    """Run an agent's suite against one model.
+
+    Returns:
+        dict: Pass rate, failures, latency percentiles, throughput and memory
+    """
+    system_prompt = load_instruction_from_file(INSTRUCTION_FILES[agent])
+    cases = SUITE[agent]
+    # Load the model before timing anything
+    await service.generate_profiled(cases[0].prompt, system_prompt, model, max_tokens)
+
+    latencies, failures = [], []
+    prompt_tokens = prompt_seconds = completion_tokens = generation_seconds = 0
+    for _ in range(runs):
+        for case in cases:
+            try:
+                profile = await service.generate_profiled(case.prompt, system_prompt, model, max_tokens)
+            except Exception as e:
+                failures.append(f"{case.name}: {e}")
+                continue
+            latencies.append(profile["latency"])
+            prompt_tokens += profile["prompt_tokens"]
+            prompt_seconds += profile["prompt_eval_seconds"]
+            completion_tokens += profile["completion_tokens"]
+            generation_seconds += profile["generation_seconds"]
+            failure = case.check(profile["text"])
+            if failure:
+                failures.append(f"{case.name}: {failure}")
+
+    total = runs * len(cases)
+    return {
+        "model": model,
+        "pass_rate": (total - len(failures)) / total,
+        "failures": failures[:10],
+        "latency_p50": _percentile(latencies, 0.5),
+        "latency_p95": _percentile(latencies, 0.95),
+        "prompt_tokens_per_second": prompt_tokens / prompt_seconds if prompt_seconds else None,
+        "generation_tokens_per_second": completion_tokens / generation_seconds if generation_seconds else None,
+        "memory_bytes": await service.model_memory(model),
+    }
+
+def pick(results: Iterable[Dict[str, Any]], min_pass_rate: float) -> Optional[Dict[str, Any]]:
+    """Fastest result (by median, then p95 latency) that passes the suite."""
+    passing = [result for result in results if result["pass_rate"] >= min_pass_rate]
+    return min(passing, key=lambda result: (result["latency_p50"], result["latency_p95"]), default=None)
+
+def write_config(path: str, provider: LLMProvider, picks: Dict[str, Dict[str, Any]]):
+    """Write the picked models, keeping other agents' entries for the same provider."""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (FileNotFoundError, ValueError):
+        data = {}
+    agents = data.get("agents", {}) if data.get("provider") == provider.value else {}
+    agents.update(picks)
+    with open(path, "w") as f:
+        json.dump({"provider": provider.value, "tuned_at": datetime.now(timezone.utc).isoformat(), "agents": agents},
+                  f, indent=2)
+        f.write("\n")
+
+async def main(argv: Iterable[str] = None):
+    parser = argparse.ArgumentParser(description="Pick the fastest passing local model per agent")
+    parser.add_argument("--provider", choices=[provider.value for provider in LOCAL_PROVIDERS],
+                        help="Local backend (default: detected from the environment)")
+    parser.add_argument("--base-url", help="Backend URL (default: the provider's configured URL)")
+    parser.add_argument("--models", help="Comma-separated models or tags (default: every model the backend lists)")
+    parser.add_argument("--agents", default=",".join(SUITE), help="Comma-separated agents to tune")
+    parser.add_argument("--runs", type=int, default=3, help="Repetitions of each agent's suite per model")
+    parser.add_argument("--max-tokens", type=int, default=512, help="Output token limit per prompt")
+    parser.add_argument("--min-pass-rate", type=float, default=1.0, help="Share of answers that must pass")
+    parser.add_argument("--output", default=AUTOTUNE_FILE, help="Autotune file read by LLMConfig")
+    parser.add_argument("--dry-run", action="store_true", help="Report without writing the autotune file")
+    args = parser.parse_args(argv)
+
+    config = LLMConfig(LLMProvider(args.provider)) if args.provider else LLMConfig()
+    if config.provider not in LOCAL_PROVIDERS:
+        parser.error(f"{config.provider.value} is not a local provider; pass --provider")
+    if args.base_url:
+        config.config["base_url"] = args.base_url
+    agents = [agent.strip() for agent in args.agents.split(",") if agent.strip()]
+    unknown = [agent for agent in agents if agent not in SUITE]
+    if unknown:
+        parser.error(f"No suite for {unknown}; choose from {list(SUITE)}")
+
+    service = LocalLLMService(config)
+    try:
+        models = [model.strip() for model in args.models.split(",")] if args.models else await service.available_models()
+        if not models:
+            parser.error(f"No models available at {service.base_url}")
+        report = {}
+        for agent in agents:
+            report[agent] = []
+            for model in models:
+                print(f"⏱️  {agent} on {model}...")
+                try:
+                    result = await tune_model(service, agent, model, args.runs, args.max_tokens)
+                except Exception as e:
+                    result = {"model": model, "pass_rate": 0.0, "failures": [str(e)],
+                              "latency_p50": 0.0, "latency_p95": 0.0}
+                report[agent].append(result)
+                print(f"   pass {result['pass_rate']:.0%}, p50 {result['latency_p50']:.2f}s, "
+                      f"p95 {result['latency_p95']:.2f}s")
+    finally:
+        await service.close()
+
+    picks = {}
+    for agent, results in report.items():
+        best = pick(results, args.min_pass_rate)
+        if best is None:
+            print(f"❌ {agent}: no model passed the suite")
+            continue
+        picks[agent] = best
+        print(f"✅ {agent}: {best['model']} (p50 {best['latency_p50']:.2f}s)")
+    print(json.dumps(report, indent=2))
+
+    if picks and not args.dry_run:
+        write_config(args.output, config.provider, picks)
+        print(f"💾 Wrote {args.output}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,146 @@
+"""
+Hot Path Benchmarks
+Micro-benchmarks for LLM configuration, instruction loading, local LLM
+generation per provider format, weather replica routing and streamed
+response assembly.
+
+Usage:
+    python -m benchmarks.bench_hot_paths            # compare against the baseline
+    python -m benchmarks.bench_hot_paths --save     # record a new baseline
+    python -m benchmarks.bench_hot_paths -k generate --threshold 0.1
+"""
+
+import asyncio
+import contextlib
+import socket
+from typing import List
+
+from aiohttp import web
+from google.adk.agents.base_agent import BaseAgent
+from google.adk.events.event import Event
+from google.genai import types
+
+from benchmarks.runner import Benchmark, main
+from city_resolver import CityResolver
+from llm_config import LLMConfig, LLMProvider
+from local_llm_service import LocalLLMService
+from utils.util import load_instruction_from_file
+from weather_shards import WeatherShardRouter
+
+INSTRUCTION_FILE = "agent_instructions/ptso_agent_instructions.txt"
+REPLY = "Wear a light jacket, chinos and sneakers."
+
+async def _ollama_generate(request: web.Request) -> web.Response:
+    await request.read()
+    return web.json_response({"model": "stub", "response": REPLY, "done": True})
+
+async def _chat_completions(request: web.Request) -> web.Response:
+    await request.read()
+    return web.json_response({"choices": [{"message": {"role": "assistant", "content": REPLY}}]})
+
+@contextlib.asynccontextmanager
+async def stub_llm_server():
+    """In-process Ollama and OpenAI-compatible endpoints on a free local port."""
+    app = web.Application()
+    app.router.add_post("/api/generate", _ollama_generate)
+    app.router.add_post("/v1/chat/completions", _chat_completions)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    await web.SockSite(runner, sock).start()
+    try:
+        yield f"http://127.0.0.1:{sock.getsockname()[1]}"
+    finally:
+        await runner.cleanup()
+
+def _event(text: str, partial: bool = False) -> Event:
+    """A model event carrying one text part."""
+    return Event(author="ptso_agent", partial=partial,
+                 content=types.Content(role="model", parts=[types.Part(text=text)]))
+
+class _FakeAgent(BaseAgent):
+    """Replays a fixed event stream, in place of the LLM agent behind the Runner."""
+
+    events: List[Event] = []
+
+    async def _run_async_impl(self, ctx):
+        for event in self.events:
+            yield event.model_copy(update={"invocation_id": ctx.invocation_id})
+
+def _fake_ptso_agent(events: List[Event]):
+    """A PTSOAgentA2A whose LLM agent is a fake event stream, without building any agents."""
+    # Imported here: ptso_agent_a2a needs the a2a package, which the other benchmarks do not
+    from admission import AdmissionController
+    from ptso_agent_a2a import PTSOAgentA2A
+    from session_store import build_call_runner
+
+    agent = PTSOAgentA2A.__new__(PTSOAgentA2A)
+    agent.admission = AdmissionController()
+    agent.workflow_routing = False
+    agent.city_resolver = CityResolver()
+    agent.city_resolver.add_city("Atlanta")
+    agent.ptso_agent = _FakeAgent(name="ptso_agent", events=events)
+    agent.ptso_runner = build_call_runner(agent.ptso_agent)
+    return agent
+
+def _streamed_events(chunks: int) -> List[Event]:
+    """Partial chunks followed by the final event that repeats them."""
+    words = [f"word{i} " for i in range(chunks)]
+    return [_event(word, partial=True) for word in words] + [_event("".join(words))]
+
+def _process_user_request(chunks: int):
+    """A streamed request through a fake PTSO agent, which is built on the first (warmup) call."""
+    agent = None
+
+    async def process():
+        nonlocal agent
+        if agent is None:
+            agent = _fake_ptso_agent(_streamed_events(chunks))
+        return await agent.process_user_request("What should I wear in Atlanta?")
+    return process
+
+@contextlib.asynccontextmanager
+async def build():
+    """Benchmarks, with the stub server and services they need."""
+    benchmarks = [
+        Benchmark("llm_config.construct_ollama", lambda: LLMConfig(LLMProvider.OLLAMA), number=20000),
+        Benchmark("llm_config.construct_detected", lambda: LLMConfig(), number=20000),
+    ]
+    for provider in (LLMProvider.GEMINI, LLMProvider.OLLAMA, LLMProvider.VLLM):
+        config = LLMConfig(provider)
+        benchmarks.append(Benchmark(f"llm_config.get_adk_config_{provider.value}", config.get_adk_config,
+                                    number=50000))
+    benchmarks.append(Benchmark("util.load_instruction_from_file",
+                                lambda: load_instruction_from_file(INSTRUCTION_FILE), number=5000))
+    router = WeatherShardRouter([f"http://weather-{i}:8001" for i in range(4)], lambda url, breaker: None)
+    benchmarks.append(Benchmark("weather_shards.route_4_replicas", lambda: router.route("Atlanta"), number=50000))
+
+    async with stub_llm_server() as base_url:
+        services = []
+        for provider in (LLMProvider.OLLAMA, LLMProvider.VLLM, LLMProvider.LOCAL):
+            service = LocalLLMService(LLMConfig(provider, base_url=base_url))
+            services.append(service)
+            batched = service.batcher
+            direct = LocalLLMService(LLMConfig(provider, base_url=base_url))
+            direct.batcher = None
+            services.append(direct)
+            benchmarks.append(Benchmark(f"local_llm.generate_{provider.value}",
+                                        lambda s=direct: s.generate("What should I wear?", "Be brief."),
+                                        number=200))
+            if batched is not None:
+                async def burst(s=service):
+                    await asyncio.gather(*(s.generate(f"Outfit {i}?") for i in range(16)))
+                benchmarks.append(Benchmark(f"local_llm.generate_{provider.value}_batched_x16", burst, number=20))
+
+        for chunks in (1, 50):
+            benchmarks.append(Benchmark(f"ptso.process_user_request_{chunks}_partials",
+                                        _process_user_request(chunks), number=2000))
+        try:
+            yield benchmarks
+        finally:
+            for service in services:
+                await service.close()
+
+if __name__ == "__main__":
+    main(build)
@@ -0,0 +1,158 @@
+"""
+Benchmark Runner
+Times sync and async callables, stores results as JSON baselines and fails a
+run when a benchmark regresses past a threshold.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import inspect
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+DEFAULT_BASELINE = os.path.join(BASELINE_DIR, "baseline.json")
+
+class Benchmark:
+    """A callable timed `number` times per sample, for `repeat` samples."""
+
+    def __init__(self, name: str, fn: Callable[[], Any], number: int = 1000, repeat: int = 7,
+                 warmup: int = 1):
+        self.name = name
+        self.fn = fn
+        self.number = number
+        self.repeat = repeat
+        self.warmup = warmup
+
+    async def _sample(self) -> float:
+        fn, number = self.fn, self.number
+        start = time.perf_counter()
+        for _ in range(number):
+            result = fn()
+            # Covers async functions and lambdas or partials that return a coroutine
+            if inspect.isawaitable(result):
+                await result
+        return (time.perf_counter() - start) / number
+
+    async def run(self) -> Dict[str, Any]:
+        """Time the benchmark and return per-call statistics in seconds."""
+        # Benchmarked code may print; keep the report readable
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            for _ in range(self.warmup):
+                await self._sample()
+            samples = [await self._sample() for _ in range(self.repeat)]
+        return {
+            "median": statistics.median(samples),
+            "min": min(samples),
+            "mean": statistics.fmean(samples),
+            "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+            "number": self.number,
+            "repeat": self.repeat,
+        }
+
+def environment() -> Dict[str, str]:
+    """Where the results were measured; baselines only compare on like machines."""
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+    }
+
+def load_baseline(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def save_baseline(path: str, results: Dict[str, Dict[str, Any]]):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Benchmarks whose median is more than `threshold` slower than the baseline."""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            continue
+        ratio = result["median"] / previous["median"] if previous["median"] else float("inf")
+        if ratio > 1 + threshold:
+            regressions.append({"name": name, "baseline": previous["median"], "current": result["median"],
+                                "ratio": ratio})
+    return regressions
+
+def _format(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:8.2f} {unit}"
+    return f"{seconds / 1e-9:8.1f} ns"
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the hot-path micro-benchmarks")
+    parser.add_argument("-k", "--filter", default="", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--save", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=float(os.getenv('BENCHMARK_THRESHOLD', 0.25)),
+                        help="Allowed slowdown against the baseline median (0.25 = 25%%)")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    return parser.parse_args(argv)
+
+async def run(benchmarks: List[Benchmark], args: argparse.Namespace) -> int:
+    """Run benchmarks, report them against the baseline and return an exit code."""
+    baseline = load_baseline(args.baseline)
+    if baseline is not None and baseline.get("environment") != environment():
+        print(f"⚠️  Baseline was recorded on {baseline.get('environment')}, comparing anyway")
+
+    results = {}
+    for benchmark in benchmarks:
+        if args.filter not in benchmark.name:
+            continue
+        result = results[benchmark.name] = await benchmark.run()
+        previous = (baseline or {}).get("results", {}).get(benchmark.name)
+        change = f"{(result['median'] / previous['median'] - 1) * 100:+6.1f}%" if previous else "   new"
+        print(f"{benchmark.name:<48} {_format(result['median'])}  ±{_format(result['stdev'])}  {change}")
+
+    if args.output:
+        save_baseline(args.output, results)
+    if args.save:
+        merged = dict((baseline or {}).get("results", {}), **results)
+        save_baseline(args.baseline, merged)
+        print(f"💾 Saved baseline to {args.baseline}")
+        return 0
+    if baseline is None:
+        print("No baseline found; run with --save to record one")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"❌ {regression['name']} regressed {regression['ratio']:.2f}x "
+              f"({_format(regression['baseline']).strip()} -> {_format(regression['current']).strip()})")
+    if regressions:
+        return 1
+    print(f"✅ No regressions beyond {args.threshold:.0%}")
+    return 0
+
+def main(build: Callable[[], Any], argv: List[str] = None):
+    """Entry point for a benchmark module.
+
+    Args:
+        build: Async context manager factory yielding the list of benchmarks
+        argv: Command line arguments
+    """
+    args = parse_args(argv)
+
+    async def run_all() -> int:
+        async with build() as benchmarks:
+            return await run(benchmarks, args)
+
+    sys.exit(asyncio.run(run_all()))
@@ -0,0 +1,247 @@
+"""
+City Resolver
+Resolves free-text city references ("ATL", "atlanta, ga", "Atlnta") to the
+canonical weather_data.name before any LLM call.
+"""
+
+import asyncio
+import os
+import re
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+import db
+
+_WORD = re.compile(r"[a-z0-9]+(?:['.-][a-z0-9]+)*")
+_TOKEN = re.compile(r"[A-Za-z0-9]+")
+# Aliases this short ("LA", "DC") are also ordinary words, so in free text they must match case-sensitively
+SHORT_ALIAS_LENGTH = 2
+
+# Words that never start or end a city reference
+_STOPWORDS = frozenset(
+    "a about am an and at for from going how i im in is it like me my near of on outfit "
+    "should the to today tomorrow trip visit wear what whats weather will with".split()
+)
+
+def normalize(text: str) -> str:
+    """Lower-case and collapse punctuation and whitespace."""
+    return " ".join(_WORD.findall(text.lower().replace(".", "")))
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance between two strings."""
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+def trigrams(text: str) -> Set[str]:
+    """Padded character trigrams of a normalized string."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class CityResolver:
+    """Exact, alias and trigram-fuzzy lookup of canonical city names.
+
+    Exact and alias matches are dict lookups over the word windows of the
+    input. Otherwise candidate cities sharing trigrams with a window are
+    scored by Jaccard similarity, and a fuzzy match must also have the
+    city's word count and be within a few typos of it, so a longer unknown
+    name ("Atlantic City") does not resolve to a similar one ("Atlanta").
+    Input naming more than one city resolves
+    to None and is left to the LLM. The index grows incrementally as new
+    cities appear in weather_data.
+    """
+
+    def __init__(self, threshold: float = None, refresh_interval: float = None, max_words: int = 3):
+        """Initialize the resolver.
+
+        Args:
+            threshold: Minimum trigram similarity for a fuzzy match
+            refresh_interval: Seconds between weather_data refreshes
+            max_words: Longest city name, in words, considered in free text
+        """
+        self.threshold = threshold or float(os.getenv('CITY_MATCH_THRESHOLD', 0.4))
+        self.refresh_interval = refresh_interval or float(os.getenv('CITY_RESOLVER_REFRESH_INTERVAL', 60))
+        self.max_words = max_words
+        self.cities: Dict[str, str] = {}
+        self.aliases: Dict[str, str] = {}
+        self.short_aliases: Dict[str, str] = {}
+        self.index: Dict[str, Set[str]] = {}
+        self.city_trigrams: Dict[str, int] = {}
+        self.last_seen: Optional[datetime] = None
+        self.stats = Counter()
+        self.total_time = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def add_city(self, name: str):
+        """Add a canonical city to the index."""
+        key = normalize(name)
+        if not key or key in self.cities:
+            return
+        self.cities[key] = name
+        grams = trigrams(key)
+        self.city_trigrams[key] = len(grams)
+        for gram in grams:
+            self.index.setdefault(gram, set()).add(key)
+
+    def add_alias(self, alias: str, city: str):
+        """Map an alias (abbreviation, airport code, nickname) to a canonical city."""
+        key = normalize(alias)
+        if not key:
+            return
+        if len(key) <= SHORT_ALIAS_LENGTH:
+            self.short_aliases["".join(_TOKEN.findall(alias))] = city
+        else:
+            self.aliases[key] = city
+
+    def _windows(self, words: List[str]):
+        """Word windows of the input as (start, end, text), longest first."""
+        for size in range(min(self.max_words, len(words)), 0, -1):
+            for start in range(len(words) - size + 1):
+                yield start, start + size, " ".join(words[start:start + size])
+
+    @staticmethod
+    def _close_enough(window: str, key: str) -> bool:
+        """Whether a window reads as a misspelling of a city rather than another name."""
+        if window.count(" ") != key.count(" "):
+            return False
+        # About one typo per four letters
+        return edit_distance(window, key) <= max(1, len(key) // 4)
+
+    def _fuzzy(self, text: str) -> Tuple[Optional[str], float]:
+        grams = trigrams(text)
+        shared = Counter()
+        for gram in grams:
+            for key in self.index.get(gram, ()):
+                shared[key] += 1
+        best, best_score = None, 0.0
+        for key, count in shared.items():
+            score = count / (len(grams) + self.city_trigrams[key] - count)
+            if score > best_score and score >= self.threshold and self._close_enough(text, key):
+                best, best_score = key, score
+        return best, best_score
+
+    def resolve(self, text: str) -> Optional[str]:
+        """Resolve free text to a canonical city name.
+
+        Args:
+            text: A city reference or a whole user message
+
+        Returns:
+            str: Canonical city name, or None if nothing matches
+        """
+        start = time.perf_counter()
+        try:
+            normalized = normalize(text)
+            words = normalized.split()
+            windows = list(self._windows(words))
+            # Canonical city -> how it matched; a longer match claims its words
+            found: Dict[str, str] = {}
+            claimed: List[Tuple[int, int]] = []
+            for first, last, window in windows:
+                if any(first < end and begin < last for begin, end in claimed):
+                    continue
+                if window in self.cities:
+                    found.setdefault(self.cities[window], "exact")
+                elif window in self.aliases:
+                    found.setdefault(self.aliases[window], "alias")
+                else:
+                    continue
+                claimed.append((first, last))
+            for token in _TOKEN.findall(text):
+                if token in self.short_aliases:
+                    found.setdefault(self.short_aliases[token], "alias")
+            if not found:
+                # An input that is nothing but a short alias cannot be an ordinary word
+                compact = normalized.replace(" ", "")
+                for alias, city in self.short_aliases.items():
+                    if alias.lower() == compact:
+                        found[city] = "alias"
+            if not found:
+                candidates = []
+                for first, last, window in windows:
+                    if len(window) < 4 or words[first] in _STOPWORDS or words[last - 1] in _STOPWORDS:
+                        continue
+                    key, score = self._fuzzy(window)
+                    if key is not None:
+                        candidates.append((score, first, last, key))
+                for score, first, last, key in sorted(candidates, reverse=True):
+                    if not any(first < end and begin < last for begin, end in claimed):
+                        found.setdefault(self.cities[key], "fuzzy")
+                        claimed.append((first, last))
+            if len(found) > 1:
+                self.stats["ambiguous"] += 1
+                return None
+            if not found:
+                self.stats["miss"] += 1
+                return None
+            city, kind = next(iter(found.items()))
+            self.stats[kind] += 1
+            return city
+        finally:
+            self.total_time += time.perf_counter() - start
+
+    async def refresh(self):
+        """Index cities ingested since the last refresh and reload aliases."""
+        if self.last_seen is None:
+            rows = await db.fetch("SELECT name, MAX(timestamp) AS seen FROM weather_data GROUP BY name")
+        else:
+            rows = await db.fetch(
+                "SELECT name, MAX(timestamp) AS seen FROM weather_data WHERE timestamp > $1 GROUP BY name",
+                self.last_seen
+            )
+        for row in rows:
+            self.add_city(row["name"])
+            if row["seen"] is not None and (self.last_seen is None or row["seen"] > self.last_seen):
+                self.last_seen = row["seen"]
+        for row in await db.fetch("SELECT alias, city FROM city_aliases"):
+            self.add_alias(row["alias"], row["city"])
+
+    async def run(self):
+        """Refresh the index forever."""
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"City resolver refresh error: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        """Start the refresh loop as a background task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Stop the background task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> Dict[str, object]:
+        """Index size and resolution outcomes."""
+        lookups = sum(self.stats.values())
+        return {
+            "cities": len(self.cities),
+            "aliases": len(self.aliases) + len(self.short_aliases),
+            "resolutions": dict(self.stats),
+            "mean_resolve_us": self.total_time / lookups * 1e6 if lookups else 0.0
+        }
+
+# Global city resolver
+_city_resolver = None
+
+def get_city_resolver() -> CityResolver:
+    """Get the global city resolver, creating it on first use."""
+    global _city_resolver
+    if _city_resolver is None:
+        _city_resolver = CityResolver()
+    return _city_resolver
@@ -0,0 +1,286 @@
+"""
+Database Tools
+Read-only SQL and wardrobe catalog tools for the weather and wardrobe agents.
+Every statement the LLM writes is recorded in the SQL workload with its
+latency, and wardrobe access is scoped to the requesting user.
+
+Results are kept small before they reach the model context: each agent only
+sees the columns of its projection profile, rows come back in pages of a
+capped size behind an opaque cursor, and pages are encoded as TSV rather than
+a list of JSON objects. Every call reports the tokens it saved. Pages of
+agent-written queries are served from the query cache until a table they
+read changes.
+"""
+
+import base64
+import bisect
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from google.adk.tools.tool_context import ToolContext
+
+import db
+from admission import get_admission_controller
+from query_cache import get_query_cache
+from sql_workload import get_sql_workload
+from tenancy import current_tenant, enter_tenant_scope, scope_sql
+from tenant_catalog import get_tenant_catalog_cache
+from tokens import count_tokens
+
+MAX_ROWS = int(os.getenv('DB_TOOL_MAX_ROWS', 200))
+PAGE_SIZE = int(os.getenv('DB_TOOL_PAGE_SIZE', 50))
+MAX_TOKENS = int(os.getenv('DB_TOOL_MAX_TOKENS', 2000))
+STATEMENT_TIMEOUT_MS = int(os.getenv('DB_TOOL_STATEMENT_TIMEOUT_MS', 5000))
+
+# Columns of the tables the agents query
+RELATION_COLUMNS = {
+    "wardrobe": (
+        "id", "user_id", "brand", "item_name", "color", "garment_type", "garment_category", "fabric",
+        "size", "price", "purchase_date", "season", "style", "care_instructions", "created_at"
+    ),
+    "weather_data": ("id", "name", "temp", "timestamp"),
+}
+
+# Columns each agent may see per table. Other columns of these tables are
+# dropped from results, even when the query names them or uses SELECT *.
+# This only trims tokens and is best effort, not access control: an alias
+# or expression (SELECT care_instructions AS notes) still returns the data.
+PROJECTION_PROFILES = {
+    "wardrobe_agent": {
+        "wardrobe": ("id", "brand", "item_name", "color", "garment_type", "garment_category", "fabric",
+                     "size", "price", "season", "style"),
+        "weather_data": ("name", "temp", "timestamp"),
+    },
+    "weather_agent": {
+        "wardrobe": ("id", "brand", "item_name", "color", "garment_type", "garment_category", "season", "style"),
+        "weather_data": ("name", "temp", "timestamp"),
+    },
+}
+DEFAULT_PROFILE = "wardrobe_agent"
+
+_usage = Counter()
+
+def hidden_columns(agent_name: Optional[str]) -> Set[str]:
+    """Column names outside an agent's projection profile.
+
+    A name is only hidden if no table in the profile exposes it, since result
+    columns cannot be traced back to their table.
+    """
+    profile = PROJECTION_PROFILES.get(agent_name, PROJECTION_PROFILES[DEFAULT_PROFILE])
+    visible = {column for columns in profile.values() for column in columns}
+    return {column for columns in RELATION_COLUMNS.values() for column in columns} - visible
+
+def _quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def _tsv_value(value: Any) -> str:
+    if value is None:
+        return "\\N"
+    return str(db.json_value(value)).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+def _cursor_key(*parts: Any) -> str:
+    return hashlib.sha1(json.dumps(parts, default=str).encode()).hexdigest()[:12]
+
+def encode_cursor(key: str, position: Any) -> str:
+    """Opaque cursor for the page after `position` of the query identified by `key`."""
+    return base64.urlsafe_b64encode(json.dumps({"q": key, "p": position}).encode()).decode()
+
+def decode_cursor(cursor: str, key: str) -> Any:
+    """Position stored in a cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed or belongs to another query
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        position = data["p"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if data.get("q") != key:
+        raise ValueError("Cursor does not belong to this query; repeat the query that returned it")
+    return position
+
+def encode_page(columns: Sequence[str], rows: Sequence[Sequence[Any]],
+                verbose_rows: Sequence[Dict[str, Any]]) -> Tuple[Dict[str, Any], int]:
+    """Encode rows as a TSV table within the token budget.
+
+    NULL is written as \\N, and tabs, newlines and backslashes are escaped.
+
+    Args:
+        columns: Column names
+        rows: Row values in column order
+        verbose_rows: The same rows as the JSON objects a plain query would
+            have returned, to measure the tokens saved
+
+    Returns:
+        (result, emitted): Tool result fields and the number of rows that fit
+    """
+    header = "\t".join(columns)
+    lines = [header]
+    budget = MAX_TOKENS - count_tokens(header)
+    for row in rows:
+        line = "\t".join(_tsv_value(value) for value in row)
+        cost = count_tokens(line) + 1
+        # Always return at least one row so pagination makes progress
+        if len(lines) > 1 and cost > budget:
+            break
+        lines.append(line)
+        budget -= cost
+    emitted = len(lines) - 1
+    table = "\n".join(lines)
+    tokens = count_tokens(table)
+    saved = max(0, count_tokens(json.dumps(list(verbose_rows[:emitted]), default=str)) - tokens)
+    _usage["calls"] += 1
+    _usage["rows"] += emitted
+    _usage["tokens"] += tokens
+    _usage["tokens_saved"] += saved
+    return {"table": table, "row_count": emitted, "tokens": tokens, "tokens_saved": saved}, emitted
+
+def usage_snapshot() -> Dict[str, int]:
+    """Rows and tokens returned by the tools, and tokens saved."""
+    return dict(_usage)
+
+def _page_size(page_size: Optional[int]) -> int:
+    return max(1, min(page_size or PAGE_SIZE, MAX_ROWS))
+
+async def _fetch_page(scoped: str, args: List[Any], tenant: str, hidden: Set[str], limit: int, offset: int,
+                      cache_key: Any) -> Tuple[List[str], List[str], List[tuple]]:
+    """Read one page of a query as the tenant and cache it.
+
+    Returns:
+        (columns, dropped, rows): Visible column names, hidden column names
+            the query returned, and the page's rows
+    """
+    cache = get_query_cache()
+    generation = cache.generation()
+    pool = await db.get_db_pool()
+    start = time.monotonic()
+    rows = []
+    try:
+        async with get_admission_controller().slot("db"):
+            async with pool.acquire() as conn:
+                async with conn.transaction(readonly=True):
+                    await conn.execute(f"SET LOCAL statement_timeout = {STATEMENT_TIMEOUT_MS}")
+                    await enter_tenant_scope(conn, tenant)
+                    names = [attribute.name for attribute in (await conn.prepare(scoped)).get_attributes()]
+                    keep = [i for i, name in enumerate(names) if name not in hidden]
+                    dropped = [name for name in names if name in hidden]
+                    columns = [names[i] for i in keep]
+                    # Project inside Postgres so hidden columns are never read or sent;
+                    # duplicate names cannot be selected by name, so those are dropped here
+                    unique = len(set(names)) == len(names)
+                    select = ", ".join(_quote_ident(name) for name in columns) if unique and dropped else "*"
+                    # The newline ends a trailing -- comment before it can swallow the closing paren
+                    paged = (f"SELECT {select} FROM ({scoped.rstrip().rstrip(';')}\n) AS page "
+                             f"LIMIT ${len(args) + 1} OFFSET ${len(args) + 2}")
+                    records = await conn.fetch(paged, *args, limit, offset)
+                    rows = [tuple(record[i] for i in keep) if dropped and not unique else tuple(record)
+                            for record in records]
+                    tables = await cache.relations(conn, scoped, args)
+    except Exception:
+        get_sql_workload().record(scoped, time.monotonic() - start, 0, True, source="query_database", args=args)
+        raise
+    # The tenant-scoped statement references $1, so its arguments are kept for the index advisor
+    get_sql_workload().record(scoped, time.monotonic() - start, len(rows), False, source="query_database",
+                              args=args)
+    cache.put(cache_key, (columns, dropped, rows), tables, generation)
+    return columns, dropped, rows
+
+async def query_database(sql: str, cursor: str = None, page_size: int = None,
+                         tool_context: ToolContext = None) -> Dict[str, Any]:
+    """Run a read-only SQL query against the PTSO Postgres database.
+
+    Wardrobe tables only return the current user's items. Results come back
+    one page at a time as a TSV "table" whose first line holds the column
+    names; \\N stands for NULL.
+
+    Args:
+        sql: A single SELECT (or WITH ... SELECT) statement.
+        cursor: The "next_cursor" of a previous call, to fetch the following page of the same query.
+        page_size: Rows per page (default 50).
+
+    Returns:
+        dict: "table", "row_count", "next_cursor" (null on the last page), "dropped_columns",
+            "tokens" and "tokens_saved", or "error" if the query failed.
+    """
+    if not sql.lstrip().lower().startswith(("select", "with")):
+        return {"error": "Only SELECT queries are allowed"}
+    tenant = current_tenant.get()
+    key = _cursor_key(sql.strip(), tenant)
+    try:
+        offset = int(decode_cursor(cursor, key)) if cursor else 0
+    except ValueError as e:
+        return {"error": str(e)}
+    scoped, args = scope_sql(sql, tenant)
+    limit = _page_size(page_size)
+    hidden = hidden_columns(tool_context.agent_name if tool_context is not None else None)
+
+    cache = get_query_cache()
+    # Row-level security makes results tenant-specific even when the SQL does not name a tenant table
+    cache_key = cache.key(scoped, (tenant, *args, limit + 1, offset, *sorted(hidden)))
+    cached = cache.get(cache_key)
+    if cached is not None:
+        columns, dropped, rows = cached
+    else:
+        try:
+            columns, dropped, rows = await _fetch_page(scoped, args, tenant, hidden, limit + 1, offset, cache_key)
+        except Exception as e:
+            return {"error": str(e)}
+    page = rows[:limit]
+    result, emitted = encode_page(columns, page,
+                                  [dict(zip(columns, map(db.json_value, row))) for row in page])
+    more = emitted < len(page) or len(rows) > limit
+    result["next_cursor"] = encode_cursor(key, offset + emitted) if more else None
+    result["dropped_columns"] = dropped
+    return result
+
+async def list_wardrobe_items(style: str = None, season: str = None, garment_category: str = None,
+                              garment_type: str = None, cursor: str = None, page_size: int = None,
+                              tool_context: ToolContext = None) -> Dict[str, Any]:
+    """List the current user's wardrobe items, optionally filtered.
+
+    Items come back one page at a time as a TSV "table" whose first line holds
+    the column names; \\N stands for NULL.
+
+    Args:
+        style: Only items of this style (e.g. "Casual", "Business Casual").
+        season: Only items for this season ("All Season", "Summer", "Fall/Winter", "Spring").
+        garment_category: Only items in this category ("Tops", "Bottoms", "Footwear", "Outerwear", "Accessories").
+        garment_type: Only items of this type (e.g. "T-Shirt", "Jacket", "Sneakers").
+        cursor: The "next_cursor" of a previous call with the same filters, to fetch the following page.
+        page_size: Items per page (default 50).
+
+    Returns:
+        dict: "table", "row_count", "count" (all matching items), "next_cursor" (null on the last page),
+            "tokens" and "tokens_saved", or "error" for an invalid filter or cursor.
+    """
+    filters = {"style": style or None, "season": season or None,
+               "garment_category": garment_category or None, "garment_type": garment_type or None}
+    tenant = current_tenant.get()
+    key = _cursor_key(filters, tenant)
+    catalog = await get_tenant_catalog_cache().get(tenant)
+    try:
+        after = int(decode_cursor(cursor, key)) if cursor else None
+        mask = catalog.mask(**filters)
+    except ValueError as e:
+        return {"error": str(e)}
+    count = mask.bit_count()
+    if after is not None:
+        # Keyset pagination on id: rows are in id order, so skip every row up to the last id seen
+        mask &= ~((1 << bisect.bisect_right(catalog.ids, after)) - 1)
+
+    limit = _page_size(page_size)
+    hidden = hidden_columns(tool_context.agent_name if tool_context is not None else None)
+    items = [catalog.item(row) for row in catalog.rows(mask, limit + 1)]
+    page = items[:limit]
+    verbose = [item.to_dict() for item in page]
+    columns = [name for name in verbose[0] if name not in hidden] if verbose else []
+    result, emitted = encode_page(columns, [[row[name] for name in columns] for row in verbose], verbose)
+    more = emitted < len(page) or len(items) > limit
+    result["count"] = count
+    result["next_cursor"] = encode_cursor(key, page[emitted - 1].id) if more and emitted else None
+    return result
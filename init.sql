@@ -11,6 +11,74 @@ CREATE INDEX IF NOT EXISTS idx_weather_data_id ON weather_data(id);
 CREATE INDEX IF NOT EXISTS idx_weather_data_name ON weather_data(name);
 CREATE INDEX IF NOT EXISTS idx_weather_data_timestamp ON weather_data(timestamp);
 
+-- Aliases (abbreviations, airport codes, nicknames) resolved to weather_data.name
+CREATE TABLE IF NOT EXISTS city_aliases (
+    alias VARCHAR(255) PRIMARY KEY,
+    city VARCHAR(255) NOT NULL
+);
+
+INSERT INTO city_aliases (alias, city) VALUES
+('ATL', 'Atlanta'),
+('Hotlanta', 'Atlanta'),
+('The A', 'Atlanta'),
+('NYC', 'New York'),
+('New York City', 'New York'),
+('LA', 'Los Angeles'),
+('LAX', 'Los Angeles'),
+('SF', 'San Francisco'),
+('SFO', 'San Francisco'),
+('Chi-Town', 'Chicago'),
+('ORD', 'Chicago'),
+('DC', 'Washington'),
+('Philly', 'Philadelphia'),
+('Nola', 'New Orleans')
+ON CONFLICT (alias) DO NOTHING;
+
+-- Recommendations precomputed by the PTSO service when a city changes temperature band
+CREATE TABLE IF NOT EXISTS precomputed_recommendations (
+    city VARCHAR(255) NOT NULL,
+    style VARCHAR(50) NOT NULL DEFAULT '',
+    band VARCHAR(10) NOT NULL,
+    payload JSONB NOT NULL,
+    computed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (city, style)
+);
+
+-- ADK sessions of the agent services. State and events are compact JSON,
+-- zlib-compressed above a size threshold (see session_store.py).
+CREATE TABLE IF NOT EXISTS adk_sessions (
+    app_name VARCHAR(128) NOT NULL,
+    user_id VARCHAR(128) NOT NULL,
+    id VARCHAR(128) NOT NULL,
+    state BYTEA NOT NULL,
+    create_time TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    update_time DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY (app_name, user_id, id)
+);
+
+CREATE TABLE IF NOT EXISTS adk_session_events (
+    seq BIGSERIAL,
+    app_name VARCHAR(128) NOT NULL,
+    user_id VARCHAR(128) NOT NULL,
+    session_id VARCHAR(128) NOT NULL,
+    id VARCHAR(128) NOT NULL,
+    timestamp DOUBLE PRECISION NOT NULL,
+    event BYTEA NOT NULL,
+    PRIMARY KEY (app_name, user_id, session_id, id),
+    FOREIGN KEY (app_name, user_id, session_id) REFERENCES adk_sessions (app_name, user_id, id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_adk_session_events_order ON adk_session_events(app_name, user_id, session_id, timestamp, seq);
+
+-- app: and user: scoped session state, one row per key; user_id is '' for app state
+CREATE TABLE IF NOT EXISTS adk_scoped_state (
+    app_name VARCHAR(128) NOT NULL,
+    user_id VARCHAR(128) NOT NULL,
+    key VARCHAR(255) NOT NULL,
+    value BYTEA NOT NULL,
+    PRIMARY KEY (app_name, user_id, key)
+);
+
 -- Create ENUM types for season and style
 CREATE TYPE season_type AS ENUM ('All Season', 'Summer', 'Fall/Winter', 'Spring');
 CREATE TYPE style_type AS ENUM ('Casual', 'Formal', 'Athletic', 'Business', 'Business Casual', 'Essential', 'Streetwear');
@@ -28,6 +96,7 @@ CREATE TYPE garment_category_enum AS ENUM (
 -- Create wardrobe table
 CREATE TABLE IF NOT EXISTS wardrobe (
     id SERIAL PRIMARY KEY,
+    user_id VARCHAR(64) NOT NULL DEFAULT 'default',
     brand VARCHAR(100) NOT NULL,
     item_name VARCHAR(255) NOT NULL,
     color VARCHAR(100) NOT NULL,
@@ -43,11 +112,13 @@ CREATE TABLE IF NOT EXISTS wardrobe (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
--- Create indexes for better query performance
-CREATE INDEX IF NOT EXISTS idx_wardrobe_brand ON wardrobe(brand);
-CREATE INDEX IF NOT EXISTS idx_wardrobe_garment_category ON wardrobe(garment_category);
-CREATE INDEX IF NOT EXISTS idx_wardrobe_style ON wardrobe(style);
-CREATE INDEX IF NOT EXISTS idx_wardrobe_season ON wardrobe(season);
+-- Every wardrobe query is scoped to one owner, so indexes lead with user_id
+-- and per-request cost stays flat as tenants and items grow
+CREATE INDEX IF NOT EXISTS idx_wardrobe_user_id ON wardrobe(user_id, id);
+CREATE INDEX IF NOT EXISTS idx_wardrobe_user_brand ON wardrobe(user_id, brand);
+CREATE INDEX IF NOT EXISTS idx_wardrobe_user_garment_category ON wardrobe(user_id, garment_category);
+CREATE INDEX IF NOT EXISTS idx_wardrobe_user_style ON wardrobe(user_id, style);
+CREATE INDEX IF NOT EXISTS idx_wardrobe_user_season ON wardrobe(user_id, season);
 
 -- Insert initial wardrobe data
 INSERT INTO wardrobe (
@@ -108,25 +179,63 @@ INSERT INTO wardrobe (
 ('DressCode', 'Future of Health Hoodie', 'Black', 'Hoodie', 'Tops', 'Premium Cotton Blend', 'L', 80.00, '2024-03-15', 'Fall/Winter', 'Streetwear', 'Machine wash cold');
 
 -- Create helpful views for common queries
-CREATE OR REPLACE VIEW seasonal_items AS
-SELECT brand, item_name, color, garment_type, season, price
+-- Views check row-level security as the querying role, not as their owner
+CREATE OR REPLACE VIEW seasonal_items WITH (security_invoker = true) AS
+SELECT user_id, brand, item_name, color, garment_type, season, price
 FROM wardrobe
-ORDER BY season, garment_category;
+ORDER BY user_id, season, garment_category;
 
-CREATE OR REPLACE VIEW wardrobe_by_brand AS
-SELECT brand, COUNT(*) as item_count, SUM(price) as total_value
+CREATE OR REPLACE VIEW wardrobe_by_brand WITH (security_invoker = true) AS
+SELECT user_id, brand, COUNT(*) as item_count, SUM(price) as total_value
 FROM wardrobe
-GROUP BY brand
-ORDER BY item_count DESC;
+GROUP BY user_id, brand
+ORDER BY user_id, item_count DESC;
 
-CREATE OR REPLACE VIEW wardrobe_by_category AS
-SELECT garment_category, COUNT(*) as item_count, SUM(price) as total_value
+CREATE OR REPLACE VIEW wardrobe_by_category WITH (security_invoker = true) AS
+SELECT user_id, garment_category, COUNT(*) as item_count, SUM(price) as total_value
 FROM wardrobe
-GROUP BY garment_category
-ORDER BY item_count DESC;
+GROUP BY user_id, garment_category
+ORDER BY user_id, item_count DESC;
 
 -- Add some helpful comments for future reference
 COMMENT ON TABLE wardrobe IS 'Main wardrobe inventory table containing all clothing items';
+COMMENT ON COLUMN wardrobe.user_id IS 'Owner of the item; the seeded catalog belongs to the default tenant';
 COMMENT ON COLUMN wardrobe.garment_category IS 'High-level category: Tops, Bottoms, Footwear, Outerwear, Accessories';
 COMMENT ON COLUMN wardrobe.style IS 'Style classification: Casual, Formal, Athletic, Business, Essential, etc';
-COMMENT ON COLUMN wardrobe.season IS 'Seasonal availability: All Season, Summer, Fall/Winter, etc'; 
\ No newline at end of file
+COMMENT ON COLUMN wardrobe.season IS 'Seasonal availability: All Season, Summer, Fall/Winter, etc';
+
+-- Agent-written SQL runs as this role (SET LOCAL ROLE, see tenancy.py). It can
+-- only read the agent tables, and row-level security limits wardrobe rows to
+-- the tenant in the ptso.tenant setting of the transaction.
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'ptso_agent_reader') THEN
+        CREATE ROLE ptso_agent_reader NOLOGIN;
+    END IF;
+END
+$$;
+
+GRANT ptso_agent_reader TO CURRENT_USER;
+GRANT USAGE ON SCHEMA public TO ptso_agent_reader;
+GRANT SELECT ON weather_data, city_aliases, wardrobe, seasonal_items, wardrobe_by_brand, wardrobe_by_category TO ptso_agent_reader;
+
+ALTER TABLE wardrobe ENABLE ROW LEVEL SECURITY;
+CREATE POLICY wardrobe_tenant_isolation ON wardrobe FOR SELECT TO ptso_agent_reader
+USING (user_id = current_setting('ptso.tenant', true));
+
+-- Announce changes to the tables behind cached query results. Statement-level
+-- triggers also fire for COPY, and the payload is the changed table's name.
+CREATE OR REPLACE FUNCTION ptso_notify_table_change() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('ptso_table_changes', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER wardrobe_notify_change
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON wardrobe
+FOR EACH STATEMENT EXECUTE FUNCTION ptso_notify_table_change();
+
+CREATE TRIGGER weather_data_notify_change
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON weather_data
+FOR EACH STATEMENT EXECUTE FUNCTION ptso_notify_table_change();
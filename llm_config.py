@@ -3,7 +3,9 @@ LLM Configuration System
 Supports both local and commercial LLM backends
 """
 
+import json
 import os
+from functools import lru_cache
 from typing import Dict, Any, Optional
 from enum import Enum
 
@@ -16,6 +18,24 @@ class LLMProvider(Enum):
     VLLM = "vllm"
     LOCAL = "local"
 
+# Per-agent models picked by autotune.py
+AUTOTUNE_FILE = os.getenv('MODEL_AUTOTUNE_FILE', 'model_autotune.json')
+
+@lru_cache(maxsize=None)
+def load_tuned_models(provider: LLMProvider, path: str = AUTOTUNE_FILE) -> Dict[str, str]:
+    """Agent name to tuned model for a provider, read once from the autotune file."""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"WARNING: Could not read {path}: {e}")
+        return {}
+    if data.get("provider") != provider.value:
+        return {}
+    return {agent: entry["model"] for agent, entry in data.get("agents", {}).items() if entry.get("model")}
+
 class LLMConfig:
     """Configuration for LLM backends."""
     
@@ -53,39 +73,45 @@ class LLMConfig:
                 "api_key": os.getenv('GOOGLE_API_KEY') or os.getenv('GEMINI_API_KEY'),
                 "base_url": "https://generativelanguage.googleapis.com/v1beta",
                 "temperature": 0.7,
-                "max_tokens": 4096
+                "max_tokens": 4096,
+                "tiers": {"small": "gemini-2.0-flash-lite", "large": "gemini-2.0-flash"}
             },
             LLMProvider.OPENAI: {
                 "model": "gpt-4o",
                 "api_key": os.getenv('OPENAI_API_KEY'),
                 "base_url": "https://api.openai.com/v1",
                 "temperature": 0.7,
-                "max_tokens": 4096
+                "max_tokens": 4096,
+                "tiers": {"small": "gpt-4o-mini", "large": "gpt-4o"}
             },
             LLMProvider.ANTHROPIC: {
                 "model": "claude-3-5-sonnet-20241022",
                 "api_key": os.getenv('ANTHROPIC_API_KEY'),
                 "base_url": "https://api.anthropic.com",
                 "temperature": 0.7,
-                "max_tokens": 4096
+                "max_tokens": 4096,
+                "tiers": {"small": "claude-3-haiku-20240307", "large": "claude-3-5-sonnet-20241022"}
             },
             LLMProvider.OLLAMA: {
                 "model": "llama3.1:8b",
                 "base_url": os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434'),
                 "temperature": 0.7,
-                "max_tokens": 4096
+                "max_tokens": 4096,
+                "tiers": {"small": "llama3.2:3b", "large": "llama3.1:8b"}
             },
             LLMProvider.VLLM: {
                 "model": "meta-llama/Llama-3.1-8B-Instruct",
                 "base_url": os.getenv('VLLM_BASE_URL', 'http://localhost:8000'),
                 "temperature": 0.7,
-                "max_tokens": 4096
+                "max_tokens": 4096,
+                "tiers": {"small": "meta-llama/Llama-3.2-3B-Instruct", "large": "meta-llama/Llama-3.1-8B-Instruct"}
             },
             LLMProvider.LOCAL: {
                 "model": "local-model",
                 "base_url": "http://localhost:8080",
                 "temperature": 0.7,
-                "max_tokens": 4096
+                "max_tokens": 4096,
+                "tiers": {"small": "local-model", "large": "local-model"}
             }
         }
         return configs.get(self.provider, configs[LLMProvider.GEMINI])
@@ -94,6 +120,29 @@ class LLMConfig:
         """Get the model name for the current provider."""
         return self.config.get("model", "gemini-2.0-flash")
     
+    def get_tier_model(self, tier: str) -> str:
+        """Get the model name configured for a routing tier.
+        
+        Args:
+            tier: Tier name, e.g. "small" or "large"
+            
+        Returns:
+            str: Model name, overridable via LLM_<TIER>_MODEL
+        """
+        tiers = self.config.get("tiers", {})
+        return os.getenv(f"LLM_{tier.upper()}_MODEL") or tiers.get(tier) or self.get_model_name()
+    
+    def get_tuned_model(self, agent_name: str) -> Optional[str]:
+        """Get the model autotune picked for an agent, if any.
+        
+        Args:
+            agent_name: Agent name, e.g. "weather_agent"
+            
+        Returns:
+            str: Model name from the autotune file, or None
+        """
+        return load_tuned_models(self.provider).get(agent_name)
+    
     def get_adk_config(self) -> Dict[str, Any]:
         """Get configuration for Google ADK."""
         if self.provider == LLMProvider.GEMINI:
@@ -6,9 +6,182 @@ Provides a unified interface for local LLM backends (Ollama, vLLM, etc.)
 import asyncio
 import aiohttp
 import json
-from typing import Dict, Any, Optional, List
+import os
+import time
+from typing import Dict, Any, Optional, List, Tuple
 from llm_config import LLMConfig, LLMProvider
 
+# Requests each backend serves concurrently by default (override with LLM_BACKEND_PARALLELISM)
+DEFAULT_PARALLELISM = {
+    LLMProvider.OLLAMA: int(os.getenv('OLLAMA_NUM_PARALLEL', 4)),
+    LLMProvider.VLLM: 64,
+    LLMProvider.LOCAL: 8,
+}
+
+# Upper bounds of the batching histogram buckets
+QUEUE_DELAY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+class Histogram:
+    """Fixed-bucket histogram."""
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        buckets = {f"le_{bound}": count for bound, count in zip(self.bounds, self.counts)}
+        buckets["le_inf"] = self.counts[-1]
+        return {"count": self.count, "avg": self.total / self.count if self.count else 0.0, "buckets": buckets}
+
+class BatchScheduler:
+    """Collects concurrent generate calls into micro-batches.
+
+    Calls arriving within `window` seconds of the first one (up to
+    `max_batch_size`) are dispatched together, one model group at a time:
+    the group for the model already in flight goes first, and a group for
+    another model waits until the previous model's requests have finished,
+    so Ollama never has two models competing for memory. At most
+    `parallelism` requests are in flight at the backend, and every caller
+    gets its own result.
+
+    Only calls made through LocalLLMService.generate, such as keep-warm
+    generations, are batched. The agents reach the model through LiteLlm,
+    which does not go through this scheduler.
+    """
+
+    def __init__(self, dispatch, window: float, max_batch_size: int, parallelism: int):
+        """Initialize the scheduler.
+
+        Args:
+            dispatch: Coroutine function sending one request to the backend
+            window: Seconds to wait for more calls after the first one
+            max_batch_size: Calls per batch
+            parallelism: Requests in flight at the backend
+        """
+        self.dispatch = dispatch
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.parallelism = parallelism
+        self.queue_delay = Histogram(QUEUE_DELAY_BUCKETS)
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self.in_flight = 0
+        self.model_switches = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+        self._active_model: Optional[str] = None
+        self._sends: set = set()
+
+    async def submit(self, request: Tuple) -> str:
+        """Queue a request and wait for its result."""
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.parallelism)
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((request, future, time.monotonic()))
+        return await future
+
+    async def _collect(self) -> List[Tuple]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = [item for item in await self._collect() if not item[1].done()]
+            if not batch:
+                continue
+            self.batch_size.observe(len(batch))
+            groups: Dict[str, List[Tuple]] = {}
+            for item in batch:
+                # request[2] is the model
+                groups.setdefault(item[0][2], []).append(item)
+            try:
+                # The model already in flight goes first, so it needs no switch
+                for model in sorted(groups, key=lambda model: model != self._active_model):
+                    if model != self._active_model:
+                        if self._sends:
+                            await asyncio.wait(self._sends)
+                        if self._active_model is not None:
+                            self.model_switches += 1
+                        self._active_model = model
+                    for request, future, queued_at in groups[model]:
+                        task = asyncio.create_task(self._send(request, future, queued_at))
+                        self._sends.add(task)
+                        task.add_done_callback(self._sends.discard)
+            except asyncio.CancelledError:
+                # Groups still waiting for their turn are never sent
+                for _, future, _ in batch:
+                    future.cancel()
+                raise
+
+    async def close(self):
+        """Stop dispatching and cancel queued and in-flight calls."""
+        tasks = [task for task in (self._task, *self._sends) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        while self._queue is not None and not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            future.cancel()
+        self._task = None
+        self._active_model = None
+
+    async def _send(self, request: Tuple, future: asyncio.Future, queued_at: float):
+        async with self._slots:
+            if future.done():
+                return
+            self.queue_delay.observe(time.monotonic() - queued_at)
+            self.in_flight += 1
+            try:
+                result = await self.dispatch(*request)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self.in_flight -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Batching configuration, queue depth and histograms."""
+        return {
+            "window": self.window,
+            "max_batch_size": self.max_batch_size,
+            "parallelism": self.parallelism,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "in_flight": self.in_flight,
+            "model_switches": self.model_switches,
+            "queue_delay": self.queue_delay.snapshot(),
+            "batch_size": self.batch_size.snapshot(),
+        }
+
 class LocalLLMService:
     """Service for interacting with local LLM backends."""
     
@@ -23,51 +196,93 @@ class LocalLLMService:
         self.model = config.get_model_name()
         self.temperature = config.config.get("temperature", 0.7)
         self.max_tokens = config.config.get("max_tokens", 4096)
+        # How long Ollama keeps a model loaded after a request ("-1" pins it)
+        self.keep_alive = config.config.get("keep_alive", os.getenv('MODEL_KEEP_ALIVE', '30m'))
+        self.last_request_at = 0.0
+        self._session: Optional[aiohttp.ClientSession] = None
+        
+        # Micro-batch concurrent calls instead of sending them as they come
+        self.batcher = None
+        if os.getenv('LLM_BATCHING', 'true').lower() == 'true':
+            self.batcher = BatchScheduler(
+                self._dispatch,
+                window=float(os.getenv('LLM_BATCH_WINDOW_MS', 5)) / 1000,
+                max_batch_size=int(os.getenv('LLM_MAX_BATCH_SIZE', 8)),
+                parallelism=int(os.getenv('LLM_BACKEND_PARALLELISM', DEFAULT_PARALLELISM.get(config.provider, 8)))
+            )
     
-    async def generate(self, prompt: str, system_prompt: str = None) -> str:
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Shared HTTP session, so batched requests reuse connections."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return self._session
+    
+    async def close(self):
+        """Stop the batcher and close the shared HTTP session."""
+        if self.batcher is not None:
+            await self.batcher.close()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+    
+    async def generate(self, prompt: str, system_prompt: str = None, model: str = None,
+                       max_tokens: int = None, keep_warm: bool = False) -> str:
         """Generate text using the local LLM.
         
         Args:
             prompt: User prompt
             system_prompt: Optional system prompt
+            model: Model to use instead of the configured one
+            max_tokens: Output token limit instead of the configured one
+            keep_warm: Whether this is a keep-warm call, which is not counted
+                as traffic in last_request_at
             
         Returns:
             Generated text
         """
+        if not keep_warm:
+            self.last_request_at = time.monotonic()
+        request = (prompt, system_prompt, model or self.model, max_tokens or self.max_tokens)
+        if self.batcher is None:
+            return await self._dispatch(*request)
+        return await self.batcher.submit(request)
+    
+    async def _dispatch(self, prompt: str, system_prompt: str, model: str, max_tokens: int) -> str:
+        """Send one generation request to the configured backend."""
         if self.config.provider == LLMProvider.OLLAMA:
-            return await self._generate_ollama(prompt, system_prompt)
+            return await self._generate_ollama(prompt, system_prompt, model, max_tokens)
         elif self.config.provider == LLMProvider.VLLM:
-            return await self._generate_vllm(prompt, system_prompt)
+            return await self._generate_vllm(prompt, system_prompt, model, max_tokens)
         else:
-            return await self._generate_generic(prompt, system_prompt)
+            return await self._generate_generic(prompt, system_prompt, model, max_tokens)
     
-    async def _generate_ollama(self, prompt: str, system_prompt: str = None) -> str:
+    async def _generate_ollama(self, prompt: str, system_prompt: str, model: str, max_tokens: int) -> str:
         """Generate text using Ollama."""
         url = f"{self.base_url}/api/generate"
         
         payload = {
-            "model": self.model,
+            "model": model,
             "prompt": prompt,
             "stream": False,
+            "keep_alive": self.keep_alive,
             "options": {
                 "temperature": self.temperature,
-                "num_predict": self.max_tokens
+                "num_predict": max_tokens
             }
         }
         
         if system_prompt:
             payload["system"] = system_prompt
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=payload) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return data.get("response", "")
-                else:
-                    error_text = await response.text()
-                    raise Exception(f"Ollama API error: {response.status} - {error_text}")
-    
-    async def _generate_vllm(self, prompt: str, system_prompt: str = None) -> str:
+        async with self._get_session().post(url, json=payload) as response:
+            if response.status == 200:
+                data = await response.json()
+                return data.get("response", "")
+            else:
+                error_text = await response.text()
+                raise Exception(f"Ollama API error: {response.status} - {error_text}")
+    
+    async def _generate_vllm(self, prompt: str, system_prompt: str, model: str, max_tokens: int) -> str:
         """Generate text using vLLM."""
         url = f"{self.base_url}/v1/chat/completions"
         
@@ -77,22 +292,21 @@ class LocalLLMService:
         messages.append({"role": "user", "content": prompt})
         
         payload = {
-            "model": self.model,
+            "model": model,
             "messages": messages,
             "temperature": self.temperature,
-            "max_tokens": self.max_tokens
+            "max_tokens": max_tokens
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=payload) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return data["choices"][0]["message"]["content"]
-                else:
-                    error_text = await response.text()
-                    raise Exception(f"vLLM API error: {response.status} - {error_text}")
-    
-    async def _generate_generic(self, prompt: str, system_prompt: str = None) -> str:
+        async with self._get_session().post(url, json=payload) as response:
+            if response.status == 200:
+                data = await response.json()
+                return data["choices"][0]["message"]["content"]
+            else:
+                error_text = await response.text()
+                raise Exception(f"vLLM API error: {response.status} - {error_text}")
+    
+    async def _generate_generic(self, prompt: str, system_prompt: str, model: str, max_tokens: int) -> str:
         """Generate text using a generic OpenAI-compatible API."""
         url = f"{self.base_url}/v1/chat/completions"
         
@@ -102,20 +316,118 @@ class LocalLLMService:
         messages.append({"role": "user", "content": prompt})
         
         payload = {
-            "model": self.model,
+            "model": model,
             "messages": messages,
             "temperature": self.temperature,
-            "max_tokens": self.max_tokens
+            "max_tokens": max_tokens
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=payload) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return data["choices"][0]["message"]["content"]
-                else:
-                    error_text = await response.text()
-                    raise Exception(f"Generic API error: {response.status} - {error_text}")
+        async with self._get_session().post(url, json=payload) as response:
+            if response.status == 200:
+                data = await response.json()
+                return data["choices"][0]["message"]["content"]
+            else:
+                error_text = await response.text()
+                raise Exception(f"Generic API error: {response.status} - {error_text}")
+    
+    async def generate_profiled(self, prompt: str, system_prompt: str = None, model: str = None,
+                                max_tokens: int = None) -> Dict[str, Any]:
+        """Generate text and measure where the time went, bypassing the batcher.
+        
+        Ollama reports prompt evaluation and generation durations itself.
+        For OpenAI-compatible backends the response is streamed, and the
+        time to the first token stands in for prompt evaluation.
+        
+        Returns:
+            dict: "text", "latency", "prompt_tokens", "completion_tokens",
+                "prompt_eval_seconds" and "generation_seconds"
+        """
+        model = model or self.model
+        max_tokens = max_tokens or self.max_tokens
+        start = time.monotonic()
+        if self.config.provider == LLMProvider.OLLAMA:
+            payload = {
+                "model": model,
+                "prompt": prompt,
+                "stream": False,
+                "keep_alive": self.keep_alive,
+                "options": {"temperature": self.temperature, "num_predict": max_tokens}
+            }
+            if system_prompt:
+                payload["system"] = system_prompt
+            async with self._get_session().post(f"{self.base_url}/api/generate", json=payload) as response:
+                if response.status != 200:
+                    raise Exception(f"Ollama API error: {response.status} - {await response.text()}")
+                data = await response.json()
+            return {
+                "text": data.get("response", ""),
+                "latency": time.monotonic() - start,
+                "prompt_tokens": data.get("prompt_eval_count", 0),
+                "completion_tokens": data.get("eval_count", 0),
+                "prompt_eval_seconds": data.get("prompt_eval_duration", 0) / 1e9,
+                "generation_seconds": data.get("eval_duration", 0) / 1e9
+            }
+        
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": self.temperature,
+            "max_tokens": max_tokens,
+            "stream": True,
+            "stream_options": {"include_usage": True}
+        }
+        chunks, usage, first_token_at = [], {}, None
+        async with self._get_session().post(f"{self.base_url}/v1/chat/completions", json=payload) as response:
+            if response.status != 200:
+                raise Exception(f"{self.config.provider.value} API error: {response.status} - {await response.text()}")
+            async for line in response.content:
+                line = line.decode("utf-8").strip()
+                if not line.startswith("data:") or line == "data: [DONE]":
+                    continue
+                data = json.loads(line[5:])
+                usage = data.get("usage") or usage
+                for choice in data.get("choices", []):
+                    text = (choice.get("delta") or {}).get("content")
+                    if text:
+                        if first_token_at is None:
+                            first_token_at = time.monotonic()
+                        chunks.append(text)
+        end = time.monotonic()
+        first_token_at = first_token_at or end
+        return {
+            "text": "".join(chunks),
+            "latency": end - start,
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "completion_tokens": usage.get("completion_tokens", len(chunks)),
+            "prompt_eval_seconds": first_token_at - start,
+            "generation_seconds": end - first_token_at
+        }
+    
+    async def available_models(self) -> List[str]:
+        """Names of the models the backend can serve (for Ollama, every pulled tag)."""
+        url = f"{self.base_url}/api/tags" if self.config.provider == LLMProvider.OLLAMA else f"{self.base_url}/v1/models"
+        async with self._get_session().get(url, timeout=5) as response:
+            if response.status != 200:
+                return []
+            data = await response.json()
+        if self.config.provider == LLMProvider.OLLAMA:
+            return [entry["name"] for entry in data.get("models", [])]
+        return [entry["id"] for entry in data.get("data", [])]
+    
+    async def model_memory(self, model: str = None) -> Optional[int]:
+        """Bytes a loaded model occupies, where the backend reports it (Ollama only)."""
+        if self.config.provider != LLMProvider.OLLAMA:
+            return None
+        async with self._get_session().get(f"{self.base_url}/api/ps", timeout=5) as response:
+            if response.status != 200:
+                return None
+            data = await response.json()
+        model = model or self.model
+        return next((entry.get("size") for entry in data.get("models", []) if entry.get("name") == model), None)
     
     async def health_check(self) -> bool:
         """Check if the local LLM service is healthy."""
@@ -130,6 +442,34 @@ class LocalLLMService:
                     return response.status == 200
         except Exception:
             return False
+    
+    async def load_model(self, model: str = None) -> bool:
+        """Load a model into memory without generating (Ollama only).
+        
+        An empty prompt makes Ollama load the model and apply keep_alive.
+        """
+        if self.config.provider != LLMProvider.OLLAMA:
+            return True
+        url = f"{self.base_url}/api/generate"
+        payload = {"model": model or self.model, "prompt": "", "keep_alive": self.keep_alive}
+        async with aiohttp.ClientSession() as session:
+            async with session.post(url, json=payload) as response:
+                return response.status == 200
+    
+    async def loaded_models(self) -> List[str]:
+        """Names of the models the backend currently holds in memory."""
+        if self.config.provider == LLMProvider.OLLAMA:
+            url = f"{self.base_url}/api/ps"
+        else:
+            url = f"{self.base_url}/v1/models"
+        async with aiohttp.ClientSession() as session:
+            async with session.get(url, timeout=5) as response:
+                if response.status != 200:
+                    return []
+                data = await response.json()
+        if self.config.provider == LLMProvider.OLLAMA:
+            return [entry["name"] for entry in data.get("models", [])]
+        return [entry["id"] for entry in data.get("data", [])]
 
 # Global local LLM service
 _local_llm_service = None
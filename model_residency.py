@@ -0,0 +1,147 @@
+"""
+Model Residency Manager
+Preloads local models at startup, keeps them resident while traffic is idle
+and gates service readiness on warm-up.
+"""
+
+import asyncio
+import os
+import time
+from typing import Dict, Any, List, Optional
+
+from llm_config import LLMConfig, LLMProvider, get_llm_config, load_tuned_models
+from local_llm_service import LocalLLMService
+
+LOCAL_PROVIDERS = (LLMProvider.OLLAMA, LLMProvider.VLLM, LLMProvider.LOCAL)
+
+# Monotonic time of the last agent LLM call made by this process, set by the
+# agents' before_model_callback (resilience.deadline_model_callback)
+_last_activity = 0.0
+
+def mark_model_activity():
+    """Record that this process just used the LLM backend."""
+    global _last_activity
+    _last_activity = time.monotonic()
+
+class ModelResidencyManager:
+    """Keeps the configured local models loaded so users never pay cold starts."""
+
+    def __init__(self, config: LLMConfig = None, models: List[str] = None,
+                 keep_warm_interval: float = None, idle_threshold: float = None):
+        """Initialize the residency manager.
+
+        Args:
+            config: LLM configuration (defaults to the global one)
+            models: Models to keep resident (defaults to the configured model, its tiers when
+                model routing is on, and tuned models)
+            keep_warm_interval: Seconds between residency checks
+            idle_threshold: Seconds without traffic before a keep-warm generation is sent
+        """
+        self.config = config or get_llm_config()
+        self.enabled = self.config.provider in LOCAL_PROVIDERS
+        self.service = LocalLLMService(self.config) if self.enabled else None
+        if models is None:
+            models = [self.config.get_model_name()]
+            # Tier models are only called, and need to be pulled, when routing is on
+            if os.getenv('MODEL_ROUTING', 'off').lower() == 'on':
+                models += [self.config.get_tier_model(tier) for tier in self.config.config.get("tiers", {})]
+            models += load_tuned_models(self.config.provider).values()
+        self.models = list(dict.fromkeys(models))
+        self.keep_warm_interval = keep_warm_interval or float(os.getenv('MODEL_KEEP_WARM_INTERVAL', 120))
+        self.idle_threshold = idle_threshold or float(os.getenv('MODEL_IDLE_THRESHOLD', 240))
+
+        # Commercial providers have nothing to warm, so they are ready immediately
+        self.ready = not self.enabled
+        self.status: Dict[str, Dict[str, Any]] = {
+            model: {"resident": False, "last_warmed": None, "error": None} for model in self.models
+        }
+        self._task: Optional[asyncio.Task] = None
+        # Keep-warm generations are not traffic, so they are spaced by their own clock
+        self._last_keep_warm = 0.0
+
+    async def _warm(self, model: str):
+        """Load a model and run a one-token generation through it."""
+        start = time.monotonic()
+        try:
+            await self.service.load_model(model)
+            await self.service.generate("ping", model=model, max_tokens=1, keep_warm=True)
+            self.status[model].update(resident=True, last_warmed=time.time(), error=None)
+            print(f"🔥 Warmed {model} in {time.monotonic() - start:.1f}s")
+        except Exception as e:
+            self.status[model].update(resident=False, error=str(e))
+            print(f"❌ Failed to warm {model}: {e}")
+
+    async def warm_up(self) -> bool:
+        """Preload every model; the service becomes ready once the primary model is resident.
+
+        Returns:
+            bool: Whether the service is ready
+        """
+        if not self.enabled:
+            return True
+        await asyncio.gather(*(self._warm(model) for model in self.models))
+        self.ready = self.status[self.config.get_model_name()]["resident"]
+        return self.ready
+
+    async def refresh_residency(self):
+        """Update the resident flag of each model from the backend."""
+        try:
+            loaded = set(await self.service.loaded_models())
+        except Exception as e:
+            print(f"Could not query loaded models: {e}")
+            return
+        for model, entry in self.status.items():
+            entry["resident"] = model in loaded
+
+    def idle_for(self) -> float:
+        """Seconds since the LLM backend last served a request from this process."""
+        return time.monotonic() - max(_last_activity, self.service.last_request_at)
+
+    async def run(self):
+        """Warm up, then keep models resident while traffic is idle."""
+        while not await self.warm_up():
+            await asyncio.sleep(min(self.keep_warm_interval, 10))
+        while True:
+            await asyncio.sleep(self.keep_warm_interval)
+            await self.refresh_residency()
+            idle = (self.idle_for() >= self.idle_threshold
+                    and time.monotonic() - self._last_keep_warm >= self.idle_threshold)
+            if idle:
+                self._last_keep_warm = time.monotonic()
+            for model, entry in self.status.items():
+                if idle or not entry["resident"]:
+                    await self._warm(model)
+
+    def start(self):
+        """Start warm-up and the keep-warm loop as a background task."""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Stop the background task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.service is not None:
+            await self.service.close()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Readiness and per-model residency."""
+        snapshot = {"ready": self.ready, "provider": self.config.provider.value, "models": self.status}
+        if self.service is not None and self.service.batcher is not None:
+            snapshot["batching"] = self.service.batcher.snapshot()
+        return snapshot
+
+# Global residency manager
+_residency_manager = None
+
+def get_residency_manager() -> ModelResidencyManager:
+    """Get the global residency manager, creating it on first use."""
+    global _residency_manager
+    if _residency_manager is None:
+        _residency_manager = ModelResidencyManager()
+    return _residency_manager
@@ -0,0 +1,249 @@
+"""
+Model Tiering Router
+Routes each agent call to a small or large model based on a cheap, local
+complexity estimate.
+"""
+
+import json
+import math
+import os
+import re
+import time
+from collections import deque
+from enum import Enum
+from typing import Any, AsyncGenerator, Dict, Tuple
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.google_llm import Gemini
+from google.adk.models.lite_llm import LiteLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from pydantic import Field
+
+from llm_config import LLMConfig, LLMProvider, get_llm_config
+
+class ModelTier(Enum):
+    """Model tiers, smallest first."""
+    SMALL = "small"
+    LARGE = "large"
+
+class Complexity(Enum):
+    """Complexity classes produced by the classifier."""
+    SIMPLE = "simple"
+    COMPLEX = "complex"
+
+# Default complexity -> tier mapping per agent, overridable with the
+# MODEL_TIER_MAP environment variable (same JSON shape)
+DEFAULT_TIER_MAP = {
+    "weather_agent": {"simple": "small", "complex": "small"},
+    "wardrobe_agent": {"simple": "small", "complex": "large"},
+    "ptso_agent": {"simple": "small", "complex": "large"},
+}
+
+_LOOKUP_PATTERN = re.compile(r"\b(weather|temperature|temp|forecast|degrees)\b", re.IGNORECASE)
+_STYLING_PATTERN = re.compile(
+    r"\b(style|styling|outfit|look|occasion|wedding|interview|date|party|formal|"
+    r"match|pair|combine|layer|vibe|dress code|aesthetic)\b",
+    re.IGNORECASE
+)
+_CONSTRAINT_PATTERN = re.compile(r"\b(but|without|except|unless|instead|prefer|avoid|only|also)\b", re.IGNORECASE)
+
+class ComplexityClassifier:
+    """Rules plus a tiny logistic model over hand-picked text features.
+
+    Runs in microseconds with no network or model download.
+    """
+
+    # Feature weights for the logistic model; positive values push towards COMPLEX
+    WEIGHTS = {
+        "bias": -2.5,
+        "log_words": 0.9,
+        "styling_terms": 1.1,
+        "constraint_terms": 0.8,
+        "questions": 0.4,
+        "lookup_terms": -1.2,
+    }
+
+    def __init__(self, threshold: float = None):
+        """Initialize the classifier.
+
+        Args:
+            threshold: Probability above which a call counts as complex
+        """
+        self.threshold = threshold if threshold is not None else float(os.getenv('MODEL_ROUTER_THRESHOLD', 0.5))
+
+    def features(self, text: str) -> Dict[str, float]:
+        """Extract classifier features from a prompt."""
+        return {
+            "bias": 1.0,
+            "log_words": math.log1p(len(text.split())),
+            "styling_terms": len(_STYLING_PATTERN.findall(text)),
+            "constraint_terms": len(_CONSTRAINT_PATTERN.findall(text)),
+            "questions": text.count("?"),
+            "lookup_terms": len(_LOOKUP_PATTERN.findall(text)),
+        }
+
+    def score(self, text: str) -> float:
+        """Probability that the prompt needs the large model."""
+        z = sum(self.WEIGHTS[name] * value for name, value in self.features(text).items())
+        return 1.0 / (1.0 + math.exp(-z))
+
+    def classify(self, text: str) -> Complexity:
+        """Classify a prompt as simple or complex."""
+        stripped = text.strip()
+        # Structured hand-offs (e.g. a WeatherReading document) never need the large model
+        if stripped.startswith("{") and stripped.endswith("}"):
+            return Complexity.SIMPLE
+        if not stripped:
+            return Complexity.SIMPLE
+        return Complexity.COMPLEX if self.score(stripped) >= self.threshold else Complexity.SIMPLE
+
+class TierMetrics:
+    """Latency, error and empty-response counters for one tier."""
+
+    def __init__(self, window: int = 1000):
+        self.calls = 0
+        self.errors = 0
+        self.empty_responses = 0
+        self.latencies = deque(maxlen=window)
+
+    def record(self, latency: float, ok: bool, empty: bool):
+        self.calls += 1
+        self.latencies.append(latency)
+        if not ok:
+            self.errors += 1
+        if empty:
+            self.empty_responses += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        # Only says whether the tier answered at all, not whether its answers are as good
+        answered = self.calls - self.errors - self.empty_responses
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "empty_responses": self.empty_responses,
+            "answered_ratio": answered / self.calls if self.calls else None,
+            "latency_p50": percentile(0.5),
+            "latency_p95": percentile(0.95),
+        }
+
+class ModelRouter:
+    """Maps (agent, complexity) to a model tier and tracks per-tier metrics."""
+
+    def __init__(self, llm_config: LLMConfig = None, tier_map: Dict[str, Dict[str, str]] = None,
+                 classifier: ComplexityClassifier = None):
+        """Initialize the router.
+
+        Args:
+            llm_config: LLM configuration providing the tier models
+            tier_map: Per-agent mapping of complexity to tier name
+            classifier: Complexity classifier
+        """
+        self.llm_config = llm_config or get_llm_config()
+        if tier_map is None:
+            tier_map = json.loads(os.getenv('MODEL_TIER_MAP', 'null')) or DEFAULT_TIER_MAP
+        self.tier_map = tier_map
+        self.classifier = classifier or ComplexityClassifier()
+        self.metrics = {tier: TierMetrics() for tier in ModelTier}
+        self._llms: Dict[str, BaseLlm] = {}
+
+    def route(self, agent_name: str, text: str) -> Tuple[ModelTier, str]:
+        """Pick the tier and model for an agent call.
+
+        Returns:
+            tuple: (tier, model name)
+        """
+        complexity = self.classifier.classify(text)
+        mapping = self.tier_map.get(agent_name, {"simple": "small", "complex": "large"})
+        tier = ModelTier(mapping.get(complexity.value, ModelTier.LARGE.value))
+        # A model picked by autotune.py serves every call of its agent
+        return tier, self.llm_config.get_tuned_model(agent_name) or self.llm_config.get_tier_model(tier.value)
+
+    def llm_for(self, model: str) -> BaseLlm:
+        """Get (and cache) the ADK LLM client for a model name."""
+        if model not in self._llms:
+            adk_config = LLMConfig(self.llm_config.provider, **{**self.llm_config.config, "model": model}).get_adk_config()
+            if self.llm_config.provider == LLMProvider.GEMINI:
+                self._llms[model] = Gemini(model=adk_config["model"])
+            else:
+                kwargs = {key: adk_config[key] for key in ("api_key",) if adk_config.get(key)}
+                if adk_config.get("base_url"):
+                    kwargs["api_base"] = adk_config["base_url"]
+                self._llms[model] = LiteLlm(model=adk_config["model"], **kwargs)
+        return self._llms[model]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-tier metrics and the active tier models."""
+        return {
+            tier.value: {"model": self.llm_config.get_tier_model(tier.value), **self.metrics[tier].snapshot()}
+            for tier in ModelTier
+        }
+
+def _last_user_text(llm_request: LlmRequest) -> str:
+    """Text of the most recent user turn in a request.
+
+    After a tool call the newest user content is the function response, which
+    has no text, so turns without text are skipped.
+    """
+    for content in reversed(llm_request.contents or []):
+        if content.role == "user" and content.parts:
+            text = "".join(part.text or "" for part in content.parts)
+            if text:
+                return text
+    return ""
+
+class TieredLlm(BaseLlm):
+    """ADK model that delegates each call to the tier picked by the router."""
+
+    agent_name: str
+    router: Any = Field(default=None, exclude=True)
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        tier, model = self.router.route(self.agent_name, _last_user_text(llm_request))
+        delegate = self.router.llm_for(model)
+        llm_request.model = delegate.model
+
+        start = time.monotonic()
+        ok, empty = True, True
+        try:
+            async for response in delegate.generate_content_async(llm_request, stream=stream):
+                if response.error_code:
+                    ok = False
+                if response.content and response.content.parts:
+                    empty = False
+                yield response
+        except Exception:
+            ok = False
+            raise
+        finally:
+            self.router.metrics[tier].record(time.monotonic() - start, ok, empty and ok)
+
+# Global model router
+_model_router = None
+
+def get_model_router() -> ModelRouter:
+    """Get the global model router, creating it on first use."""
+    global _model_router
+    if _model_router is None:
+        _model_router = ModelRouter()
+    return _model_router
+
+def get_agent_model(agent_name: str):
+    """Model to pass to an agent's LlmAgent.
+
+    Returns a TieredLlm when routing is enabled with MODEL_ROUTING=on.
+    Otherwise (the default) the agent's tuned model or the single configured
+    model name is used, so no tier model has to be installed.
+    """
+    if os.getenv('MODEL_ROUTING', 'off').lower() != 'on':
+        return get_llm_config().get_tuned_model(agent_name) or get_llm_config().get_model_name()
+    return TieredLlm(model=f"tiered/{agent_name}", agent_name=agent_name, router=get_model_router())
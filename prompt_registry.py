@@ -0,0 +1,176 @@
+"""
+Prompt Registry
+Loads agent instruction files once and hands out shared, immutable prompts
+with content hashes and token counts. A file is only re-read when its mtime
+changes, so edited instructions are picked up without a restart.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, NamedTuple, Optional
+
+from tokens import count_tokens
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+# Directories whose *.txt files are loaded at startup
+PROMPT_DIRS = tuple(
+    os.path.join(REPO_ROOT, path) for path in os.getenv('PROMPT_DIRS', 'agent_instructions').split(os.pathsep) if path
+)
+
+class Prompt(NamedTuple):
+    """An instruction file's text and identity.
+
+    `hash` is the SHA-256 of the text; it only changes when the content
+    does, so it can key prefix and response caches.
+    """
+    name: str
+    path: str
+    text: str
+    hash: str
+    tokens: int
+    mtime_ns: int
+
+def _read(name: str, path: str) -> Prompt:
+    mtime_ns = os.stat(path).st_mtime_ns
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    return Prompt(name, path, text, hashlib.sha256(text.encode("utf-8")).hexdigest(), count_tokens(text), mtime_ns)
+
+class PromptRegistry:
+    """Instruction files by path, re-read only when their mtime changes.
+
+    Lookups accept a path relative to the repository root
+    ("agent_instructions/x.txt"), a legacy path relative to utils/
+    ("../agent_instructions/x.txt") or a bare file name found in PROMPT_DIRS.
+    """
+
+    def __init__(self, dirs: Iterable[str] = PROMPT_DIRS, check_interval: float = None):
+        """Initialize the registry and load every prompt in `dirs`.
+
+        Args:
+            dirs: Directories to preload
+            check_interval: Minimum seconds between mtime checks of one file
+        """
+        self.dirs = tuple(dirs)
+        self.check_interval = (check_interval if check_interval is not None
+                               else float(os.getenv('PROMPT_RELOAD_INTERVAL', 1)))
+        self._prompts: Dict[str, Prompt] = {}
+        self._checked: Dict[str, float] = {}
+        self._resolved: Dict[tuple, str] = {}
+        self._missing: set = set()
+        self._lock = threading.Lock()
+        self.reloads = 0
+        for directory in self.dirs:
+            if not os.path.isdir(directory):
+                continue
+            for entry in sorted(os.listdir(directory)):
+                if entry.endswith(".txt"):
+                    self._load(os.path.join(directory, entry))
+        print(f"Loaded {len(self._prompts)} prompts from {', '.join(self.dirs)}")
+
+    def _load(self, path: str) -> Prompt:
+        name = os.path.relpath(path, REPO_ROOT) if path.startswith(REPO_ROOT + os.sep) else path
+        prompt = _read(name, path)
+        self._prompts[path] = prompt
+        self._checked[path] = time.monotonic()
+        return prompt
+
+    def resolve(self, filename: str, base_dir: str = None) -> Optional[str]:
+        """Absolute path of an instruction file, or None if it does not exist."""
+        resolved = self._resolved.get((filename, base_dir))
+        if resolved is not None:
+            return resolved
+        candidates = []
+        if os.path.isabs(filename):
+            candidates.append(filename)
+        else:
+            if base_dir:
+                candidates.append(os.path.join(base_dir, filename))
+            candidates.append(os.path.join(REPO_ROOT, filename))
+            # Paths written relative to utils/, as the old loader resolved them
+            candidates.append(os.path.join(REPO_ROOT, "utils", filename))
+            candidates += [os.path.join(directory, os.path.basename(filename)) for directory in self.dirs]
+        for candidate in candidates:
+            path = os.path.normpath(candidate)
+            if path in self._prompts or os.path.isfile(path):
+                self._resolved[(filename, base_dir)] = path
+                return path
+        return None
+
+    def get(self, filename: str, base_dir: str = None) -> Optional[Prompt]:
+        """Get a prompt, re-reading it if its file changed.
+
+        Args:
+            filename: File to look up (see the class docstring)
+            base_dir: Directory tried first for relative names
+
+        Returns:
+            Prompt, or None if no such file exists
+        """
+        path = self.resolve(filename, base_dir)
+        if path is None:
+            return None
+        prompt = self._prompts.get(path)
+        now = time.monotonic()
+        if prompt is not None and now - self._checked[path] < self.check_interval:
+            return prompt
+        with self._lock:
+            prompt = self._prompts.get(path)
+            try:
+                self._checked[path] = now
+                if prompt is None:
+                    return self._load(path)
+                if os.stat(path).st_mtime_ns != prompt.mtime_ns:
+                    self.reloads += 1
+                    print(f"Reloaded prompt {prompt.name}")
+                    return self._load(path)
+            except OSError as e:
+                # Keep serving the last good version of a file that went away
+                if prompt is None:
+                    print(f"ERROR loading instruction file {path}: {e}")
+                    return None
+            return prompt
+
+    def text(self, filename: str, default: str = "Default instruction.", base_dir: str = None) -> str:
+        """Text of a prompt, or `default` (with a one-time warning) if it does not exist."""
+        prompt = self.get(filename, base_dir)
+        if prompt is not None:
+            return prompt.text
+        if filename not in self._missing:
+            self._missing.add(filename)
+            print(f"WARNING: Instruction file not found: {filename}. Using default.")
+        return default
+
+    def provider(self, filename: str) -> Callable[..., str]:
+        """ADK instruction provider that serves the current version of a prompt."""
+        return lambda context: self.text(filename)
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        """Hash and token count of every loaded prompt."""
+        return {
+            prompt.name: {"hash": prompt.hash, "tokens": prompt.tokens}
+            for prompt in sorted(self._prompts.values(), key=lambda prompt: prompt.name)
+        }
+
+# Global prompt registry
+_prompt_registry = None
+
+def get_prompt_registry() -> PromptRegistry:
+    """Get the global prompt registry, loading it on first use."""
+    global _prompt_registry
+    if _prompt_registry is None:
+        _prompt_registry = PromptRegistry()
+    return _prompt_registry
+
+def load_instruction_from_file(filename: str, default_instruction: str = "Default instruction.",
+                               base_dir: str = None) -> str:
+    """Instruction text from the prompt registry.
+
+    Args:
+        filename: Instruction file (see PromptRegistry)
+        default_instruction: Returned if the file does not exist
+        base_dir: Directory tried first for relative names
+    """
+    return get_prompt_registry().text(filename, default_instruction, base_dir)
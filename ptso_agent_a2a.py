@@ -6,39 +6,114 @@ Updated to consume remote A2A agents instead of local sub-agents.
 from google.adk.agents.llm_agent import LlmAgent
 from a2a.types import AgentCard, AgentCapabilities, AgentSkill
 from google.adk.agents.remote_a2a_agent import RemoteA2aAgent
+from google.adk.agents.base_agent import BaseAgent
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.runners import Runner
 from google.adk.a2a.utils.agent_to_a2a import to_a2a
 from dotenv import load_dotenv
-from utils.util import load_instruction_from_file
+from prompt_registry import get_prompt_registry
 from llm_config import get_llm_config, print_llm_info
+from model_router import get_agent_model, get_model_router
+from admission import AdmissionRejected, Priority, current_priority, get_admission_controller
+from resilience import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceeded, deadline_model_callback,
+    iterate_with_deadline, set_deadline, with_deadline
+)
+from city_resolver import get_city_resolver
+from query_cache import get_query_cache
+from sql_workload import get_sql_workload
+from session_store import build_call_runner, get_session_service, record_turn, run_agent
+from weather_shards import WeatherShardRouter, replica_urls
+from tenancy import DEFAULT_TENANT, current_tenant, request_meta, set_tenant
+from schemas import (
+    OUTFIT_INTENT, RecommendationRequest, WardrobeRecommendation, WeatherReading, has_other_requirements,
+    match_style, parse_structured
+)
+from recommendation_scheduler import format_recommendation
+from workflow import IntentRouter, Workflow, WorkflowError, agent_node, function_node
+from typing import Optional, Union
 import asyncio
 import os
+import re
+import time
+from collections import Counter, deque
 
 load_dotenv()
 
+# Requests this pattern or OUTFIT_INTENT matches (with a resolvable city) run a fixed workflow instead of LLM routing
+WEATHER_INTENT = re.compile(r"\b(weather|temperature|temp|how (hot|cold|warm))\b", re.IGNORECASE)
+
+def format_weather(reading: WeatherReading) -> str:
+    """Render a weather reading for a weather-only request."""
+    text = f"**{reading.city}**: {reading.temperature:g}°{reading.unit}"
+    if reading.recorded_at is not None:
+        text += f" (recorded {reading.recorded_at.isoformat(timespec='minutes')})"
+    return text
+
 class PTSOAgentA2A:
     """PTSO Agent that coordinates with remote A2A agents."""
     
-    def __init__(self, weather_agent_url: str = None, wardrobe_agent_url: str = None):
+    def __init__(self, weather_agent_url: str = None, wardrobe_agent_url: str = None,
+                 deployment_mode: str = None):
         """Initialize the PTSO agent with remote A2A agent URLs.
         
         Args:
-            weather_agent_url: URL of the weather A2A agent service
+            weather_agent_url: URL of the weather A2A agent service, used when
+                WEATHER_AGENT_URLS does not list replicas
             wardrobe_agent_url: URL of the wardrobe A2A agent service
+            deployment_mode: "distributed" (remote A2A services) or "colocated"
+                (sub-agents run in this process); defaults to DEPLOYMENT_MODE
         """
-        self.weather_agent_url = weather_agent_url or os.getenv('WEATHER_AGENT_URL', 'http://localhost:8001')
-        self.wardrobe_agent_url = wardrobe_agent_url or os.getenv('WARDROBE_AGENT_URL', 'http://localhost:8002')
-        
-        # Create remote A2A agents using agent card URLs (like in L5.py example)
-        self.weather_agent = RemoteA2aAgent(
-            name="weather_agent",
-            description="Fetches current weather data from PostgreSQL database",
-            agent_card=f"{self.weather_agent_url}/.well-known/agent-card.json"
-        )
-        self.wardrobe_agent = RemoteA2aAgent(
-            name="wardrobe_agent", 
-            description="Provides clothing recommendations based on temperature and weather conditions",
-            agent_card=f"{self.wardrobe_agent_url}/.well-known/agent-card.json"
-        )
+        self.deployment_mode = (deployment_mode or os.getenv('DEPLOYMENT_MODE', 'distributed')).lower()
+        self.admission = get_admission_controller()
+        self.weather_breaker = CircuitBreaker("weather_agent")
+        self.wardrobe_breaker = CircuitBreaker("wardrobe_agent")
+        self.hop_latencies = {"weather_agent": deque(maxlen=1000), "wardrobe_agent": deque(maxlen=1000)}
+        self.city_resolver = get_city_resolver()
+        self.weather_shards = None
+        self._runners = {}
+        
+        if self.deployment_mode == "colocated":
+            # Run the sub-agents in this process. They run through a Runner like the
+            # remote agents, skip the HTTP/JSON-RPC hops and card fetches, and hand
+            # state such as state['temperature'] over as Python objects.
+            from weather_agent_a2a import build_weather_agent
+            from wardrobe_agent_a2a import build_wardrobe_agent
+            self.weather_agent_url = "in-process"
+            self.wardrobe_agent_url = "in-process"
+            self.weather_agent = build_weather_agent()
+            self.wardrobe_agent = build_wardrobe_agent()
+            self.weather_agent.before_agent_callback = self.weather_breaker.agent_callback
+            self.wardrobe_agent.before_agent_callback = self.wardrobe_breaker.agent_callback
+        else:
+            self.wardrobe_agent_url = wardrobe_agent_url or os.getenv('WARDROBE_AGENT_URL', 'http://localhost:8002')
+            
+            # Create remote A2A agents using agent card URLs (like in L5.py example).
+            # The request deadline and tenant travel in A2A metadata and open circuits skip the hop.
+            # Weather lookups are sharded by city across the weather agent replicas.
+            self.weather_shards = WeatherShardRouter(
+                replica_urls(weather_agent_url),
+                lambda url, breaker: RemoteA2aAgent(
+                    name="weather_agent",
+                    description="Fetches current weather data from PostgreSQL database",
+                    agent_card=f"{url}/.well-known/agent-card.json",
+                    a2a_request_meta_provider=request_meta,
+                    before_agent_callback=breaker.agent_callback
+                ),
+                cities=lambda: list(self.city_resolver.cities.values())
+            )
+            self.weather_shards.on_rebalance = self._warm_weather_shard
+            self.weather_agent_url = ",".join(self.weather_shards.replicas)
+            # The LLM-orchestrated path cannot see the city before delegating, so it uses the first replica
+            self.weather_agent = self.weather_shards.primary.agent
+            self.weather_breaker = self.weather_shards.primary.breaker
+            self.wardrobe_agent = RemoteA2aAgent(
+                name="wardrobe_agent", 
+                description="Provides clothing recommendations based on temperature and weather conditions",
+                agent_card=f"{self.wardrobe_agent_url}/.well-known/agent-card.json",
+                a2a_request_meta_provider=request_meta,
+                before_agent_callback=self.wardrobe_breaker.agent_callback
+            )
         
         # Get LLM configuration
         llm_config = get_llm_config()
@@ -47,55 +122,289 @@ class PTSOAgentA2A:
         # Create the main PTSO agent with remote A2A agents as sub-agents
         self.ptso_agent = LlmAgent(
             name="ptso_agent",
-            model=llm_config.get_model_name(),
-            instruction=load_instruction_from_file("agent_instructions/ptso_agent_instructions.txt"),
+            model=get_agent_model("ptso_agent"),
+            instruction=get_prompt_registry().provider("agent_instructions/ptso_agent_instructions.txt"),
             description="You are an agent that can help a user with their wardrobe by coordinating with specialized weather and wardrobe agents.",
-            sub_agents=[self.weather_agent, self.wardrobe_agent]
+            sub_agents=[self.weather_agent, self.wardrobe_agent],
+            before_model_callback=deadline_model_callback
         )
+        self.ptso_runner = build_call_runner(self.ptso_agent)
+        
+        # Known intents run as deterministic workflows: the weather lookup and
+        # style detection run concurrently, and no LLM decides which agent to call
+        self.workflow_routing = os.getenv('WORKFLOW_ROUTING', 'true').lower() == 'true'
+        self.workflows = {
+            "outfit": Workflow("outfit", [
+                agent_node("weather", self._weather_node, ["city"], "temperature"),
+                function_node("style", lambda user_input: match_style(user_input), ["user_input"]),
+                agent_node("wardrobe", self._wardrobe_node, ["temperature", "style"], "wardrobe_recommendations"),
+                function_node("format", format_recommendation, ["wardrobe_recommendations"], "response"),
+            ]),
+            "weather": Workflow("weather", [
+                agent_node("weather", self._weather_node, ["city"], "temperature"),
+                function_node("format", format_weather, ["temperature"], "response"),
+            ]),
+        }
+        self.intent_router = IntentRouter()
+        # Occasions and constraints the workflow cannot honour are left to the LLM
+        self.intent_router.add("outfit", lambda text: None if has_other_requirements(text)
+                               else self._match_intent(OUTFIT_INTENT, text), self.workflows["outfit"])
+        self.intent_router.add("weather", lambda text: self._match_intent(WEATHER_INTENT, text), self.workflows["weather"])
+        self.recent_runs = deque(maxlen=50)
+        # Failed workflow runs per intent that the LLM agents answered instead
+        self.workflow_fallbacks = Counter()
+    
+    def _runner(self, agent: BaseAgent) -> Runner:
+        """Runner that invokes a sub-agent directly, built on first use."""
+        runner = self._runners.get(id(agent))
+        if runner is None or runner.agent is not agent:
+            runner = self._runners[id(agent)] = build_call_runner(agent)
+        return runner
+    
+    async def _call_remote_agent(self, agent: BaseAgent, breaker: CircuitBreaker, message: str) -> list:
+        """Call a sub-agent within the request deadline and its circuit breaker.
+        
+        The agent is a RemoteA2aAgent, or a local LlmAgent in co-located mode,
+        and runs through a Runner on a fresh session of the current tenant.
+        
+        Returns:
+            list: Final-response events of the agent
+        
+        Raises:
+            CircuitOpenError: If the agent's circuit is open
+            DeadlineExceeded: If the request deadline passes first
+            AdmissionRejected: If the agent's admission queue is full
+        """
+        async def collect():
+            response_parts = []
+            async with self.admission.slot(agent.name):
+                async for event in run_agent(self._runner(agent), current_tenant.get(), message):
+                    # Tool calls and partial chunks precede the agent's answer
+                    if event.is_final_response():
+                        response_parts.append(event)
+            return response_parts
+        
+        # A rejection by the admission queue says nothing about the agent's health
+        with breaker.guard(neutral=(AdmissionRejected,)):
+            start = time.monotonic()
+            response = await with_deadline(collect())
+            self.hop_latencies[agent.name].append(time.monotonic() - start)
+        return response
+    
+    async def _call_weather_agent(self, city: str, message: str) -> list:
+        """Call the weather replica that owns a city, falling back along the ring.
+        
+        Raises:
+            CircuitOpenError: If every replica's circuit is open
+            DeadlineExceeded: If the request deadline passes first
+            AdmissionRejected: If the weather agent's admission queue is full
+        """
+        if self.weather_shards is None:
+            print(f"Calling Weather Agent at {self.weather_agent_url} for city: {city}")
+            return await self._call_remote_agent(self.weather_agent, self.weather_breaker, message)
+        error = None
+        for replica in self.weather_shards.route(city):
+            try:
+                print(f"Calling Weather Agent at {replica.url} for city: {city}")
+                parts = await self._call_remote_agent(replica.agent, replica.breaker, message)
+            except (AdmissionRejected, DeadlineExceeded):
+                raise
+            except Exception as e:
+                print(f"Weather replica {replica.url} failed: {e}")
+                error = e
+                continue
+            self.weather_shards.record(city, replica)
+            return parts
+        raise error
+    
+    async def _warm_weather_shard(self, cities: list):
+        """Look up cities that moved to a new weather replica, so its cache holds them."""
+        # Warming must never crowd out interactive requests
+        current_priority.set(Priority.BATCH)
+        for city in cities:
+            try:
+                await self.get_weather_data(city)
+            except AdmissionRejected:
+                return
     
-    async def get_weather_data(self, city: str) -> dict:
+    async def get_weather_data(self, city: str) -> Union[WeatherReading, dict]:
         """Get weather data from the remote weather A2A agent.
         
         Args:
             city: City name to get weather for
             
         Returns:
-            dict: Weather data including temperature
+            WeatherReading: Latest reading, or an error dict
         """
+        city = self.city_resolver.resolve(city) or city
         try:
-            print(f"Calling Weather Agent at {self.weather_agent_url} for city: {city}")
-            # Use the correct method for RemoteA2aAgent - iterate through async generator
-            response_parts = []
-            async for part in self.weather_agent.run_async(f"Get weather data for {city}"):
-                response_parts.append(part)
-            response = "".join(str(part) for part in response_parts)
-            return response
+            parts = await self._call_weather_agent(city, f"Get weather data for {city}")
+            reading = parse_structured(WeatherReading, parts)
+            if reading is None:
+                return {"error": "Weather agent returned an unexpected payload"}
+            return reading
+        except (AdmissionRejected, DeadlineExceeded):
+            raise
+        except CircuitOpenError as e:
+            print(f"Skipping weather agent: {e}")
+            return {"error": "Weather agent is temporarily unavailable"}
         except Exception as e:
             print(f"Error getting weather data: {e}")
             return {"error": "Failed to get weather data"}
     
-    async def get_wardrobe_recommendations(self, temperature: float, city: str = None) -> dict:
+    async def get_wardrobe_recommendations(self, temperature: float, city: str = None,
+                                           style: str = None) -> Union[WardrobeRecommendation, dict]:
         """Get wardrobe recommendations from the remote wardrobe A2A agent.
         
         Args:
             temperature: Current temperature
             city: Optional city name for context
+            style: Optional style filter (a style_type value)
             
         Returns:
-            dict: Wardrobe recommendations
+            WardrobeRecommendation: Recommended items, or an error dict
         """
         try:
             print(f"Calling Wardrobe Agent at {self.wardrobe_agent_url} for temp: {temperature}, city: {city}")
-            # Use the correct method for RemoteA2aAgent - iterate through async generator
-            response_parts = []
-            async for part in self.wardrobe_agent.run_async(f"Get wardrobe recommendations for temperature {temperature} in {city or 'the current location'}"):
-                response_parts.append(part)
-            response = "".join(str(part) for part in response_parts)
-            return response
+            # Send the reading as JSON so the wardrobe agent reads fields instead of prose
+            request = RecommendationRequest(
+                reading=WeatherReading(city=city or "the current location", temperature=temperature),
+                style=style
+            )
+            parts = await self._call_remote_agent(self.wardrobe_agent, self.wardrobe_breaker, request.model_dump_json())
+            recommendation = parse_structured(WardrobeRecommendation, parts)
+            if recommendation is None:
+                return {"error": "Wardrobe agent returned an unexpected payload"}
+            return recommendation
+        except (AdmissionRejected, DeadlineExceeded):
+            raise
+        except CircuitOpenError as e:
+            print(f"Skipping wardrobe agent: {e}")
+            return {"error": "Wardrobe agent is temporarily unavailable"}
         except Exception as e:
             print(f"Error getting wardrobe recommendations: {e}")
             return {"error": "Failed to get wardrobe recommendations"}
     
+    def _match_intent(self, pattern: re.Pattern, user_input: str) -> Optional[dict]:
+        """Initial workflow state if the request matches the intent and names a known city."""
+        if not pattern.search(user_input):
+            return None
+        city = self.city_resolver.resolve(user_input)
+        if city is None:
+            return None
+        return {"user_input": user_input, "city": city}
+    
+    async def _weather_node(self, city: str) -> WeatherReading:
+        reading = await self.get_weather_data(city)
+        if not isinstance(reading, WeatherReading):
+            raise WorkflowError(reading["error"], "weather")
+        return reading
+    
+    async def _wardrobe_node(self, temperature: WeatherReading, style=None) -> WardrobeRecommendation:
+        recommendation = await self.get_wardrobe_recommendations(
+            temperature.temperature, temperature.city, style.value if style else None
+        )
+        if not isinstance(recommendation, WardrobeRecommendation):
+            raise WorkflowError(recommendation["error"], "wardrobe")
+        return recommendation
+    
+    async def run_workflow(self, user_input: str) -> Optional[str]:
+        """Answer a request with a deterministic workflow if its intent is known.
+        
+        Returns:
+            str: The response, or None if no workflow handles the request or
+                the workflow failed, so the LLM agents answer instead
+        
+        Raises:
+            AdmissionRejected: If a sub-agent's admission queue is full
+            DeadlineExceeded: If the request deadline passes
+        """
+        if not self.workflow_routing:
+            return None
+        routed = self.intent_router.route(user_input)
+        if routed is None:
+            return None
+        intent, workflow, initial = routed
+        try:
+            run = await workflow.run(**initial)
+        except WorkflowError as e:
+            if isinstance(e.__cause__, (AdmissionRejected, DeadlineExceeded)):
+                raise e.__cause__
+            print(f"Workflow {intent} failed, falling back to the agents: {e}")
+            self.workflow_fallbacks[intent] += 1
+            return None
+        self.recent_runs.append(dict(run.to_dict(), intent=intent))
+        return run.state["response"]
+    
+    @staticmethod
+    def _part_text(part) -> str:
+        """Extract the text of a response part or event."""
+        # Handle different types of response parts
+        if hasattr(part, 'text'):
+            return part.text or ""
+        content = getattr(part, 'content', None)
+        if content is not None:
+            parts = getattr(content, 'parts', None)
+            if parts is not None:
+                return "".join(p.text or "" for p in parts)
+            return str(content)
+        return str(part)
+    
+    async def stream_user_request(self, user_input: str):
+        """Stream the response to a user request as it is produced.
+        
+        Partial events from the agents (including streamed sub-agent output)
+        are forwarded as they arrive. A final event that repeats already
+        streamed partials is skipped.
+        
+        Args:
+            user_input: User's request (e.g., "What should I wear in Atlanta?")
+            
+        Yields:
+            str: Response text chunks
+        
+        Raises:
+            AdmissionRejected: If the LLM admission queue is full
+            DeadlineExceeded: If the request deadline passes
+        """
+        response = await self.run_workflow(user_input)
+        if response is not None:
+            yield response
+            return
+        
+        # Resolve the city up front so the agents query weather_data by its exact name
+        city = self.city_resolver.resolve(user_input)
+        if city is not None:
+            user_input = f"{user_input}\n\n[Resolved city: {city}. Use this exact name for the weather lookup.]"
+        
+        async with self.admission.slot("llm"):
+            streamed = False
+            # Use the main PTSO agent with sub-agents (like in L5.py example)
+            events = run_agent(self.ptso_runner, current_tenant.get(), user_input,
+                               RunConfig(streaming_mode=StreamingMode.SSE))
+            async for part in iterate_with_deadline(events):
+                text = self._part_text(part)
+                if getattr(part, 'partial', False):
+                    streamed = True
+                    if text:
+                        yield text
+                elif streamed:
+                    streamed = False
+                elif text:
+                    yield text
+    
+    def hop_metrics(self) -> dict:
+        """Sub-agent call latency percentiles, for comparing deployment modes."""
+        metrics = {"deployment_mode": self.deployment_mode}
+        for name, latencies in self.hop_latencies.items():
+            ordered = sorted(latencies)
+            metrics[name] = {
+                "calls": len(ordered),
+                "latency_p50": ordered[len(ordered) // 2] if ordered else 0.0,
+                "latency_p95": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] if ordered else 0.0
+            }
+        return metrics
+    
     async def process_user_request(self, user_input: str) -> str:
         """Process a user request by coordinating with remote A2A agents.
         
@@ -106,19 +415,9 @@ class PTSOAgentA2A:
             str: Formatted response with wardrobe recommendations
         """
         try:
-            # Use the main PTSO agent with sub-agents (like in L5.py example)
-            response_parts = []
-            async for part in self.ptso_agent.run_async(user_input):
-                # Handle different types of response parts
-                if hasattr(part, 'text'):
-                    response_parts.append(part.text)
-                elif hasattr(part, 'content'):
-                    response_parts.append(part.content)
-                else:
-                    response_parts.append(str(part))
-            response = "".join(response_parts)
-            return response
-            
+            return "".join([chunk async for chunk in self.stream_user_request(user_input)])
+        except (AdmissionRejected, DeadlineExceeded):
+            raise
         except Exception as e:
             return f"Sorry, I encountered an error processing your request: {str(e)}"
 
@@ -142,20 +441,90 @@ async def main():
 
 async def web_interface():
     """Simple web interface for the PTSO agent."""
-    from fastapi import FastAPI, HTTPException
+    from fastapi import FastAPI, HTTPException, Request
     from pydantic import BaseModel
+    from sse_starlette.sse import EventSourceResponse
+    import json
+    from typing import Optional
+    from datetime import datetime
+    from fastapi.responses import JSONResponse
+    from recommendation_scheduler import RecommendationScheduler, format_recommendation
+    from model_residency import get_residency_manager
+    from wardrobe_import import import_stream
+    import db
     import uvicorn
     
     app = FastAPI(title="PTSO Agent A2A", description="Wardrobe recommendation system with A2A protocol")
     
     class UserRequest(BaseModel):
         message: str
+        priority: Priority = Priority.INTERACTIVE
+        timeout: Optional[float] = None
+        user_id: Optional[str] = None
+        session_id: Optional[str] = None
     
     class AgentResponse(BaseModel):
         response: str
+        precomputed_at: Optional[datetime] = None
+        session_id: Optional[str] = None
     
     # Initialize the agent
     ptso_agent = await create_ptso_agent_a2a()
+    default_timeout = float(os.getenv('ASK_DEADLINE_SECONDS', 30))
+    scheduler = RecommendationScheduler(ptso_agent)
+    residency = get_residency_manager()
+    sessions = get_session_service()
+    
+    @app.on_event("startup")
+    async def start_background_tasks():
+        residency.start()
+        sessions.start()
+        ptso_agent.city_resolver.start()
+        if ptso_agent.weather_shards is not None:
+            ptso_agent.weather_shards.start()
+        if ptso_agent.deployment_mode == "colocated":
+            # The in-process sub-agents share one query cache, whose LISTEN
+            # connection also keeps the tenant catalogs current
+            from tenant_catalog import get_tenant_catalog_cache
+            get_tenant_catalog_cache()
+            get_query_cache().start()
+        if os.getenv('PRECOMPUTE_ENABLED', 'true').lower() == 'true':
+            scheduler.start()
+    
+    @app.on_event("shutdown")
+    async def stop_background_tasks():
+        await scheduler.stop()
+        await residency.stop()
+        await ptso_agent.city_resolver.stop()
+        if ptso_agent.weather_shards is not None:
+            await ptso_agent.weather_shards.stop()
+        await get_query_cache().stop()
+        await get_sql_workload().stop()
+        # Write queued session events before the pool closes
+        await sessions.stop()
+        await db.close_db_pool()
+    
+    def adopt_tenant(user_id: Optional[str]):
+        try:
+            set_tenant(user_id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    def lookup_precomputed(message: str):
+        # Recommendations are precomputed from the default tenant's wardrobe only
+        if current_tenant.get() != DEFAULT_TENANT:
+            return None
+        return scheduler.lookup(message, ptso_agent.city_resolver.resolve(message))
+    
+    async def remember(session_id: Optional[str], message: str, response: str):
+        # Conversations with a session id are kept in the session store, shared by every replica.
+        # Best effort: the answer is returned even if the turn cannot be recorded
+        if not session_id:
+            return
+        try:
+            await record_turn(ptso_agent.ptso_agent.name, current_tenant.get(), session_id, message, response)
+        except Exception as e:
+            print(f"Could not record turn of session {session_id}: {e}")
     
     @app.get("/")
     async def root():
@@ -163,19 +532,160 @@ async def web_interface():
     
     @app.get("/health")
     async def health():
-        return {"status": "healthy", "agent_urls": {
-            "weather": ptso_agent.weather_agent_url,
-            "wardrobe": ptso_agent.wardrobe_agent_url
-        }}
+        # Hold readiness back until local models are warm
+        return JSONResponse(status_code=200 if residency.ready else 503, content={
+            "status": "healthy" if residency.ready else "warming",
+            "deployment_mode": ptso_agent.deployment_mode,
+            "agent_urls": {
+                "weather": ptso_agent.weather_agent_url,
+                "wardrobe": ptso_agent.wardrobe_agent_url
+            },
+            "models": residency.snapshot()
+        })
+    
+    @app.get("/metrics")
+    async def metrics():
+        return {
+            "admission": ptso_agent.admission.snapshot(),
+            "circuits": {
+                "weather_agent": ptso_agent.weather_breaker.snapshot(),
+                "wardrobe_agent": ptso_agent.wardrobe_breaker.snapshot()
+            },
+            "model_tiers": get_model_router().snapshot(),
+            "hops": ptso_agent.hop_metrics(),
+            "weather_shards": ptso_agent.weather_shards.snapshot() if ptso_agent.weather_shards else None,
+            "city_resolver": ptso_agent.city_resolver.snapshot(),
+            "query_cache": get_query_cache().snapshot(),
+            "prompts": get_prompt_registry().snapshot(),
+            "sessions": sessions.snapshot(),
+            "workflows": {name: workflow.snapshot() for name, workflow in ptso_agent.workflows.items()},
+            "workflow_fallbacks": dict(ptso_agent.workflow_fallbacks),
+            "recent_workflow_runs": list(ptso_agent.recent_runs)
+        }
     
     @app.post("/ask", response_model=AgentResponse)
     async def ask_agent(request: UserRequest):
+        current_priority.set(request.priority)
+        set_deadline(request.timeout or default_timeout)
+        adopt_tenant(request.user_id)
+        precomputed = lookup_precomputed(request.message)
+        if precomputed is not None:
+            response = format_recommendation(precomputed.recommendation)
+            await remember(request.session_id, request.message, response)
+            return AgentResponse(response=response, precomputed_at=precomputed.computed_at,
+                                 session_id=request.session_id)
         try:
             response = await ptso_agent.process_user_request(request.message)
-            return AgentResponse(response=response)
+            await remember(request.session_id, request.message, response)
+            return AgentResponse(response=response, session_id=request.session_id)
+        except AdmissionRejected as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+        except DeadlineExceeded as e:
+            raise HTTPException(status_code=504, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
     
+    stream_buffer = int(os.getenv('STREAM_BUFFER_CHUNKS', 16))
+    _end_of_stream = object()
+    
+    async def open_stream(http_request: Request, message: str, priority: Priority, timeout: Optional[float],
+                          user_id: Optional[str], session_id: Optional[str]):
+        current_priority.set(priority)
+        set_deadline(timeout or default_timeout)
+        adopt_tenant(user_id)
+        precomputed = lookup_precomputed(message)
+        if precomputed is not None:
+            async def precomputed_events():
+                response = format_recommendation(precomputed.recommendation)
+                await remember(session_id, message, response)
+                yield {"event": "chunk", "data": response}
+                yield {"event": "done", "data": json.dumps({"precomputed_at": precomputed.computed_at.isoformat()})}
+            return EventSourceResponse(precomputed_events())
+        
+        # The producer runs the agents in its own task and blocks on the bounded
+        # queue when the client reads slowly, which stops pulling from the
+        # sub-agent streams until the client catches up
+        queue = asyncio.Queue(maxsize=stream_buffer)
+        
+        async def produce():
+            try:
+                async for chunk in ptso_agent.stream_user_request(message):
+                    await queue.put(chunk)
+                await queue.put(_end_of_stream)
+            except Exception as e:
+                await queue.put(e)
+        
+        producer = asyncio.create_task(produce())
+        try:
+            first = await queue.get()
+        except asyncio.CancelledError:
+            producer.cancel()
+            raise
+        if isinstance(first, AdmissionRejected):
+            raise HTTPException(status_code=429, detail=str(first), headers={"Retry-After": str(first.retry_after)})
+        if isinstance(first, DeadlineExceeded):
+            raise HTTPException(status_code=504, detail=str(first))
+        
+        async def events():
+            item = first
+            chunks = []
+            try:
+                while item is not _end_of_stream:
+                    if isinstance(item, Exception):
+                        status = 504 if isinstance(item, DeadlineExceeded) else 500
+                        yield {"event": "error", "data": json.dumps({"status": status, "detail": str(item)})}
+                        return
+                    if await http_request.is_disconnected():
+                        return
+                    chunks.append(item)
+                    yield {"event": "chunk", "data": item}
+                    item = await queue.get()
+                await remember(session_id, message, "".join(chunks))
+                yield {"event": "done", "data": "{}"}
+            finally:
+                # Client disconnects cancel the producer, which closes the sub-agent streams
+                producer.cancel()
+        
+        return EventSourceResponse(events())
+    
+    @app.get("/ask/stream")
+    async def ask_agent_stream_get(http_request: Request, message: str,
+                                   priority: Priority = Priority.INTERACTIVE, timeout: Optional[float] = None,
+                                   user_id: Optional[str] = None, session_id: Optional[str] = None):
+        return await open_stream(http_request, message, priority, timeout, user_id, session_id)
+    
+    @app.post("/ask/stream")
+    async def ask_agent_stream(http_request: Request, request: UserRequest):
+        return await open_stream(http_request, request.message, request.priority, request.timeout, request.user_id,
+                                 request.session_id)
+    
+    @app.get("/sessions/{session_id}")
+    async def get_session(session_id: str, user_id: Optional[str] = None):
+        adopt_tenant(user_id)
+        session = await sessions.get_session(app_name=ptso_agent.ptso_agent.name, user_id=current_tenant.get(),
+                                             session_id=session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+        return {
+            "session_id": session.id,
+            "turns": [
+                {"author": event.author, "text": "".join(part.text or "" for part in event.content.parts),
+                 "timestamp": event.timestamp}
+                for event in session.events if event.content and event.content.parts
+            ]
+        }
+    
+    @app.post("/wardrobe/import")
+    async def import_wardrobe(http_request: Request, format: str = "csv", batch_size: Optional[int] = None,
+                              dry_run: bool = False, user_id: Optional[str] = None):
+        # Bulk loads share the db limiter with interactive traffic, so run them as batch work
+        current_priority.set(Priority.BATCH)
+        if format not in ("csv", "ndjson"):
+            raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+        adopt_tenant(user_id)
+        report = await import_stream(http_request.stream(), format, batch_size, dry_run)
+        return report.to_dict()
+    
     # Run the web server
     port = int(os.getenv('PORT', 8000))
     config = uvicorn.Config(app, host="0.0.0.0", port=port, log_level="info")
@@ -12,22 +12,25 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+"""Compatibility wrapper around the repository's prompt registry.
+
+Relative instruction paths are resolved against ptso_agents/ first, where
+the agents' own instruction files live.
+"""
+
 import os
+import sys
+
+_PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_REPO_ROOT = os.path.dirname(_PACKAGE_DIR)
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+
+import prompt_registry
 
 
 def load_instruction_from_file(
     filename: str, default_instruction: str = "Default instruction."
 ) -> str:
-    """Reads instruction text from a file relative to this script."""
-    instruction = default_instruction
-    try:
-        # Construct path relative to the current script file (__file__)
-        filepath = os.path.join(os.path.dirname(__file__), filename)
-        with open(filepath, "r", encoding="utf-8") as f:
-            instruction = f.read()
-        print(f"Successfully loaded instruction from {filename}")
-    except FileNotFoundError:
-        print(f"WARNING: Instruction file not found: {filepath}. Using default.")
-    except Exception as e:
-        print(f"ERROR loading instruction file {filepath}: {e}. Using default.")
-    return instruction
\ No newline at end of file
+    """Reads instruction text through the shared prompt registry."""
+    return prompt_registry.load_instruction_from_file(filename, default_instruction, base_dir=_PACKAGE_DIR)
@@ -0,0 +1,292 @@
+"""
+Query Cache
+Result cache in front of the database tools. Entries are keyed by normalized
+SQL and parameters, remember the tables their plan reads, and are dropped as
+soon as Postgres announces a change to one of those tables over LISTEN/NOTIFY.
+"""
+
+import asyncio
+import json
+import os
+import re
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, Hashable, Iterable, List, Optional, Tuple
+
+import asyncpg
+
+import db
+
+# Channel the init.sql triggers notify, with the changed table as payload
+CHANNEL = "ptso_table_changes"
+# Tables with change triggers; results reading anything else are not cached
+TRACKED_TABLES = frozenset(("wardrobe", "weather_data"))
+
+_STRING_LITERAL = re.compile(r"('(?:[^']|'')*')")
+_WHITESPACE = re.compile(r"\s+")
+# Results of statements calling these change without any table changing
+_VOLATILE = re.compile(
+    r"\b(?:now|random|clock_timestamp|statement_timestamp|timeofday|nextval|currval|setval|"
+    r"gen_random_uuid|pg_\w+|txid_\w+)\s*\(|\b(?:current_date|current_time|current_timestamp|"
+    r"localtime|localtimestamp)\b",
+    re.IGNORECASE
+)
+
+def normalize(sql: str) -> str:
+    """Collapse whitespace outside string literals and drop a trailing semicolon."""
+    parts = _STRING_LITERAL.split(sql)
+    for i in range(0, len(parts), 2):
+        parts[i] = _WHITESPACE.sub(" ", parts[i])
+    return "".join(parts).strip().rstrip(";").rstrip()
+
+def plan_relations(plan: Any) -> FrozenSet[str]:
+    """Tables read by an EXPLAIN (FORMAT JSON) plan, with views expanded."""
+    found = set()
+
+    def walk(node):
+        if isinstance(node, dict):
+            if "Relation Name" in node:
+                found.add(node["Relation Name"])
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(json.loads(plan) if isinstance(plan, str) else plan)
+    return frozenset(found)
+
+class _Entry:
+    __slots__ = ("value", "tables", "size", "stored_at")
+
+    def __init__(self, value: Any, tables: FrozenSet[str], size: int):
+        self.value = value
+        self.tables = tables
+        self.size = size
+        self.stored_at = time.monotonic()
+
+class QueryCache:
+    """LRU cache of query results with table-level invalidation.
+
+    Results are only cached while the LISTEN connection is up, so a missed
+    notification can never leave a stale entry behind. Each table carries a
+    generation counter; a result read while one of its tables changed is not
+    stored.
+    """
+
+    def __init__(self, max_entries: int = None, max_bytes: int = None, ttl: float = None):
+        """Initialize the cache.
+
+        Args:
+            max_entries: Results kept in memory
+            max_bytes: Approximate memory bound for cached results
+            ttl: Seconds before an entry expires regardless of notifications
+        """
+        self.max_entries = max_entries or int(os.getenv('QUERY_CACHE_SIZE', 1000))
+        self.max_bytes = max_bytes or int(os.getenv('QUERY_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+        self.ttl = ttl or float(os.getenv('QUERY_CACHE_TTL', 300))
+        self.enabled = os.getenv('QUERY_CACHE_ENABLED', 'true').lower() == 'true'
+        self.listening = False
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._by_table: Dict[str, set] = {table: set() for table in TRACKED_TABLES}
+        # Tables read by each statement, learned from its plan once
+        self._relations: "OrderedDict[str, FrozenSet[str]]" = OrderedDict()
+        self._generations = Counter()
+        self.bytes = 0
+        self.hits = Counter()
+        self.misses = Counter()
+        self.invalidations = Counter()
+        self.evictions = 0
+        self.uncacheable = 0
+        self._table_listeners: List[Callable[[str], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def key(sql: str, args: Iterable[Any] = ()) -> Tuple[str, Tuple]:
+        """Cache key of a statement and its parameters."""
+        return normalize(sql), tuple(args)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Cached result for a key, or None on a miss."""
+        if not (self.enabled and self.listening):
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.stored_at >= self.ttl:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        for table in entry.tables:
+            self.hits[table] += 1
+        return entry.value
+
+    def generation(self) -> Dict[str, int]:
+        """Table generations to pass to `put` for a result about to be read."""
+        return dict(self._generations)
+
+    async def relations(self, conn: asyncpg.Connection, sql: str, args: Iterable[Any] = ()) -> Optional[FrozenSet[str]]:
+        """Tables a statement reads, or None if its result cannot be cached.
+
+        The plan is only fetched the first time a statement is seen.
+        """
+        if not (self.enabled and self.listening):
+            return None
+        normalized = normalize(sql)
+        if _VOLATILE.search(normalized):
+            self.uncacheable += 1
+            return None
+        tables = self._relations.get(normalized)
+        if tables is None:
+            tables = plan_relations(await conn.fetchval(f"EXPLAIN (FORMAT JSON) {normalized}", *args))
+            self._relations[normalized] = tables
+            while len(self._relations) > self.max_entries:
+                self._relations.popitem(last=False)
+        else:
+            self._relations.move_to_end(normalized)
+        # A plan without tables may still read them through a function such as query_to_xml
+        if not tables or not tables <= TRACKED_TABLES:
+            self.uncacheable += 1
+            return None
+        return tables
+
+    def put(self, key: Hashable, value: Any, tables: Optional[FrozenSet[str]], generation: Dict[str, int]):
+        """Store a result read after `generation` was taken.
+
+        Args:
+            key: Cache key from `key`
+            value: Result to cache
+            tables: Tables the result depends on, from `relations`
+            generation: Table generations taken before the read
+        """
+        if tables is None or not (self.enabled and self.listening):
+            return
+        for table in tables:
+            self.misses[table] += 1
+        if any(self._generations[table] != generation.get(table, 0) for table in tables):
+            return
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = _Entry(value, tables, size)
+        self.bytes += size
+        for table in tables:
+            self._by_table[table].add(key)
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        self.bytes -= entry.size
+        for table in entry.tables:
+            self._by_table[table].discard(key)
+
+    def add_table_listener(self, listener: Callable[[str], None]):
+        """Call `listener(table)` when a tracked table changes, or may have changed unseen.
+
+        Lets other in-memory caches, such as the tenant catalogs, share this
+        LISTEN connection.
+        """
+        self._table_listeners.append(listener)
+
+    def _table_changed(self, table: str):
+        for listener in self._table_listeners:
+            try:
+                listener(table)
+            except Exception as e:
+                print(f"Table change listener error: {e}")
+
+    def invalidate(self, table: str):
+        """Drop every result that depends on a table."""
+        self._generations[table] += 1
+        keys = self._by_table.get(table, ())
+        self.invalidations[table] += len(keys)
+        for key in list(keys):
+            self._remove(key)
+        self._table_changed(table)
+
+    def clear(self):
+        """Drop every result, e.g. when change notifications may have been missed."""
+        for table in TRACKED_TABLES:
+            self._generations[table] += 1
+        for key in list(self._entries):
+            self._remove(key)
+        for table in TRACKED_TABLES:
+            self._table_changed(table)
+
+    def _notified(self, conn, pid: int, channel: str, payload: str):
+        self.invalidate(payload)
+
+    async def run(self):
+        """Listen for table changes forever, reconnecting on failure."""
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(os.getenv('DATABASE_URL', db.DEFAULT_DATABASE_URL))
+                closed = asyncio.get_running_loop().create_future()
+                conn.add_termination_listener(lambda _: closed.done() or closed.set_result(None))
+                await conn.add_listener(CHANNEL, self._notified)
+                self.listening = True
+                await closed
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Query cache listener error: {e}")
+            finally:
+                # Changes made while not listening would go unseen
+                self.listening = False
+                self.clear()
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(5)
+
+    def start(self):
+        """Start the listener as a background task."""
+        # Table listeners need the notifications even when results are not cached
+        if (self.enabled or self._table_listeners) and self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Stop the listener."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Size, per-table hit ratios and invalidations."""
+        tables = {}
+        for table in sorted(TRACKED_TABLES):
+            lookups = self.hits[table] + self.misses[table]
+            tables[table] = {
+                "entries": len(self._by_table[table]),
+                "hits": self.hits[table],
+                "misses": self.misses[table],
+                "hit_ratio": self.hits[table] / lookups if lookups else 0.0,
+                "invalidated": self.invalidations[table]
+            }
+        return {
+            "enabled": self.enabled,
+            "listening": self.listening,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "evictions": self.evictions,
+            "uncacheable": self.uncacheable,
+            "tables": tables
+        }
+
+# Global query cache
+_query_cache = None
+
+def get_query_cache() -> QueryCache:
+    """Get the global query cache, creating it on first use."""
+    global _query_cache
+    if _query_cache is None:
+        _query_cache = QueryCache()
+    return _query_cache
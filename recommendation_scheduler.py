@@ -0,0 +1,254 @@
+"""
+Precomputed Recommendations
+Background scheduler that regenerates wardrobe recommendations when a tracked
+city's temperature moves into a different band.
+"""
+
+import asyncio
+import json
+import os
+import re
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from admission import AdmissionRejected, Priority, current_priority
+import db
+from schemas import (
+    OUTFIT_INTENT, Style, TemperatureBand, WardrobeRecommendation, WeatherReading, has_other_requirements,
+    match_style, temperature_band
+)
+
+class PrecomputedRecommendation:
+    """A stored recommendation and when it was produced."""
+
+    __slots__ = ("city", "style", "band", "recommendation", "computed_at", "reading_at")
+
+    def __init__(self, city: str, style: Optional[str], band: TemperatureBand,
+                 recommendation: WardrobeRecommendation, computed_at: datetime,
+                 reading_at: Optional[datetime] = None):
+        self.city = city
+        self.style = style
+        self.band = band
+        self.recommendation = recommendation
+        self.computed_at = computed_at
+        self.reading_at = reading_at
+
+def format_recommendation(recommendation: WardrobeRecommendation) -> str:
+    """Render a recommendation as Markdown for the /ask response."""
+    lines = [f"**{recommendation.city or 'Your location'}: {recommendation.temperature:g}° ({recommendation.band.value})**", ""]
+    for item in recommendation.items:
+        line = f"- {item.brand} {item.item_name} ({item.color}, {item.garment_type.value})"
+        if item.reason:
+            line += f": {item.reason}"
+        lines.append(line)
+    if recommendation.styling_notes:
+        lines += ["", recommendation.styling_notes]
+    return "\n".join(lines)
+
+def _parse_styles(value: str) -> List[Optional[str]]:
+    styles = []
+    for name in value.split(","):
+        name = name.strip()
+        styles.append(None if name.lower() in ("", "any") else Style(name).value)
+    return styles
+
+class RecommendationScheduler:
+    """Watches weather_data and keeps recommendations for tracked cities fresh.
+
+    Cities are tracked when listed in PRECOMPUTE_CITIES or when they are among
+    the PRECOMPUTE_TOP_N most requested cities. Recommendations are stored in
+    memory for O(1) lookup and in the precomputed_recommendations table so
+    replicas and restarts can reuse them.
+    """
+
+    def __init__(self, ptso_agent, cities: List[str] = None, styles: List[Optional[str]] = None,
+                 top_n: int = None, poll_interval: float = None):
+        """Initialize the scheduler.
+
+        Args:
+            ptso_agent: PTSOAgentA2A used to generate recommendations
+            cities: Cities that are always tracked
+            styles: Style filters to precompute (None means no filter)
+            top_n: Number of most-requested cities to track in addition
+            poll_interval: Seconds between weather_data polls
+        """
+        self.ptso_agent = ptso_agent
+        configured = cities if cities is not None else os.getenv('PRECOMPUTE_CITIES', 'Atlanta').split(",")
+        self.configured_cities = {city.strip().lower() for city in configured if city.strip()}
+        self.styles = styles if styles is not None else _parse_styles(
+            os.getenv('PRECOMPUTE_STYLES', 'any,Casual,Business Casual,Athletic'))
+        self.top_n = top_n if top_n is not None else int(os.getenv('PRECOMPUTE_TOP_N', 10))
+        self.poll_interval = poll_interval or float(os.getenv('PRECOMPUTE_POLL_INTERVAL', 30))
+
+        self.store: Dict[Tuple[str, Optional[str]], PrecomputedRecommendation] = {}
+        self.city_bands: Dict[str, TemperatureBand] = {}
+        self.city_names: Dict[str, str] = {}
+        self.request_counts = Counter()
+        # Latest reading of cities whose regeneration did not finish, retried on every poll
+        self.pending: Dict[str, WeatherReading] = {}
+        self.last_seen: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self._city_pattern: Optional[re.Pattern] = None
+
+    def tracked_cities(self) -> set:
+        """Lower-cased names of the cities currently being precomputed."""
+        popular = {city for city, _ in self.request_counts.most_common(self.top_n)}
+        return self.configured_cities | popular
+
+    def _match_city(self, text: str) -> Optional[str]:
+        if self._city_pattern is None:
+            if not self.city_names:
+                return None
+            names = sorted(self.city_names, key=len, reverse=True)
+            self._city_pattern = re.compile(r"\b(" + "|".join(re.escape(name) for name in names) + r")\b")
+        match = self._city_pattern.search(text.lower())
+        return match.group(1) if match else None
+
+    def lookup(self, user_input: str, city: str = None) -> Optional[PrecomputedRecommendation]:
+        """Find a precomputed recommendation for a request.
+
+        Only plain outfit requests are served: weather-only requests, styles
+        that are not precomputed, and occasions or constraints are misses.
+
+        Args:
+            user_input: The user's message
+            city: Canonical city, if already known
+
+        Returns:
+            PrecomputedRecommendation, or None on a miss
+        """
+        if not OUTFIT_INTENT.search(user_input) or has_other_requirements(user_input):
+            return None
+        city = city.lower() if city else self._match_city(user_input)
+        if city is None:
+            return None
+        self.request_counts[city] += 1
+        style = match_style(user_input)
+        if style is not None and style.value not in self.styles:
+            return None
+        return self.store.get((city, style.value if style else None))
+
+    async def load(self):
+        """Load previously materialized recommendations."""
+        rows = await db.fetch(
+            "SELECT city, style, band, payload, computed_at FROM precomputed_recommendations"
+        )
+        for row in rows:
+            style = row["style"] or None
+            recommendation = WardrobeRecommendation.model_validate(json.loads(row["payload"]))
+            self.store[(row["city"], style)] = PrecomputedRecommendation(
+                row["city"], style, TemperatureBand(row["band"]), recommendation, row["computed_at"]
+            )
+        # A city whose last regeneration was interrupted is redone on the first poll
+        for city in {city for city, _ in self.store}:
+            if self.styles and all((city, style) in self.store for style in self.styles):
+                self.city_bands[city] = self.store[(city, self.styles[0])].band
+
+    async def poll_once(self):
+        """Process weather readings that arrived since the last poll."""
+        if self.last_seen is None:
+            # First poll: only the latest reading of each city matters
+            rows = await db.fetch(
+                "SELECT * FROM (SELECT DISTINCT ON (name) name, temp, timestamp FROM weather_data "
+                "ORDER BY name, timestamp DESC) latest ORDER BY timestamp"
+            )
+        else:
+            rows = await db.fetch(
+                "SELECT name, temp, timestamp FROM weather_data "
+                "WHERE timestamp > $1 ORDER BY timestamp",
+                self.last_seen
+            )
+        latest: Dict[str, WeatherReading] = {}
+        for row in rows:
+            latest[row["name"].lower()] = WeatherReading(
+                city=row["name"], temperature=row["temp"], recorded_at=row["timestamp"]
+            )
+            self.last_seen = row["timestamp"]
+            if row["name"].lower() not in self.city_names:
+                self.city_names[row["name"].lower()] = row["name"]
+                self._city_pattern = None
+
+        tracked = self.tracked_cities()
+        for city, reading in {**self.pending, **latest}.items():
+            band = temperature_band(reading.temperature, reading.unit)
+            if city not in tracked or band == self.city_bands.get(city):
+                self.pending.pop(city, None)
+            elif await self.regenerate(reading, band):
+                self.pending.pop(city, None)
+            else:
+                self.pending[city] = reading
+
+    async def regenerate(self, reading: WeatherReading, band: TemperatureBand) -> bool:
+        """Recompute and store recommendations for every style filter of a city.
+
+        Entries from another band are dropped first, so a partial run never
+        serves a recommendation made for different weather. Styles already
+        computed for this band are kept, so a retry only does the rest.
+
+        Returns:
+            bool: Whether every style was computed
+        """
+        city = reading.city.lower()
+        for key in [key for key, entry in self.store.items() if key[0] == city and entry.band != band]:
+            del self.store[key]
+        await db.execute(
+            "DELETE FROM precomputed_recommendations WHERE city = $1 AND band <> $2", city, band.value
+        )
+        # Until every style is done the city has no complete band
+        self.city_bands.pop(city, None)
+        for style in self.styles:
+            if (city, style) in self.store:
+                continue
+            try:
+                result = await self.ptso_agent.get_wardrobe_recommendations(reading.temperature, reading.city, style)
+            except AdmissionRejected:
+                # Interactive traffic has priority; the city is retried on the next poll
+                return False
+            if not isinstance(result, WardrobeRecommendation):
+                print(f"Precompute failed for {reading.city}/{style or 'any'}: {result}")
+                return False
+            entry = PrecomputedRecommendation(
+                city, style, band, result, datetime.now(timezone.utc), reading.recorded_at
+            )
+            self.store[(city, style)] = entry
+            await db.execute(
+                "INSERT INTO precomputed_recommendations (city, style, band, payload, computed_at) "
+                "VALUES ($1, $2, $3, $4, $5) "
+                "ON CONFLICT (city, style) DO UPDATE SET band = EXCLUDED.band, "
+                "payload = EXCLUDED.payload, computed_at = EXCLUDED.computed_at",
+                city, style or "", band.value, result.model_dump_json(), entry.computed_at
+            )
+        self.city_bands[city] = band
+        print(f"Precomputed recommendations for {reading.city} ({band.value})")
+        return True
+
+    async def run(self):
+        """Poll weather_data forever."""
+        # Precompute work must never crowd out interactive requests
+        current_priority.set(Priority.BATCH)
+        try:
+            await self.load()
+        except Exception as e:
+            print(f"Could not load precomputed recommendations: {e}")
+        while True:
+            try:
+                await self.poll_once()
+            except Exception as e:
+                print(f"Recommendation scheduler error: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        """Start the scheduler as a background task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Stop the background task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
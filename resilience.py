@@ -0,0 +1,342 @@
+"""
+Resilience Utilities
+End-to-end deadlines carried across A2A hops and per-endpoint circuit breakers.
+"""
+
+import asyncio
+import json
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, Tuple
+
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from model_residency import mark_model_activity
+
+# Key under which the absolute deadline (unix epoch seconds) travels in
+# A2A request metadata, and the equivalent HTTP header
+DEADLINE_METADATA_KEY = "ptso_deadline"
+DEADLINE_HEADER = "x-ptso-deadline"
+
+# Below this many seconds of budget, downstream agents cap their output
+SHORT_BUDGET_SECONDS = float(os.getenv('DEADLINE_SHORT_BUDGET', 5.0))
+SHORT_BUDGET_MAX_TOKENS = int(os.getenv('DEADLINE_SHORT_BUDGET_MAX_TOKENS', 256))
+
+current_deadline: ContextVar[Optional[float]] = ContextVar("current_deadline", default=None)
+
+class DeadlineExceeded(Exception):
+    """Raised when the request deadline has passed."""
+
+class CircuitOpenError(Exception):
+    """Raised when a call is short-circuited by an open breaker."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit for {name} is open, retry after {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+def set_deadline(timeout: float) -> float:
+    """Start a deadline for the current request.
+
+    Args:
+        timeout: Seconds from now until the deadline
+
+    Returns:
+        float: Absolute deadline as unix epoch seconds
+    """
+    deadline = time.time() + timeout
+    current_deadline.set(deadline)
+    return deadline
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None if there is none."""
+    deadline = current_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.time()
+
+def check_deadline():
+    """Raise DeadlineExceeded if the current deadline has passed."""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+async def with_deadline(coro):
+    """Await a coroutine, bounded by the current deadline.
+
+    Raises:
+        DeadlineExceeded: If the deadline passes before the coroutine finishes
+    """
+    left = remaining()
+    if left is None:
+        return await coro
+    if left <= 0:
+        coro.close()
+        raise DeadlineExceeded("Request deadline exceeded")
+    try:
+        return await asyncio.wait_for(coro, timeout=left)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(f"Request deadline exceeded after waiting {left:.2f}s")
+
+async def iterate_with_deadline(agen):
+    """Iterate an async generator, bounding each step by the current deadline.
+
+    The generator is closed when the deadline passes or the consumer stops.
+
+    Raises:
+        DeadlineExceeded: If the deadline passes before the generator finishes
+    """
+    try:
+        while True:
+            left = remaining()
+            if left is not None and left <= 0:
+                raise DeadlineExceeded("Request deadline exceeded")
+            try:
+                # asyncio.timeout keeps the step in this task, unlike wait_for,
+                # so generators holding cancel scopes are not moved across tasks
+                async with asyncio.timeout(left):
+                    item = await agen.__anext__()
+            except StopAsyncIteration:
+                return
+            except TimeoutError:
+                raise DeadlineExceeded("Request deadline exceeded while streaming")
+            yield item
+    finally:
+        await agen.aclose()
+
+def deadline_request_meta(ctx, a2a_message) -> Dict[str, Any]:
+    """Request metadata provider for RemoteA2aAgent carrying the deadline."""
+    deadline = current_deadline.get()
+    if deadline is None:
+        return {}
+    return {DEADLINE_METADATA_KEY: deadline}
+
+def a2a_request_metadata(body: bytes) -> Dict[str, Any]:
+    """Message and request metadata of a JSON-RPC A2A request body, merged."""
+    try:
+        params = json.loads(body).get("params") or {}
+        metadata = dict((params.get("message") or {}).get("metadata") or {})
+        metadata.update(params.get("metadata") or {})
+    except (ValueError, AttributeError, TypeError):
+        return {}
+    return metadata
+
+async def read_body(receive) -> bytes:
+    """Read a complete ASGI request body."""
+    chunks = []
+    more_body = True
+    while more_body:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        more_body = message.get("more_body", False)
+    return b"".join(chunks)
+
+def replay_body(body: bytes, receive):
+    """ASGI receive callable that replays an already read body."""
+    replayed = False
+
+    async def replay():
+        nonlocal replayed
+        if not replayed:
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return replay
+
+def _extract_deadline(body: bytes) -> Optional[float]:
+    """Find the deadline in a JSON-RPC A2A request body."""
+    value = a2a_request_metadata(body).get(DEADLINE_METADATA_KEY)
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+class DeadlineMiddleware:
+    """ASGI middleware that adopts the caller's deadline for an A2A request.
+
+    Requests whose deadline has already passed are rejected with a JSON-RPC
+    error before any agent work starts.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        body = await read_body(receive)
+        deadline = _extract_deadline(body)
+        if deadline is None:
+            header = dict(scope.get("headers") or []).get(DEADLINE_HEADER.encode())
+            try:
+                deadline = float(header) if header else None
+            except ValueError:
+                # A malformed header is ignored rather than failing the request
+                deadline = None
+
+        if deadline is not None and deadline <= time.time():
+            try:
+                request_id = json.loads(body).get("id")
+            except (ValueError, AttributeError):
+                request_id = None
+            error = json.dumps({
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "error": {"code": -32000, "message": "Deadline exceeded before processing"}
+            }).encode()
+            await send({"type": "http.response.start", "status": 200,
+                        "headers": [(b"content-type", b"application/json")]})
+            await send({"type": "http.response.body", "body": error})
+            return
+
+        if deadline is not None:
+            current_deadline.set(deadline)
+
+        await self.app(scope, replay_body(body, receive), send)
+
+def deadline_model_callback(callback_context, llm_request) -> Optional[LlmResponse]:
+    """before_model_callback that skips or shortens LLM calls near the deadline.
+
+    Calls that go ahead are recorded as model activity, so the residency
+    manager only sends keep-warm generations while agent traffic is idle.
+    """
+    left = remaining()
+    if left is None:
+        mark_model_activity()
+        return None
+    if left <= 0:
+        return LlmResponse(content=types.Content(
+            role="model",
+            parts=[types.Part(text="Deadline exceeded; request skipped.")]
+        ))
+    if left < SHORT_BUDGET_SECONDS:
+        if llm_request.config is None:
+            llm_request.config = types.GenerateContentConfig()
+        current = llm_request.config.max_output_tokens
+        llm_request.config.max_output_tokens = min(current or SHORT_BUDGET_MAX_TOKENS, SHORT_BUDGET_MAX_TOKENS)
+    mark_model_activity()
+    return None
+
+class CircuitBreaker:
+    """Per-endpoint circuit breaker.
+
+    Opens after `failure_threshold` consecutive failures, rejects calls for
+    `reset_timeout` seconds, then lets a single trial call through.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = None, reset_timeout: float = None):
+        """Initialize the circuit breaker.
+
+        Args:
+            name: Endpoint name used in errors and metrics
+            failure_threshold: Consecutive failures before the circuit opens
+            reset_timeout: Seconds the circuit stays open before a trial call
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold or int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 5))
+        self.reset_timeout = reset_timeout or float(os.getenv('CIRCUIT_RESET_TIMEOUT', 30.0))
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.short_circuited = 0
+        self._trial_in_flight = False
+
+    def before_call(self):
+        """Check whether a call may proceed.
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+        """
+        if self.state == self.OPEN:
+            elapsed = time.monotonic() - self.opened_at
+            if elapsed < self.reset_timeout:
+                self.short_circuited += 1
+                raise CircuitOpenError(self.name, self.reset_timeout - elapsed)
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._trial_in_flight:
+                self.short_circuited += 1
+                raise CircuitOpenError(self.name, self.reset_timeout)
+            self._trial_in_flight = True
+
+    def record_success(self):
+        """Record a successful call and close the circuit."""
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def release(self):
+        """Record a call that was turned away before reaching the agent.
+
+        It says nothing about the agent's health, so only the half-open
+        trial slot is freed for the next call.
+        """
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        """Record a failed call, opening the circuit if needed."""
+        self._trial_in_flight = False
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    @contextmanager
+    def guard(self, neutral: Tuple[type, ...] = ()):
+        """Run one call through the breaker and record its outcome.
+
+        A normal exit records a success and an exception records a failure.
+        Exceptions in `neutral`, and cancellation or other BaseExceptions, say
+        nothing about the endpoint's health: they only free the half-open
+        trial slot, so a cancelled trial call cannot leave the circuit stuck.
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+        """
+        self.before_call()
+        try:
+            yield
+        except neutral:
+            self.release()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:
+            self.release()
+            raise
+        self.record_success()
+
+    def is_available(self) -> bool:
+        """Whether a call would currently be allowed, without reserving it."""
+        if self.state == self.OPEN:
+            return time.monotonic() - self.opened_at >= self.reset_timeout
+        return not (self.state == self.HALF_OPEN and self._trial_in_flight)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current breaker state."""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "short_circuited": self.short_circuited,
+        }
+
+    def agent_callback(self, callback_context) -> Optional[types.Content]:
+        """before_agent_callback that skips a sub-agent while its circuit is open."""
+        if self.is_available() and (remaining() is None or remaining() > 0):
+            return None
+        self.short_circuited += 1
+        return types.Content(
+            role="model",
+            parts=[types.Part(text=f"{self.name} is currently unavailable.")]
+        )
@@ -0,0 +1,214 @@
+"""
+Structured Payloads
+Typed schemas exchanged between the weather, wardrobe and PTSO agents.
+"""
+
+import json
+import re
+from datetime import datetime
+from enum import Enum
+from typing import Any, Iterable, List, Optional, Type, TypeVar
+
+from a2a.types import AgentExtension
+from pydantic import BaseModel, Field, ValidationError
+
+JSON_MIME_TYPE = "application/json"
+
+# Extension URIs advertising the payload schemas in the agent cards
+WEATHER_READING_SCHEMA_URI = "https://ptso-agent.dev/schemas/weather-reading/v1"
+WARDROBE_RECOMMENDATION_SCHEMA_URI = "https://ptso-agent.dev/schemas/wardrobe-recommendation/v1"
+RECOMMENDATION_REQUEST_SCHEMA_URI = "https://ptso-agent.dev/schemas/recommendation-request/v1"
+
+class Season(str, Enum):
+    """Mirror of the season_type Postgres ENUM."""
+    ALL_SEASON = "All Season"
+    SUMMER = "Summer"
+    FALL_WINTER = "Fall/Winter"
+    SPRING = "Spring"
+
+class Style(str, Enum):
+    """Mirror of the style_type Postgres ENUM."""
+    CASUAL = "Casual"
+    FORMAL = "Formal"
+    ATHLETIC = "Athletic"
+    BUSINESS = "Business"
+    BUSINESS_CASUAL = "Business Casual"
+    ESSENTIAL = "Essential"
+    STREETWEAR = "Streetwear"
+
+class GarmentType(str, Enum):
+    """Mirror of the garment_type_enum Postgres ENUM."""
+    T_SHIRT = "T-Shirt"
+    SHIRT = "Shirt"
+    POLO = "Polo"
+    SWEATER = "Sweater"
+    HOODIE = "Hoodie"
+    TANK_TOP = "Tank Top"
+    BLAZER = "Blazer"
+    JACKET = "Jacket"
+    COAT = "Coat"
+    VEST = "Vest"
+    PANTS = "Pants"
+    SHORTS = "Shorts"
+    JOGGER = "Jogger"
+    SNEAKERS = "Sneakers"
+    DRESS_SHOES = "Dress Shoes"
+    CAP = "Cap"
+    TIE = "Tie"
+
+class GarmentCategory(str, Enum):
+    """Mirror of the garment_category_enum Postgres ENUM."""
+    TOPS = "Tops"
+    BOTTOMS = "Bottoms"
+    FOOTWEAR = "Footwear"
+    OUTERWEAR = "Outerwear"
+    ACCESSORIES = "Accessories"
+
+class TemperatureBand(str, Enum):
+    """Temperature bands from the wardrobe agent's guidelines."""
+    HOT = "hot"
+    WARM = "warm"
+    MILD = "mild"
+    COOL = "cool"
+    COLD = "cold"
+
+def temperature_band(temperature: float, unit: str = "F") -> TemperatureBand:
+    """Classify a temperature into a band.
+
+    Args:
+        temperature: Temperature reading
+        unit: "F" (the weather pipeline stores imperial units) or "C"
+
+    Returns:
+        TemperatureBand: Band the temperature falls into
+    """
+    fahrenheit = temperature * 9 / 5 + 32 if unit.upper() == "C" else temperature
+    if fahrenheit > 77:
+        return TemperatureBand.HOT
+    if fahrenheit >= 68:
+        return TemperatureBand.WARM
+    if fahrenheit >= 59:
+        return TemperatureBand.MILD
+    if fahrenheit >= 50:
+        return TemperatureBand.COOL
+    return TemperatureBand.COLD
+
+# Longest first, so "Business Casual" wins over "Casual"
+_STYLES_BY_LENGTH = sorted(Style, key=lambda style: len(style.value), reverse=True)
+
+def match_style(text: str) -> Optional[Style]:
+    """Find the style a free-text request asks for, if any."""
+    lowered = text.lower()
+    return next((style for style in _STYLES_BY_LENGTH if style.value.lower() in lowered), None)
+
+OUTFIT_INTENT = re.compile(r"\b(wear|outfit|dress|clothes|clothing|put on|pack)\b", re.IGNORECASE)
+# Occasions and constraints that a recommendation made from the weather and a style alone ignores
+_REQUIREMENT_PATTERN = re.compile(
+    r"\b(occasion|wedding|funeral|interview|date|party|dinner|meeting|office|work|gym|hike|hiking|"
+    r"beach|trip|travel|concert|ceremony|gala|dress code|formal|without|except|avoid|instead|prefer|only)\b"
+    r"|\bfor (a|an|my|the|our|his|her|their)\b",
+    re.IGNORECASE
+)
+
+def has_other_requirements(text: str) -> bool:
+    """Whether a request names an occasion or constraint beyond the weather and a style."""
+    return _REQUIREMENT_PATTERN.search(text) is not None
+
+class WeatherReading(BaseModel):
+    """Latest weather reading for a city."""
+    city: str = Field(description="City name as stored in weather_data.name")
+    temperature: float = Field(description="Temperature reading")
+    unit: str = Field(default="F", description="Temperature unit, F or C")
+    recorded_at: Optional[datetime] = Field(default=None, description="Timestamp of the reading")
+
+class RecommendationRequest(BaseModel):
+    """Input to the wardrobe agent: a weather reading plus optional filters."""
+    reading: WeatherReading
+    style: Optional[Style] = Field(default=None, description="Restrict recommendations to this style")
+
+class RecommendedItem(BaseModel):
+    """A single wardrobe item in a recommendation."""
+    brand: str
+    item_name: str
+    color: str
+    garment_type: GarmentType
+    garment_category: Optional[GarmentCategory] = None
+    reason: Optional[str] = Field(default=None, description="Why the item suits the temperature")
+
+class WardrobeRecommendation(BaseModel):
+    """Outfit recommendation for a weather reading."""
+    city: Optional[str] = None
+    temperature: float
+    band: TemperatureBand
+    items: List[RecommendedItem] = Field(default_factory=list)
+    styling_notes: Optional[str] = Field(default=None, description="Combinations and care reminders")
+
+def schema_extension(uri: str, model: Type[BaseModel], description: str) -> AgentExtension:
+    """Describe a payload schema as an agent card extension."""
+    return AgentExtension(
+        uri=uri,
+        description=description,
+        required=False,
+        params={"mimeType": JSON_MIME_TYPE, "schema": model.model_json_schema()}
+    )
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+def _iter_parts(items: Iterable[Any]):
+    """Flatten ADK events, genai parts and A2A parts into individual parts."""
+    for item in items:
+        content = getattr(item, "content", None)
+        parts = getattr(content, "parts", None)
+        if parts:
+            yield from parts
+        else:
+            yield getattr(item, "root", item)
+
+def parse_structured(model: Type[ModelT], items: Iterable[Any]) -> Optional[ModelT]:
+    """Read a typed payload from the parts of an agent response.
+
+    Output recorded in an event's state delta (co-located agents) and A2A data
+    parts are used directly. Otherwise the text parts are joined and parsed as
+    JSON, tolerating a Markdown code fence around the document.
+
+    Args:
+        model: Schema to validate against
+        items: Events or parts yielded by the agent
+
+    Returns:
+        The validated payload, or None if the response does not match
+    """
+    items = list(items)
+    # In-process agents record their output in the event's state delta;
+    # use that object directly instead of re-parsing the text
+    for item in items:
+        state_delta = getattr(getattr(item, "actions", None), "state_delta", None) or {}
+        for value in state_delta.values():
+            if isinstance(value, model):
+                return value
+            if isinstance(value, dict):
+                try:
+                    return model.model_validate(value)
+                except ValidationError:
+                    continue
+
+    texts = []
+    for part in _iter_parts(items):
+        data = getattr(part, "data", None)
+        if isinstance(data, dict):
+            try:
+                return model.model_validate(data)
+            except ValidationError:
+                continue
+        text = getattr(part, "text", None)
+        if text:
+            texts.append(text)
+
+    text = "".join(texts).strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.find("\n") + 1:] if "\n" in text else text
+    try:
+        return model.model_validate(json.loads(text))
+    except (ValueError, ValidationError):
+        return None
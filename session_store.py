@@ -0,0 +1,487 @@
+"""
+Session Store
+ADK session service backed by the PTSO Postgres database, so conversation
+state survives restarts and is shared by every replica of a service.
+
+Appending an event only updates a local copy of the session and queues the
+write; a background task writes queued events and state in batches. Sessions
+are read through a small LRU cache, and state and events are stored as
+compact (and, above a size threshold, zlib-compressed) JSON in BYTEA columns.
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+import zlib
+from collections import Counter, OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from google.adk.agents.base_agent import BaseAgent
+from google.adk.agents.run_config import RunConfig
+from google.adk.artifacts.in_memory_artifact_service import InMemoryArtifactService
+from google.adk.auth.credential_service.in_memory_credential_service import InMemoryCredentialService
+from google.adk.errors.already_exists_error import AlreadyExistsError
+from google.adk.events.event import Event
+from google.adk.memory.in_memory_memory_service import InMemoryMemoryService
+from google.adk.runners import Runner
+from google.adk.sessions.base_session_service import BaseSessionService, GetSessionConfig, ListSessionsResponse
+from google.adk.sessions.in_memory_session_service import InMemorySessionService
+from google.adk.sessions.session import Session
+from google.adk.sessions.state import State
+from google.genai import types
+
+import db
+from admission import Priority, get_admission_controller
+
+# Encoded values start with a format byte
+_RAW = b"\x00"
+_ZLIB = b"\x01"
+# Smaller payloads are stored uncompressed; zlib does not pay off below this
+COMPRESS_MIN_BYTES = int(os.getenv('SESSION_COMPRESS_MIN_BYTES', 512))
+
+def encode(value: Any) -> bytes:
+    """Encode a JSON-serializable value for a BYTEA column."""
+    data = json.dumps(value, separators=(",", ":"), default=str).encode("utf-8")
+    if len(data) < COMPRESS_MIN_BYTES:
+        return _RAW + data
+    return _ZLIB + zlib.compress(data, 6)
+
+def decode(data: bytes) -> Any:
+    """Decode a value written by `encode`."""
+    data = bytes(data)
+    body = zlib.decompress(data[1:]) if data[:1] == _ZLIB else data[1:]
+    return json.loads(body)
+
+def split_state(state: Optional[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Split state into app, user and session scopes, dropping temp: keys."""
+    scopes = {"app": {}, "user": {}, "session": {}}
+    for key, value in (state or {}).items():
+        if key.startswith(State.APP_PREFIX):
+            scopes["app"][key[len(State.APP_PREFIX):]] = value
+        elif key.startswith(State.USER_PREFIX):
+            scopes["user"][key[len(State.USER_PREFIX):]] = value
+        elif not key.startswith(State.TEMP_PREFIX):
+            scopes["session"][key] = value
+    return scopes
+
+SessionKey = Tuple[str, str, str]
+
+class _Cached:
+    __slots__ = ("session", "app_state", "user_state", "loaded_at")
+
+    def __init__(self, session: Session, app_state: Dict[str, Any], user_state: Dict[str, Any]):
+        self.session = session
+        self.app_state = app_state
+        self.user_state = user_state
+        self.loaded_at = time.monotonic()
+
+class PostgresSessionService(BaseSessionService):
+    """Session service on the shared asyncpg pool with write-behind appends.
+
+    Sessions this replica has read or written are served from cache until
+    `cache_ttl` seconds after it last read or wrote them; after that they
+    are re-read so changes made by other replicas show up. Queued writes of
+    a session are flushed before it is re-read.
+    """
+
+    def __init__(self, cache_size: int = None, cache_ttl: float = None, flush_interval: float = None,
+                 batch_size: int = None):
+        """Initialize the service.
+
+        Args:
+            cache_size: Sessions kept in the local read-through cache
+            cache_ttl: Seconds a cached session is served without re-reading it
+            flush_interval: Seconds between write-behind flushes
+            batch_size: Queued events that trigger an early flush
+        """
+        self.cache_size = cache_size or int(os.getenv('SESSION_CACHE_SIZE', 256))
+        self.cache_ttl = cache_ttl if cache_ttl is not None else float(os.getenv('SESSION_CACHE_TTL', 5))
+        self.flush_interval = flush_interval or float(os.getenv('SESSION_FLUSH_INTERVAL', 0.05))
+        self.batch_size = batch_size or int(os.getenv('SESSION_FLUSH_BATCH', 200))
+        self._cache: "OrderedDict[SessionKey, _Cached]" = OrderedDict()
+        # Write-behind queue: events, session state to upsert, and app/user state keys
+        self._events: List[Tuple[SessionKey, str, float, bytes]] = []
+        self._dirty_sessions: Dict[SessionKey, Tuple[Dict[str, Any], float]] = {}
+        self._dirty_scopes: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        # Sessions with queued writes; the database copy of these is behind
+        self._pending_keys: set = set()
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = Counter()
+        self.flush_seconds = 0.0
+        self.append_seconds = 0.0
+
+    def _copy(self, app_name: str, user_id: str, cached: _Cached,
+              config: Optional[GetSessionConfig] = None) -> Session:
+        # Callers mutate the session they get, so hand out a copy with app and user state merged in
+        session = cached.session
+        events = session.events
+        if config is not None:
+            if config.num_recent_events:
+                events = events[-config.num_recent_events:]
+            if config.after_timestamp:
+                events = [event for event in events if event.timestamp >= config.after_timestamp]
+        state = dict(session.state)
+        state.update({State.APP_PREFIX + key: value for key, value in cached.app_state.items()})
+        state.update({State.USER_PREFIX + key: value for key, value in cached.user_state.items()})
+        return Session(id=session.id, app_name=app_name, user_id=user_id, state=state,
+                       events=list(events), last_update_time=session.last_update_time)
+
+    def _remember(self, key: SessionKey, cached: _Cached):
+        self._cache[key] = cached
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _queue_scopes(self, app_name: str, user_id: str, scopes: Dict[str, Dict[str, Any]]):
+        for scope_user, delta in (("", scopes["app"]), (user_id, scopes["user"])):
+            if not delta:
+                continue
+            self._dirty_scopes.setdefault((app_name, scope_user), {}).update(delta)
+            # Keep other cached sessions of the same app or user consistent
+            for (cached_app, cached_user, _), cached in self._cache.items():
+                if cached_app != app_name:
+                    continue
+                if not scope_user:
+                    cached.app_state.update(delta)
+                elif cached_user == scope_user:
+                    cached.user_state.update(delta)
+
+    def _wake(self):
+        if len(self._events) >= self.batch_size:
+            self._wakeup.set()
+
+    async def create_session(self, *, app_name: str, user_id: str, state: Optional[Dict[str, Any]] = None,
+                             session_id: Optional[str] = None) -> Session:
+        if session_id and session_id.strip():
+            session_id = session_id.strip()
+            key = (app_name, user_id, session_id)
+            if key in self._cache or key in self._pending_keys or await db.fetch(
+                    "SELECT 1 FROM adk_sessions WHERE app_name = $1 AND user_id = $2 AND id = $3", *key):
+                raise AlreadyExistsError(f"Session with id {session_id} already exists.")
+        else:
+            session_id = str(uuid.uuid4())
+            key = (app_name, user_id, session_id)
+        scopes = split_state(state)
+        app_state, user_state = await self._load_scopes(app_name, user_id)
+        now = time.time()
+        session = Session(id=session_id, app_name=app_name, user_id=user_id, state=scopes["session"],
+                          last_update_time=now)
+        cached = _Cached(session, app_state, user_state)
+        self._remember(key, cached)
+        self._queue_scopes(app_name, user_id, scopes)
+        self._dirty_sessions[key] = (session.state, now)
+        self._pending_keys.add(key)
+        self.stats["created"] += 1
+        # Write new sessions right away so other replicas can find them
+        self._wakeup.set()
+        return self._copy(app_name, user_id, cached)
+
+    async def get_session(self, *, app_name: str, user_id: str, session_id: str,
+                          config: Optional[GetSessionConfig] = None) -> Optional[Session]:
+        key = (app_name, user_id, session_id)
+        cached = self._cache.get(key)
+        if cached is not None and (key in self._pending_keys
+                                   or time.monotonic() - cached.loaded_at < self.cache_ttl):
+            self._cache.move_to_end(key)
+            self.stats["hits"] += 1
+            return self._copy(app_name, user_id, cached, config)
+        self.stats["misses"] += 1
+        cached = await self._load(key)
+        if cached is None:
+            self._cache.pop(key, None)
+            return None
+        self._remember(key, cached)
+        return self._copy(app_name, user_id, cached, config)
+
+    async def _load_scopes(self, app_name: str, user_id: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        rows = await db.fetch(
+            "SELECT user_id, key, value FROM adk_scoped_state WHERE app_name = $1 AND user_id IN ('', $2)",
+            app_name, user_id
+        )
+        app_state, user_state = {}, {}
+        for row in rows:
+            (user_state if row["user_id"] else app_state)[row["key"]] = decode(row["value"])
+        # Queued changes are newer than what is stored
+        app_state.update(self._dirty_scopes.get((app_name, ""), {}))
+        user_state.update(self._dirty_scopes.get((app_name, user_id), {}))
+        return app_state, user_state
+
+    async def _load(self, key: SessionKey) -> Optional[_Cached]:
+        app_name, user_id, session_id = key
+        if key in self._pending_keys:
+            await self.flush()
+        row = await db.fetch(
+            "SELECT state, update_time FROM adk_sessions WHERE app_name = $1 AND user_id = $2 AND id = $3",
+            *key
+        )
+        if not row:
+            return None
+        events = await db.fetch(
+            "SELECT event FROM adk_session_events WHERE app_name = $1 AND user_id = $2 AND session_id = $3 "
+            "ORDER BY timestamp, seq",
+            *key
+        )
+        app_state, user_state = await self._load_scopes(app_name, user_id)
+        session = Session(id=session_id, app_name=app_name, user_id=user_id, state=decode(row[0]["state"]),
+                          events=[Event.model_validate(decode(event["event"])) for event in events],
+                          last_update_time=row[0]["update_time"])
+        return _Cached(session, app_state, user_state)
+
+    async def list_sessions(self, *, app_name: str, user_id: Optional[str] = None) -> ListSessionsResponse:
+        await self.flush()
+        if user_id is None:
+            rows = await db.fetch("SELECT user_id, id, state, update_time FROM adk_sessions WHERE app_name = $1",
+                                  app_name)
+        else:
+            rows = await db.fetch(
+                "SELECT user_id, id, state, update_time FROM adk_sessions WHERE app_name = $1 AND user_id = $2",
+                app_name, user_id
+            )
+        scopes = {}
+        sessions = []
+        for row in rows:
+            if row["user_id"] not in scopes:
+                scopes[row["user_id"]] = await self._load_scopes(app_name, row["user_id"])
+            app_state, user_state = scopes[row["user_id"]]
+            session = Session(id=row["id"], app_name=app_name, user_id=row["user_id"], state=decode(row["state"]),
+                              last_update_time=row["update_time"])
+            sessions.append(self._copy(app_name, row["user_id"], _Cached(session, app_state, user_state)))
+        return ListSessionsResponse(sessions=sessions)
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        key = (app_name, user_id, session_id)
+        await self.flush()
+        self._cache.pop(key, None)
+        # Events go with the session through ON DELETE CASCADE
+        await db.execute("DELETE FROM adk_sessions WHERE app_name = $1 AND user_id = $2 AND id = $3", *key)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        start = time.perf_counter()
+        await super().append_event(session=session, event=event)
+        session.last_update_time = event.timestamp
+        key = (session.app_name, session.user_id, session.id)
+        cached = self._cache.get(key)
+        if cached is None:
+            cached = _Cached(Session(id=session.id, app_name=session.app_name, user_id=session.user_id),
+                             {}, {})
+            # Rebuild the stored copy from the caller's session, which holds every earlier event
+            scopes = split_state(session.state)
+            cached.session.state.update(scopes["session"])
+            cached.session.events.extend(session.events[:-1])
+            cached.app_state.update(scopes["app"])
+            cached.user_state.update(scopes["user"])
+            self._remember(key, cached)
+        stored = cached.session
+        stored.events.append(event)
+        stored.last_update_time = event.timestamp
+        # The local copy is current as of this write; a conversation's next turn needs no re-read
+        cached.loaded_at = time.monotonic()
+        if event.actions and event.actions.state_delta:
+            scopes = split_state(event.actions.state_delta)
+            stored.state.update(scopes["session"])
+            self._queue_scopes(session.app_name, session.user_id, scopes)
+        self._events.append((key, event.id, event.timestamp,
+                             encode(event.model_dump(mode="json", exclude_none=True))))
+        self._dirty_sessions[key] = (stored.state, event.timestamp)
+        self._pending_keys.add(key)
+        self.stats["appended"] += 1
+        self._wake()
+        self.append_seconds += time.perf_counter() - start
+        return event
+
+    async def flush(self):
+        """Write every queued event and state change in one transaction.
+
+        Sessions stay pending until the transaction commits, so a concurrent
+        get_session keeps serving the cached copy instead of the database's
+        older one.
+        """
+        async with self._flush_lock:
+            if not (self._events or self._dirty_sessions or self._dirty_scopes):
+                return
+            events, self._events = self._events, []
+            dirty_sessions, self._dirty_sessions = self._dirty_sessions, {}
+            dirty_scopes, self._dirty_scopes = self._dirty_scopes, {}
+            start = time.monotonic()
+            try:
+                pool = await db.get_db_pool()
+                async with get_admission_controller().slot("db", Priority.BATCH):
+                    async with pool.acquire() as conn:
+                        async with conn.transaction():
+                            # Sessions first, so their events have a row to reference
+                            await conn.executemany(
+                                "INSERT INTO adk_sessions (app_name, user_id, id, state, update_time) "
+                                "VALUES ($1, $2, $3, $4, $5) ON CONFLICT (app_name, user_id, id) "
+                                "DO UPDATE SET state = EXCLUDED.state, update_time = EXCLUDED.update_time",
+                                [(*key, encode(state), update_time)
+                                 for key, (state, update_time) in dirty_sessions.items()]
+                            )
+                            await conn.executemany(
+                                "INSERT INTO adk_session_events (app_name, user_id, session_id, id, timestamp, event) "
+                                "VALUES ($1, $2, $3, $4, $5, $6) ON CONFLICT DO NOTHING",
+                                [(*key, event_id, timestamp, data) for key, event_id, timestamp, data in events]
+                            )
+                            # One row per key, so replicas only overwrite the keys they changed
+                            await conn.executemany(
+                                "INSERT INTO adk_scoped_state (app_name, user_id, key, value) VALUES ($1, $2, $3, $4) "
+                                "ON CONFLICT (app_name, user_id, key) DO UPDATE SET value = EXCLUDED.value",
+                                [(app_name, user_id, name, encode(value))
+                                 for (app_name, user_id), delta in dirty_scopes.items()
+                                 for name, value in delta.items()]
+                            )
+            except asyncio.CancelledError:
+                self._requeue(events, dirty_sessions, dirty_scopes)
+                raise
+            except Exception as e:
+                self._requeue(events, dirty_sessions, dirty_scopes)
+                self.stats["flush_errors"] += 1
+                print(f"Session store flush failed, will retry: {e}")
+                return
+            # Sessions written again during the flush are still behind
+            self._pending_keys = {key for key in self._pending_keys
+                                  if key not in dirty_sessions or key in self._dirty_sessions}
+            self.stats["flushes"] += 1
+            self.stats["events_written"] += len(events)
+            self.flush_seconds += time.monotonic() - start
+
+    def _requeue(self, events, dirty_sessions, dirty_scopes):
+        # Writes queued meanwhile are newer, so they win over the failed batch
+        self._events = events + self._events
+        self._dirty_sessions = {**dirty_sessions, **self._dirty_sessions}
+        for scope, delta in dirty_scopes.items():
+            self._dirty_scopes[scope] = {**delta, **self._dirty_scopes.get(scope, {})}
+
+    async def run(self):
+        """Flush queued writes every flush interval, or sooner when a batch fills."""
+        while True:
+            try:
+                async with asyncio.timeout(self.flush_interval):
+                    await self._wakeup.wait()
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        """Start the write-behind flusher as a background task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Stop the flusher and write whatever is still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Cache, queue and flush statistics."""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        flushes = self.stats["flushes"]
+        appended = self.stats["appended"]
+        return {
+            "backend": "postgres",
+            "cached_sessions": len(self._cache),
+            "hit_ratio": self.stats["hits"] / lookups if lookups else 0.0,
+            "queued_events": len(self._events),
+            "append_ms_avg": 1000 * self.append_seconds / appended if appended else 0.0,
+            "flush_ms_avg": 1000 * self.flush_seconds / flushes if flushes else 0.0,
+            "events_per_flush": self.stats["events_written"] / flushes if flushes else 0.0,
+            **dict(self.stats)
+        }
+
+class MemorySessionService(InMemorySessionService):
+    """ADK's in-process session service with the store's start/stop/snapshot API."""
+
+    def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"backend": "memory", "sessions": sum(len(users) for apps in self.sessions.values()
+                                                      for users in apps.values())}
+
+# Global session service
+_session_service = None
+
+def get_session_service() -> BaseSessionService:
+    """Get the global session service, chosen by SESSION_STORE ("postgres" or "memory")."""
+    global _session_service
+    if _session_service is None:
+        if os.getenv('SESSION_STORE', 'postgres').lower() == 'memory':
+            _session_service = MemorySessionService()
+        else:
+            _session_service = PostgresSessionService()
+    return _session_service
+
+def build_runner(agent: BaseAgent) -> Runner:
+    """Runner for an A2A service that keeps its sessions in the session store."""
+    return Runner(
+        app_name=agent.name,
+        agent=agent,
+        artifact_service=InMemoryArtifactService(),
+        session_service=get_session_service(),
+        memory_service=InMemoryMemoryService(),
+        credential_service=InMemoryCredentialService()
+    )
+
+def build_call_runner(agent: BaseAgent) -> Runner:
+    """Runner for calling an agent from code, on throwaway in-memory sessions."""
+    return Runner(
+        app_name=agent.name,
+        agent=agent,
+        session_service=InMemorySessionService()
+    )
+
+async def run_agent(runner: Runner, user_id: str, message: str,
+                    run_config: Optional[RunConfig] = None) -> AsyncIterator[Event]:
+    """Run an agent on one message in a fresh session and yield its events.
+
+    The session is deleted afterwards; callers that keep a conversation record
+    it with `record_turn`.
+    """
+    service = runner.session_service
+    session = await service.create_session(app_name=runner.app_name, user_id=user_id)
+    try:
+        async for event in runner.run_async(
+            user_id=user_id, session_id=session.id,
+            new_message=types.Content(role="user", parts=[types.Part(text=message)]),
+            run_config=run_config
+        ):
+            yield event
+    finally:
+        await service.delete_session(app_name=runner.app_name, user_id=user_id, session_id=session.id)
+
+async def record_turn(app_name: str, user_id: str, session_id: str, message: str, response: str) -> Session:
+    """Append a user message and the reply to a session, creating it if needed.
+
+    For callers that run agents on throwaway sessions, such as the PTSO web interface.
+    """
+    service = get_session_service()
+    session = await service.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
+    if session is None:
+        try:
+            session = await service.create_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        except AlreadyExistsError:
+            # A concurrent request created it first
+            session = await service.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
+    invocation_id = Event.new_id()
+    for author, role, text in (("user", "user", message), (app_name, "model", response)):
+        await service.append_event(session, Event(
+            invocation_id=invocation_id, author=author,
+            content=types.Content(role=role, parts=[types.Part(text=text)])
+        ))
+    return session
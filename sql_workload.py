@@ -0,0 +1,352 @@
+"""
+SQL Workload Capture
+Records the statements agents run against Postgres, groups them by fingerprint
+and advises on indexes from EXPLAIN (ANALYZE, BUFFERS) plans.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Tuple
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bin\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_LINE_COMMENT = re.compile(r"--[^\n]*")
+_BLOCK_COMMENT = re.compile(r"/\*.*?\*/", re.DOTALL)
+_WHITESPACE = re.compile(r"\s+")
+
+def fingerprint(sql: str) -> str:
+    """Normalize a statement so queries differing only in literals group together."""
+    sql = _BLOCK_COMMENT.sub(" ", _LINE_COMMENT.sub(" ", sql))
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _IN_LIST.sub("in (?)", sql)
+    return _WHITESPACE.sub(" ", sql).strip().rstrip(";").lower()
+
+class QueryStats:
+    """Aggregated executions of one fingerprint."""
+
+    __slots__ = ("fingerprint", "sample", "sample_args", "calls", "errors", "total_time", "max_time", "rows")
+
+    def __init__(self, fingerprint: str, sample: str, sample_args: List[Any] = ()):
+        self.fingerprint = fingerprint
+        self.sample = sample
+        # Parameters ($1, ...) of the sample, so the advisor can EXPLAIN it as it ran
+        self.sample_args = list(sample_args)
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.rows = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "fingerprint": self.fingerprint,
+            "sample": self.sample,
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_time": round(self.total_time, 6),
+            "mean_time": round(self.total_time / self.calls, 6) if self.calls else 0.0,
+            "max_time": round(self.max_time, 6),
+            "rows": self.rows
+        }
+
+class SqlWorkload:
+    """In-process workload recorder.
+
+    Every statement is aggregated by fingerprint. When SQL_WORKLOAD_LOG is set,
+    each execution is also appended as a JSON line so the advisor can combine
+    the workloads of several services. Lines are buffered and written in
+    batches on a worker thread, so recording never blocks the event loop on
+    file I/O.
+    """
+
+    def __init__(self, log_path: str = None, max_fingerprints: int = None):
+        """Initialize the recorder.
+
+        Args:
+            log_path: JSON lines file to append executions to
+            max_fingerprints: Distinct fingerprints kept in memory
+        """
+        self.log_path = log_path if log_path is not None else os.getenv('SQL_WORKLOAD_LOG')
+        self.max_fingerprints = max_fingerprints or int(os.getenv('SQL_WORKLOAD_MAX_FINGERPRINTS', 1000))
+        self.log_batch = int(os.getenv('SQL_WORKLOAD_LOG_BATCH', 100))
+        self.log_interval = float(os.getenv('SQL_WORKLOAD_LOG_INTERVAL', 1.0))
+        self.stats: Dict[str, QueryStats] = {}
+        self.dropped = 0
+        self._log_buffer: List[str] = []
+        self._log_buffered_at = 0.0
+        self._log_lock = threading.Lock()
+
+    def record(self, sql: str, duration: float, rows: int = 0, error: bool = False, source: str = None,
+               args: List[Any] = ()):
+        """Record one execution of a statement.
+
+        Args:
+            sql: Statement as sent to Postgres
+            args: Its parameters            duration: Seconds the statement took
+            rows: Rows returned
+            error: Whether the statement failed
+            source: Agent or tool that issued it
+        """
+        key = fingerprint(sql)
+        stats = self.stats.get(key)
+        if stats is None:
+            if len(self.stats) >= self.max_fingerprints:
+                self.dropped += 1
+                return
+            stats = self.stats[key] = QueryStats(key, sql, args)
+        stats.calls += 1
+        stats.errors += int(error)
+        stats.total_time += duration
+        stats.max_time = max(stats.max_time, duration)
+        stats.rows += rows
+        if self.log_path:
+            if not self._log_buffer:
+                self._log_buffered_at = time.monotonic()
+            self._log_buffer.append(json.dumps({"ts": time.time(), "source": source, "sql": sql, "args": list(args),
+                                                "duration": duration, "rows": rows, "error": error},
+                                               default=str) + "\n")
+            if (len(self._log_buffer) >= self.log_batch
+                    or time.monotonic() - self._log_buffered_at >= self.log_interval):
+                self.flush_log()
+
+    def _write_log(self, lines: List[str]):
+        # Runs on a worker thread; the lock keeps concurrent batches from interleaving
+        try:
+            with self._log_lock, open(self.log_path, "a") as f:
+                f.writelines(lines)
+        except OSError as e:
+            print(f"Could not write SQL workload log: {e}")
+
+    def flush_log(self):
+        """Hand the buffered log lines to a worker thread (or write them directly outside an event loop)."""
+        if not self._log_buffer:
+            return
+        lines, self._log_buffer = self._log_buffer, []
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write_log(lines)
+            return
+        loop.run_in_executor(None, self._write_log, lines)
+
+    async def stop(self):
+        """Write the buffered log lines before shutdown."""
+        if self._log_buffer:
+            lines, self._log_buffer = self._log_buffer, []
+            await asyncio.to_thread(self._write_log, lines)
+
+    def top(self, n: int = 10) -> List[QueryStats]:
+        """Fingerprints with the highest total time."""
+        return sorted(self.stats.values(), key=lambda s: s.total_time, reverse=True)[:n]
+
+    def snapshot(self, n: int = 10) -> Dict[str, Any]:
+        """Top queries by total time."""
+        return {
+            "fingerprints": len(self.stats),
+            "dropped": self.dropped,
+            "top": [stats.to_dict() for stats in self.top(n)]
+        }
+
+def load_log(path: str) -> SqlWorkload:
+    """Rebuild a workload from a SQL_WORKLOAD_LOG file."""
+    workload = SqlWorkload(log_path="")
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            workload.record(entry["sql"], entry["duration"], entry.get("rows", 0), entry.get("error", False),
+                            args=entry.get("args", ()))
+    return workload
+
+# Global workload recorder
+_workload = None
+
+def get_sql_workload() -> SqlWorkload:
+    """Get the global workload recorder, creating it on first use."""
+    global _workload
+    if _workload is None:
+        _workload = SqlWorkload()
+    return _workload
+
+# Index advisor
+
+# Matches `column = ...`, `(column)::text = ...` and `table.column < ...` in plan conditions
+_PREDICATE = re.compile(
+    r"\(*(?:\w+\.)?\"?(\w+)\"?\)?(?:::[\w ]+)?\s*(=|<>|<=|>=|<|>|~~\*?|!~~\*?)\s*('(?:[^']|'')*'|[\w$.]+)"
+)
+_SORT_KEY = re.compile(r"(?:\w+\.)?\"?(\w+)\"?(?:\s+(DESC|ASC))?", re.IGNORECASE)
+
+class IndexSuggestion:
+    """A suggested index with the evidence behind it."""
+
+    __slots__ = ("table", "columns", "where", "reason", "fingerprint")
+
+    def __init__(self, table: str, columns: List[str], reason: str, fingerprint: str, where: str = None):
+        self.table = table
+        self.columns = columns
+        self.where = where
+        self.reason = reason
+        self.fingerprint = fingerprint
+
+    def ddl(self) -> str:
+        name = "idx_" + self.table + "_" + "_".join(c.split()[0] for c in self.columns)
+        if self.where:
+            name += "_partial"
+        statement = f"CREATE INDEX IF NOT EXISTS {name} ON {self.table} ({', '.join(self.columns)})"
+        if self.where:
+            statement += f" WHERE {self.where}"
+        return statement + ";"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"ddl": self.ddl(), "reason": self.reason, "fingerprint": self.fingerprint}
+
+def _walk(plan: Dict[str, Any], parents: Tuple = ()):
+    yield plan, parents
+    for child in plan.get("Plans", []):
+        yield from _walk(child, parents + (plan,))
+
+def _predicates(condition: str) -> List[Tuple[str, str, str]]:
+    return [(column, op, value) for column, op, value in _PREDICATE.findall(condition or "")]
+
+def suggest_indexes(plan: Dict[str, Any], fingerprint_: str,
+                    enum_columns: Iterable[str] = ()) -> List[IndexSuggestion]:
+    """Suggest indexes for the expensive scans in an EXPLAIN (FORMAT JSON) plan.
+
+    Sequential scans with a filter become composite indexes: equality columns
+    first, then the sort keys above the scan, then range columns. When the
+    filter pins an ENUM column to a literal, a partial index on the remaining
+    columns is suggested as well.
+    """
+    enum_columns = set(enum_columns)
+    suggestions = []
+    for node, parents in _walk(plan):
+        if node.get("Node Type") != "Seq Scan" or not node.get("Filter"):
+            continue
+        table = node["Relation Name"]
+        predicates = _predicates(node["Filter"])
+        equality = list(dict.fromkeys(c for c, op, _ in predicates if op == "="))
+        ranges = list(dict.fromkeys(c for c, op, _ in predicates if op in ("<", ">", "<=", ">=")))
+
+        sort_columns = []
+        for parent in reversed(parents):
+            if parent.get("Node Type") in ("Sort", "Incremental Sort"):
+                for key in parent.get("Sort Key", []):
+                    match = _SORT_KEY.match(key.strip())
+                    if match and match.group(1) not in equality:
+                        direction = " DESC" if (match.group(2) or "").upper() == "DESC" else ""
+                        sort_columns.append(match.group(1) + direction)
+                break
+
+        columns = equality + sort_columns + [c for c in ranges if c not in equality]
+        if not columns:
+            continue
+        removed = node.get("Rows Removed by Filter", 0)
+        reason = (f"Seq Scan on {table} filtered {removed} rows on {node['Filter']}"
+                  f" ({node.get('Actual Total Time', 0):.2f} ms)")
+        suggestions.append(IndexSuggestion(table, columns, reason, fingerprint_))
+
+        pinned = [(c, v) for c, op, v in predicates if op == "=" and c in enum_columns and v.startswith("'")]
+        rest = [c for c in columns if c.split()[0] not in {c for c, _ in pinned}]
+        if pinned and rest:
+            where = " AND ".join(f"{c} = {v}" for c, v in pinned)
+            suggestions.append(IndexSuggestion(
+                table, rest, f"{reason}; {where} pins a low-cardinality ENUM column", fingerprint_, where
+            ))
+    return suggestions
+
+async def _enum_columns(conn) -> List[str]:
+    rows = await conn.fetch(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = 'public' AND data_type = 'USER-DEFINED'"
+    )
+    return [row["column_name"] for row in rows]
+
+async def unused_indexes(conn) -> List[Dict[str, Any]]:
+    """Indexes that have never been scanned since statistics were reset."""
+    rows = await conn.fetch(
+        "SELECT relname AS table, indexrelname AS index, idx_scan FROM pg_stat_user_indexes "
+        "WHERE idx_scan = 0 ORDER BY relname, indexrelname"
+    )
+    return [dict(row) for row in rows]
+
+async def advise(workload: SqlWorkload, database_url: str, top_n: int = 10) -> Dict[str, Any]:
+    """Explain the top queries of a workload and suggest indexes.
+
+    EXPLAIN ANALYZE executes the statement, so each one runs inside a
+    read-only transaction, which cannot write. The queries still do their full
+    read work, so point this at a local copy of the database, not production.
+
+    Returns:
+        dict: Per-query plans, index suggestions and unused indexes
+    """
+    import asyncpg
+
+    conn = await asyncpg.connect(database_url)
+    try:
+        enum_columns = await _enum_columns(conn)
+        queries = []
+        suggestions: Dict[str, IndexSuggestion] = {}
+        for stats in workload.top(top_n):
+            entry = stats.to_dict()
+            if not stats.sample.lstrip().lower().startswith(("select", "with")):
+                entry["skipped"] = "not a read-only statement"
+                queries.append(entry)
+                continue
+            try:
+                async with conn.transaction(readonly=True):
+                    result = await conn.fetchval(
+                        "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + stats.sample.rstrip().rstrip(";"),
+                        *stats.sample_args
+                    )
+            except Exception as e:
+                entry["explain_error"] = str(e)
+                queries.append(entry)
+                continue
+            plan = (json.loads(result) if isinstance(result, str) else result)[0]
+            root = plan["Plan"]
+            entry["plan"] = {
+                "node": root.get("Node Type"),
+                "execution_time": plan.get("Execution Time"),
+                "shared_hit_blocks": root.get("Shared Hit Blocks"),
+                "shared_read_blocks": root.get("Shared Read Blocks")
+            }
+            for suggestion in suggest_indexes(root, stats.fingerprint, enum_columns):
+                suggestions.setdefault(suggestion.ddl(), suggestion)
+            queries.append(entry)
+        return {
+            "queries": queries,
+            "suggestions": [s.to_dict() for s in suggestions.values()],
+            "unused_indexes": await unused_indexes(conn)
+        }
+    finally:
+        await conn.close()
+
+async def main(argv: Iterable[str] = None):
+    parser = argparse.ArgumentParser(description="Report and advise on agent-generated SQL")
+    parser.add_argument("log", help="SQL_WORKLOAD_LOG file written by the agent services")
+    parser.add_argument("--top", type=int, default=10, help="Number of queries to report")
+    parser.add_argument("--advise", action="store_true",
+                        help="Run EXPLAIN (ANALYZE, BUFFERS) and suggest indexes")
+    parser.add_argument("--database-url", default=os.getenv('DATABASE_URL'),
+                        help="Postgres to explain against (default: DATABASE_URL)")
+    args = parser.parse_args(argv)
+
+    workload = load_log(args.log)
+    if args.advise:
+        if not args.database_url:
+            parser.error("--advise needs --database-url or DATABASE_URL")
+        report = await advise(workload, args.database_url, args.top)
+    else:
+        report = workload.snapshot(args.top)
+    print(json.dumps(report, indent=2, default=str))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,105 @@
+"""
+Tenancy
+Carries the wardrobe owner (user_id) of a request across A2A hops and scopes
+agent-written SQL to that owner's rows. Isolation is enforced inside Postgres
+by row-level security; the SQL rewrite only helps the planner.
+"""
+
+import os
+import re
+from contextvars import ContextVar
+from typing import Any, Dict, List, Tuple
+
+from resilience import a2a_request_metadata, deadline_request_meta, read_body, replay_body
+
+# Owner of the rows seeded by init.sql and of requests that do not name a user
+DEFAULT_TENANT = os.getenv('DEFAULT_TENANT', 'default')
+
+# Key under which the tenant travels in A2A request metadata, and the equivalent HTTP header
+TENANT_METADATA_KEY = "ptso_tenant"
+TENANT_HEADER = "x-ptso-tenant"
+
+_TENANT_ID = re.compile(r"^[A-Za-z0-9_.@-]{1,64}$")
+
+current_tenant: ContextVar[str] = ContextVar("current_tenant", default=DEFAULT_TENANT)
+
+def set_tenant(user_id: str = None) -> str:
+    """Set the tenant of the current request.
+
+    Raises:
+        ValueError: If the user id is not a valid tenant id
+    """
+    user_id = user_id or DEFAULT_TENANT
+    if not _TENANT_ID.match(user_id):
+        raise ValueError(f"Invalid user_id {user_id!r}")
+    current_tenant.set(user_id)
+    return user_id
+
+def request_meta(ctx, a2a_message) -> Dict[str, Any]:
+    """Request metadata provider for RemoteA2aAgent carrying the deadline and tenant."""
+    meta = deadline_request_meta(ctx, a2a_message)
+    meta[TENANT_METADATA_KEY] = current_tenant.get()
+    return meta
+
+class TenantMiddleware:
+    """ASGI middleware that adopts the caller's tenant for an A2A request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        body = await read_body(receive)
+        tenant = a2a_request_metadata(body).get(TENANT_METADATA_KEY)
+        if tenant is None:
+            header = dict(scope.get("headers") or []).get(TENANT_HEADER.encode())
+            tenant = header.decode() if header else None
+        try:
+            set_tenant(tenant)
+        except ValueError:
+            set_tenant()
+        await self.app(scope, replay_body(body, receive), send)
+
+# Relations holding per-tenant rows; each has a user_id column
+TENANT_RELATIONS = ("wardrobe", "seasonal_items", "wardrobe_by_brand", "wardrobe_by_category")
+_WITH = re.compile(r"^\s*with(\s+recursive)?\b", re.IGNORECASE)
+
+# Setting read by the wardrobe row-level security policy in init.sql
+TENANT_SETTING = "ptso.tenant"
+# Role agent-written SQL runs as; it is subject to row-level security and can only read the agent tables
+AGENT_ROLE = os.getenv('DB_AGENT_ROLE', 'ptso_agent_reader')
+
+async def enter_tenant_scope(conn, user_id: str):
+    """Confine the rest of the current transaction to one tenant's rows.
+
+    Switches to AGENT_ROLE and sets the tenant the row-level security policy
+    filters on. Both revert when the transaction ends. This holds however
+    the statement reaches the table: schema-qualified names, views, or
+    functions such as query_to_xml that run SQL of their own.
+    """
+    await conn.execute("SELECT set_config($1, $2, true)", TENANT_SETTING, user_id)
+    await conn.execute('SET LOCAL ROLE "' + AGENT_ROLE.replace('"', '""') + '"')
+
+def scope_sql(sql: str, user_id: str) -> Tuple[str, List[Any]]:
+    """Add the tenant filter to an agent-written query as a planner hint.
+
+    Each tenant relation the query mentions by its plain name is shadowed by a
+    CTE of the same name filtered on user_id, so the tenant-leading indexes
+    are used. This is not what isolates tenants: row-level security does
+    (see enter_tenant_scope), including for references this rewrite misses.
+
+    Returns:
+        (sql, args): Rewritten statement and its parameters
+    """
+    lowered = sql.lower()
+    used = [name for name in TENANT_RELATIONS if re.search(r"\b" + name + r"\b", lowered)]
+    if not used:
+        return sql, []
+    ctes = ", ".join(f"{name} AS (SELECT * FROM public.{name} WHERE user_id = $1)" for name in used)
+    match = _WITH.match(sql)
+    if match:
+        return f"WITH{match.group(1) or ''} {ctes}, {sql[match.end():].lstrip()}", [user_id]
+    return f"WITH {ctes} {sql}", [user_id]
@@ -0,0 +1,139 @@
+"""
+Tenant Catalog Cache
+Keeps the wardrobes of recently active users in memory with LRU eviction.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import db
+from query_cache import get_query_cache
+from wardrobe_catalog import CATALOG_COLUMNS, WardrobeCatalog
+from wardrobe_import import add_import_listener
+
+class TenantCatalogCache:
+    """LRU cache of per-tenant wardrobe catalogs.
+
+    Memory is bounded by the number of active tenants rather than the total
+    number of users, and a cache hit costs the same however many tenants and
+    items exist. Concurrent misses for one tenant share a single load. Imports
+    are applied to cached catalogs in place. Changes made by other processes
+    drop every catalog when the wardrobe change notification arrives; entries
+    also expire after `ttl` seconds.
+    """
+
+    def __init__(self, max_tenants: int = None, ttl: float = None):
+        """Initialize the cache.
+
+        Args:
+            max_tenants: Catalogs kept in memory
+            ttl: Seconds before a cached catalog is reloaded
+        """
+        self.max_tenants = max_tenants or int(os.getenv('TENANT_CACHE_SIZE', 1024))
+        self.ttl = ttl or float(os.getenv('TENANT_CACHE_TTL', 300))
+        self._entries: "OrderedDict[str, Tuple[float, WardrobeCatalog]]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Bumped by every invalidation; a load that overlapped one is not stored
+        self._generation = 0
+
+    async def _load(self, user_id: str) -> WardrobeCatalog:
+        rows = await db.fetch(
+            f"SELECT {', '.join(CATALOG_COLUMNS)} FROM wardrobe WHERE user_id = $1 ORDER BY id", user_id
+        )
+        return WardrobeCatalog.from_rows(rows)
+
+    def _store(self, user_id: str, catalog: WardrobeCatalog):
+        self._entries[user_id] = (time.monotonic(), catalog)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_tenants:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, user_id: str) -> WardrobeCatalog:
+        """Get a tenant's catalog, loading it on a miss."""
+        entry = self._entries.get(user_id)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        pending = self._loading.get(user_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        future = asyncio.get_running_loop().create_future()
+        self._loading[user_id] = future
+        generation = self._generation
+        try:
+            catalog = await self._load(user_id)
+            if generation == self._generation:
+                self._store(user_id, catalog)
+            future.set_result(catalog)
+            return catalog
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when no other caller was waiting
+            future.exception()
+            raise
+        finally:
+            del self._loading[user_id]
+
+    def invalidate(self, user_id: Optional[str] = None):
+        """Drop one tenant's catalog, or all of them."""
+        self._generation += 1
+        if user_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(user_id, None)
+
+    def on_table_change(self, table: str):
+        """Drop every catalog when the wardrobe table changes.
+
+        The notification only names the table, not the tenants whose rows changed.
+        """
+        if table == "wardrobe":
+            self.invalidate()
+
+    def apply_import(self, rows: List[Dict[str, Any]]):
+        """Append imported rows to the catalogs of tenants that are cached."""
+        by_tenant: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            if row.get("user_id") in self._entries:
+                by_tenant.setdefault(row["user_id"], []).append(row)
+        for user_id, tenant_rows in by_tenant.items():
+            self._entries[user_id][1].extend(tenant_rows)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Cache size and hit rate."""
+        lookups = self.hits + self.misses
+        return {
+            "tenants": len(self._entries),
+            "items": sum(len(catalog) for _, catalog in self._entries.values()),
+            "bytes": sum(catalog.nbytes() for _, catalog in self._entries.values()),
+            "max_tenants": self.max_tenants,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+# Global catalog cache
+_catalog_cache = None
+
+def get_tenant_catalog_cache() -> TenantCatalogCache:
+    """Get the global catalog cache, creating it on first use."""
+    global _catalog_cache
+    if _catalog_cache is None:
+        _catalog_cache = TenantCatalogCache()
+        add_import_listener(_catalog_cache.apply_import)
+        get_query_cache().add_table_listener(_catalog_cache.on_table_change)
+    return _catalog_cache
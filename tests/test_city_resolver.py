@@ -0,0 +1,37 @@
+import pytest
+
+from city_resolver import CityResolver, edit_distance
+
+@pytest.fixture
+def resolver() -> CityResolver:
+    resolver = CityResolver(threshold=0.4)
+    for city in ("Atlanta", "Los Angeles", "New York", "San Francisco", "Chicago"):
+        resolver.add_city(city)
+    resolver.add_alias("ATL", "Atlanta")
+    resolver.add_alias("LA", "Los Angeles")
+    return resolver
+
+def test_edit_distance():
+    assert edit_distance("atlanta", "atlanta") == 0
+    assert edit_distance("atlnta", "atlanta") == 1
+    assert edit_distance("atlantic", "atlanta") == 2
+
+def test_exact_and_alias(resolver):
+    assert resolver.resolve("What should I wear in Atlanta, GA?") == "Atlanta"
+    assert resolver.resolve("weather in ATL") == "Atlanta"
+    assert resolver.resolve("LA") == "Los Angeles"
+
+def test_short_alias_is_case_sensitive_in_free_text(resolver):
+    assert resolver.resolve("what should I wear to la la land") is None
+
+def test_typos_resolve(resolver):
+    assert resolver.resolve("weather in Atlnta") == "Atlanta"
+    assert resolver.resolve("what to wear in San Fransisco") == "San Francisco"
+    assert resolver.resolve("Chicgo") == "Chicago"
+
+def test_other_city_with_a_similar_name_does_not_resolve(resolver):
+    assert resolver.resolve("weather in Atlantic City") is None
+    assert resolver.resolve("what should I wear in Atlantic City today?") is None
+
+def test_several_cities_are_ambiguous(resolver):
+    assert resolver.resolve("flying from Atlanta to Chicago") is None
@@ -0,0 +1,30 @@
+import asyncio
+
+import model_residency
+from llm_config import LLMConfig, LLMProvider
+from model_residency import ModelResidencyManager
+from resilience import deadline_model_callback
+
+def _manager() -> ModelResidencyManager:
+    manager = ModelResidencyManager(LLMConfig(LLMProvider.VLLM, base_url="http://127.0.0.1:9"),
+                                    models=["stub"], idle_threshold=60)
+    manager.service.batcher = None
+
+    async def dispatch(*request):
+        return "pong"
+    manager.service._dispatch = dispatch
+    return manager
+
+def test_keep_warm_is_not_traffic():
+    manager = _manager()
+    model_residency._last_activity = 0.0
+    asyncio.run(manager._warm("stub"))
+    assert manager.status["stub"]["resident"]
+    assert manager.service.last_request_at == 0.0
+    assert manager.idle_for() >= manager.idle_threshold
+
+def test_agent_model_calls_mark_activity():
+    manager = _manager()
+    model_residency._last_activity = 0.0
+    assert deadline_model_callback(None, None) is None
+    assert manager.idle_for() < manager.idle_threshold
@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+import pytest
+
+from resilience import CircuitBreaker, CircuitOpenError
+
+def _half_open(breaker: CircuitBreaker):
+    breaker.record_failure()
+    # Pretend the reset timeout has passed
+    breaker.opened_at = time.monotonic() - breaker.reset_timeout
+
+def test_cancelled_trial_call_frees_the_trial_slot():
+    breaker = CircuitBreaker("agent", failure_threshold=1, reset_timeout=30)
+    _half_open(breaker)
+
+    async def trial():
+        with breaker.guard():
+            await asyncio.sleep(60)
+
+    async def main():
+        task = asyncio.create_task(trial())
+        await asyncio.sleep(0)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert not breaker.is_available()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert breaker.is_available()
+    with breaker.guard():
+        pass
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_neutral_exception_neither_opens_nor_closes():
+    breaker = CircuitBreaker("agent", failure_threshold=1, reset_timeout=30)
+    _half_open(breaker)
+    with pytest.raises(LookupError):
+        with breaker.guard(neutral=(LookupError,)):
+            raise LookupError
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.is_available()
+
+def test_failed_trial_call_reopens():
+    breaker = CircuitBreaker("agent", failure_threshold=1, reset_timeout=30)
+    _half_open(breaker)
+    with pytest.raises(RuntimeError):
+        with breaker.guard():
+            raise RuntimeError
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
@@ -0,0 +1,27 @@
+"""
+Token Counting
+Counts text in model tokens, so context savings can be reported in the unit
+prompts are billed and evaluated in.
+"""
+
+import os
+from functools import lru_cache
+
+TOKEN_ENCODING = os.getenv('TOKEN_ENCODING', 'cl100k_base')
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception as e:
+        # tiktoken is missing or cannot fetch the encoding (e.g. offline)
+        print(f"tiktoken unavailable ({e}); estimating tokens as characters / 4")
+        return None
+
+def count_tokens(text: str) -> int:
+    """Number of tokens in a text, estimated when tiktoken is unavailable."""
+    encoding = _encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
@@ -12,22 +12,6 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import os
+"""Compatibility wrapper; instruction files are served by the prompt registry."""
 
-
-def load_instruction_from_file(
-    filename: str, default_instruction: str = "Default instruction."
-) -> str:
-    """Reads instruction text from a file relative to this script."""
-    instruction = default_instruction
-    try:
-        # Construct path relative to the current script file (__file__)
-        filepath = os.path.join(os.path.dirname(__file__), filename)
-        with open(filepath, "r", encoding="utf-8") as f:
-            instruction = f.read()
-        print(f"Successfully loaded instruction from {filename}")
-    except FileNotFoundError:
-        print(f"WARNING: Instruction file not found: {filepath}. Using default.")
-    except Exception as e:
-        print(f"ERROR loading instruction file {filepath}: {e}. Using default.")
-    return instruction
\ No newline at end of file
+from prompt_registry import load_instruction_from_file  # noqa: F401
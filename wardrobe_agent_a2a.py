@@ -5,34 +5,62 @@ Exposes the wardrobe agent as an A2A agent that can be consumed by other agents.
 
 from google.adk.agents.llm_agent import LlmAgent
 from google.adk.tools.mcp_tool.mcp_toolset import MCPToolset, StdioServerParameters
-from a2a.types import AgentCard
+from a2a.types import AgentCard, AgentCapabilities, AgentSkill
 from google.adk.a2a.utils.agent_to_a2a import to_a2a
 from dotenv import load_dotenv
-from utils.util import load_instruction_from_file
+from prompt_registry import get_prompt_registry
 from llm_config import get_llm_config, print_llm_info
+from model_router import get_agent_model, get_model_router
+from model_residency import get_residency_manager
+from resilience import DeadlineMiddleware, deadline_model_callback
+from tenancy import TenantMiddleware
+from db import close_db_pool
+from db_tools import list_wardrobe_items, query_database, usage_snapshot
+from tenant_catalog import get_tenant_catalog_cache
+from query_cache import get_query_cache
+from session_store import build_runner, get_session_service
+from sql_workload import get_sql_workload
+from schemas import (
+    JSON_MIME_TYPE, RECOMMENDATION_REQUEST_SCHEMA_URI, WARDROBE_RECOMMENDATION_SCHEMA_URI,
+    RecommendationRequest, WardrobeRecommendation, schema_extension
+)
 from contextlib import AsyncExitStack
+from starlette.responses import JSONResponse
 import asyncio
 
 load_dotenv()
 
-async def create_wardrobe_agent_a2a():
-    """Creates a wardrobe agent that can be exposed via A2A protocol.
+def build_wardrobe_agent() -> LlmAgent:
+    """Creates the wardrobe LLM agent.
+    
+    Used both by the A2A service and by the PTSO agent in co-located mode.
     
     Returns:
-        FastAPI app: The A2A-enabled wardrobe agent app.
+        LlmAgent: The wardrobe agent.
     """
     # Get LLM configuration
     llm_config = get_llm_config()
     print_llm_info()
     
     # Create the underlying LLM agent with configurable model
-    wardrobe_agent = LlmAgent(
+    return LlmAgent(
         name="wardrobe_agent",
-        model=llm_config.get_model_name(),
+        model=get_agent_model("wardrobe_agent"),
         description="You are a helpful agent who can help a user pick options for their wardrobe.",
-        instruction=load_instruction_from_file("agent_instructions/wardrobe_agent_instructions.txt"),
-        output_key="wardrobe_recommendations"
+        instruction=get_prompt_registry().provider("agent_instructions/wardrobe_agent_instructions.txt"),
+        output_schema=WardrobeRecommendation,
+        tools=[list_wardrobe_items, query_database],
+        output_key="wardrobe_recommendations",
+        before_model_callback=deadline_model_callback
     )
+
+def build_wardrobe_agent_a2a():
+    """Creates a wardrobe agent that can be exposed via A2A protocol.
+    
+    Returns:
+        Starlette app: The A2A-enabled wardrobe agent app.
+    """
+    wardrobe_agent = build_wardrobe_agent()
     
     # Create Agent Card for A2A exposure
     agent_card = AgentCard(
@@ -40,26 +68,95 @@ async def create_wardrobe_agent_a2a():
         description="Provides clothing recommendations based on temperature and weather conditions",
         version="1.0.0",
         url="http://localhost:8002",
-        defaultInputModes=["text/plain"],
-        defaultOutputModes=["text/plain"],
-        capabilities={},
-        skills=[]
+        defaultInputModes=[JSON_MIME_TYPE, "text/plain"],
+        defaultOutputModes=[JSON_MIME_TYPE],
+        capabilities=AgentCapabilities(streaming=True, extensions=[
+            schema_extension(RECOMMENDATION_REQUEST_SCHEMA_URI, RecommendationRequest, "Accepted request input"),
+            schema_extension(WARDROBE_RECOMMENDATION_SCHEMA_URI, WardrobeRecommendation, "Recommendation payload")
+        ]),
+        skills=[
+            AgentSkill(
+                id="outfit_recommendation",
+                name="Outfit Recommendation",
+                description="Recommends wardrobe items for a RecommendationRequest JSON document and returns a WardrobeRecommendation",
+                tags=["wardrobe", "recommendation", "postgresql"],
+                inputModes=[JSON_MIME_TYPE, "text/plain"],
+                outputModes=[JSON_MIME_TYPE]
+            )
+        ]
     )
     
     # Use to_a2a() to create A2A-compatible app
-    a2a_app = to_a2a(wardrobe_agent, port=8002, agent_card=agent_card)
+    # Sessions live in Postgres, so they survive restarts and are shared by replicas
+    a2a_app = to_a2a(wardrobe_agent, port=8002, agent_card=agent_card, runner=build_runner(wardrobe_agent))
+    # Adopt the caller's deadline from A2A request metadata
+    a2a_app.add_middleware(DeadlineMiddleware)
+    # Adopt the caller's tenant so wardrobe queries only see that user's items
+    a2a_app.add_middleware(TenantMiddleware)
+    
+    async def metrics(request):
+        return JSONResponse({
+            "model_tiers": get_model_router().snapshot(),
+            "sql_workload": get_sql_workload().snapshot(),
+            "db_tools": usage_snapshot(),
+            "query_cache": get_query_cache().snapshot(),
+            "prompts": get_prompt_registry().snapshot(),
+            "sessions": get_session_service().snapshot(),
+            "tenant_catalogs": get_tenant_catalog_cache().snapshot()
+        })
+    
+    # Report ready only once local models are resident
+    residency = get_residency_manager()
+    # Created before startup so the query cache's LISTEN connection also drops
+    # catalogs when another process, such as a PTSO import, changes the wardrobe
+    get_tenant_catalog_cache()
+    
+    async def health(request):
+        return JSONResponse(
+            {"status": "healthy" if residency.ready else "warming", "models": residency.snapshot()},
+            status_code=200 if residency.ready else 503
+        )
+    
+    a2a_app.add_route("/metrics", metrics)
+    a2a_app.add_route("/health", health)
+    a2a_app.add_event_handler("startup", residency.start)
+    a2a_app.add_event_handler("startup", get_query_cache().start)
+    a2a_app.add_event_handler("startup", get_session_service().start)
+    a2a_app.add_event_handler("shutdown", residency.stop)
+    a2a_app.add_event_handler("shutdown", get_query_cache().stop)
+    a2a_app.add_event_handler("shutdown", get_sql_workload().stop)
+    # Write queued session events before the pool closes
+    a2a_app.add_event_handler("shutdown", get_session_service().stop)
+    a2a_app.add_event_handler("shutdown", close_db_pool)
     
     return a2a_app
 
+async def create_wardrobe_agent_a2a():
+    """Creates a wardrobe agent that can be exposed via A2A protocol.
+    
+    Returns:
+        Starlette app: The A2A-enabled wardrobe agent app.
+    """
+    return build_wardrobe_agent_a2a()
+
 def main():
     """Main function to run the wardrobe agent as an A2A service."""
     import uvicorn
     print("Wardrobe Agent A2A service starting...")
-    uvicorn.run("wardrobe_agent_a2a:a2a_app", host="0.0.0.0", port=8002, reload=False)
+    # uvicorn builds the app from the factory (synchronously, from inside its running event loop)
+    uvicorn.run("wardrobe_agent_a2a:build_wardrobe_agent_a2a", factory=True, host="0.0.0.0", port=8002, reload=False)
 
-# Create the A2A app at module level
-import asyncio
-a2a_app = asyncio.run(create_wardrobe_agent_a2a())
+_a2a_app = None
+
+def __getattr__(name):
+    # `wardrobe_agent_a2a:a2a_app` is built on first access, so importing this module
+    # (as the co-located PTSO service does for the agent builders) creates no app
+    global _a2a_app
+    if name == "a2a_app":
+        if _a2a_app is None:
+            _a2a_app = build_wardrobe_agent_a2a()
+        return _a2a_app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,239 @@
+"""
+Wardrobe Catalog
+Compact in-memory columnar store of wardrobe items. ENUM columns are stored as
+uint8 codes with one bitmap per value, so multi-attribute filters are bitwise
+ANDs over Python integers.
+"""
+
+import re
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from schemas import GarmentCategory, GarmentType, Season, Style
+
+# Columns served by the catalog, in the order of WardrobeItem slots
+CATALOG_COLUMNS = (
+    "id", "brand", "item_name", "color", "garment_type", "garment_category", "fabric",
+    "size", "price", "season", "style", "care_instructions"
+)
+ENUM_COLUMNS = {"garment_type": GarmentType, "garment_category": GarmentCategory, "season": Season, "style": Style}
+# Low-cardinality text columns, stored as codes into a per-column dictionary
+DICTIONARY_COLUMNS = ("brand", "color", "fabric", "size", "care_instructions")
+
+_NONZERO_BYTE = re.compile(b"[^\x00]")
+
+class WardrobeItem:
+    """A single catalog row, materialized only for filter results."""
+
+    __slots__ = CATALOG_COLUMNS
+
+    def __init__(self, *values):
+        for name, value in zip(CATALOG_COLUMNS, values):
+            setattr(self, name, value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in CATALOG_COLUMNS}
+
+class _DictionaryColumn:
+    """Dictionary-encoded text column; codes widen from uint16 to uint32 as needed."""
+
+    __slots__ = ("values", "index", "codes")
+
+    def __init__(self):
+        self.values: List[Optional[str]] = [None]
+        self.index: Dict[Optional[str], int] = {None: 0}
+        self.codes = array("H")
+
+    def append(self, value: Optional[str]):
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+            if code > 0xFFFF and self.codes.typecode == "H":
+                self.codes = array("I", self.codes)
+        self.codes.append(code)
+
+    def __getitem__(self, row: int) -> Optional[str]:
+        return self.values[self.codes[row]]
+
+    def nbytes(self) -> int:
+        return self.codes.itemsize * len(self.codes) + sum(len(v) for v in self.values if v)
+
+class _StringColumn:
+    """High-cardinality text column packed as UTF-8 bytes plus end offsets."""
+
+    __slots__ = ("data", "offsets")
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array("I", [0])
+
+    def append(self, value: Optional[str]):
+        self.data += (value or "").encode("utf-8")
+        self.offsets.append(len(self.data))
+
+    def __getitem__(self, row: int) -> str:
+        return self.data[self.offsets[row]:self.offsets[row + 1]].decode("utf-8")
+
+    def nbytes(self) -> int:
+        return len(self.data) + self.offsets.itemsize * len(self.offsets)
+
+class WardrobeCatalog:
+    """Columnar wardrobe catalog with per-value bitmaps.
+
+    Bit i of a bitmap stands for row i. Filters AND the bitmaps of the
+    requested values (values of one column are ORed), which runs in C over
+    len(catalog) / 8 bytes, and only matching rows are materialized.
+    """
+
+    def __init__(self):
+        self.ids = array("i")
+        # Doubles hold every DECIMAL(10,2) price exactly to the cent; floats do not past 10,000
+        self.prices = array("d")
+        self.item_names = _StringColumn()
+        self.dictionaries = {name: _DictionaryColumn() for name in DICTIONARY_COLUMNS}
+        self.codes = {name: array("B") for name in ENUM_COLUMNS}
+        # One list of members and one bitmap per ENUM value, indexed by code
+        self.members = {name: list(enum) for name, enum in ENUM_COLUMNS.items()}
+        self.code_of = {name: {member.value: code for code, member in enumerate(enum)}
+                        for name, enum in ENUM_COLUMNS.items()}
+        self.bitmaps = {name: [0] * len(enum) for name, enum in ENUM_COLUMNS.items()}
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> "WardrobeCatalog":
+        """Build a catalog from row dicts or records."""
+        catalog = cls()
+        catalog.extend(rows)
+        return catalog
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def extend(self, rows: Iterable[Dict[str, Any]]):
+        """Append rows, updating the bitmaps once per batch.
+
+        The whole batch is checked before anything is appended, so a bad row
+        leaves the catalog unchanged.
+
+        Raises:
+            ValueError: If an ENUM column holds an unknown value or a price is not a number
+        """
+        ids, prices = array("i"), array("d")
+        prepared = []
+        for row in rows:
+            codes = {}
+            for name in ENUM_COLUMNS:
+                value = getattr(row[name], "value", row[name])
+                if value not in self.code_of[name]:
+                    raise ValueError(f"invalid {name} {value!r}")
+                codes[name] = self.code_of[name][value]
+            ids.append(row["id"])
+            price = row.get("price")
+            prices.append(float("nan") if price is None else float(price))
+            prepared.append((row, codes))
+
+        start = len(self.ids)
+        self.ids.extend(ids)
+        self.prices.extend(prices)
+        for row, codes in prepared:
+            self.item_names.append(row["item_name"])
+            for name, column in self.dictionaries.items():
+                column.append(row.get(name))
+            for name, code in codes.items():
+                self.codes[name].append(code)
+
+        # Build the batch's bits in byte buffers and OR each bitmap once;
+        # setting bits one at a time on big ints would be quadratic
+        count = len(self.ids) - start
+        if not count:
+            return
+        for name, codes in self.codes.items():
+            buffers = [None] * len(self.bitmaps[name])
+            for offset in range(count):
+                code = codes[start + offset]
+                if buffers[code] is None:
+                    buffers[code] = bytearray((count + 7) // 8)
+                buffers[code][offset >> 3] |= 1 << (offset & 7)
+            for code, buffer in enumerate(buffers):
+                if buffer is not None:
+                    self.bitmaps[name][code] |= int.from_bytes(buffer, "little") << start
+
+    def append(self, row: Dict[str, Any]):
+        """Append a single row."""
+        self.extend((row,))
+
+    def mask(self, **filters: Union[str, Iterable[str], None]) -> int:
+        """Bitmap of the rows matching every filter.
+
+        Args:
+            **filters: ENUM column name to a value or an iterable of values
+
+        Raises:
+            KeyError: For a column that is not an ENUM column
+            ValueError: For a value that is not a member of the column's ENUM
+        """
+        result = (1 << len(self.ids)) - 1
+        for name, wanted in filters.items():
+            if wanted is None:
+                continue
+            if name not in ENUM_COLUMNS:
+                raise KeyError(f"{name} is not a filterable column")
+            values = [wanted] if isinstance(wanted, str) or hasattr(wanted, "value") else wanted
+            column_mask = 0
+            for value in values:
+                column_mask |= self.bitmaps[name][self.code_of[name][ENUM_COLUMNS[name](value).value]]
+            result &= column_mask
+            if not result:
+                break
+        return result
+
+    def count(self, **filters) -> int:
+        """Number of rows matching the filters."""
+        return self.mask(**filters).bit_count()
+
+    def rows(self, mask: int, limit: int = None) -> Iterable[int]:
+        """Row numbers set in a bitmap, in order."""
+        if not mask:
+            return
+        found = 0
+        data = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+        # Skip empty bytes in C, then test the eight bits of each non-empty byte
+        for match in _NONZERO_BYTE.finditer(data):
+            byte, base = match.group()[0], match.start() * 8
+            for bit in range(8):
+                if byte >> bit & 1:
+                    yield base + bit
+                    found += 1
+                    if limit is not None and found >= limit:
+                        return
+
+    def item(self, row: int) -> WardrobeItem:
+        """Materialize one row."""
+        price = self.prices[row]
+        return WardrobeItem(
+            self.ids[row],
+            self.dictionaries["brand"][row],
+            self.item_names[row],
+            self.dictionaries["color"][row],
+            self.members["garment_type"][self.codes["garment_type"][row]].value,
+            self.members["garment_category"][self.codes["garment_category"][row]].value,
+            self.dictionaries["fabric"][row],
+            self.dictionaries["size"][row],
+            None if price != price else round(price, 2),
+            self.members["season"][self.codes["season"][row]].value,
+            self.members["style"][self.codes["style"][row]].value,
+            self.dictionaries["care_instructions"][row],
+        )
+
+    def filter(self, limit: int = None, **filters) -> List[WardrobeItem]:
+        """Rows matching every filter, up to `limit`."""
+        return [self.item(row) for row in self.rows(self.mask(**filters), limit)]
+
+    def nbytes(self) -> int:
+        """Approximate memory used by the column data and bitmaps."""
+        total = self.ids.itemsize * len(self.ids) + self.prices.itemsize * len(self.prices)
+        total += self.item_names.nbytes()
+        total += sum(column.nbytes() for column in self.dictionaries.values())
+        total += sum(len(codes) for codes in self.codes.values())
+        total += sum((bitmap.bit_length() + 7) // 8 for bitmaps in self.bitmaps.values() for bitmap in bitmaps)
+        return total
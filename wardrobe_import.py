@@ -0,0 +1,313 @@
+"""
+Wardrobe Bulk Import
+Streams CSV or NDJSON wardrobe items into the wardrobe table through COPY,
+validating each row against the Postgres ENUMs with per-row error reporting.
+"""
+
+import argparse
+import asyncio
+import codecs
+import csv
+import json
+import os
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+from admission import get_admission_controller
+import db
+from schemas import GarmentCategory, GarmentType, Season, Style
+from tenancy import current_tenant
+
+COLUMNS = (
+    "id", "brand", "item_name", "color", "garment_type", "garment_category", "fabric",
+    "size", "price", "purchase_date", "season", "style", "care_instructions", "user_id"
+)
+REQUIRED = ("brand", "item_name", "color", "garment_type", "garment_category", "season", "style")
+# VARCHAR limits from init.sql
+MAX_LENGTHS = {"brand": 100, "item_name": 255, "color": 100, "fabric": 255, "size": 50}
+ENUMS = {"garment_type": GarmentType, "garment_category": GarmentCategory, "season": Season, "style": Style}
+# price is DECIMAL(10,2)
+MAX_PRICE = Decimal(10) ** 8
+CENT = Decimal("0.01")
+
+DEFAULT_BATCH_SIZE = int(os.getenv('WARDROBE_IMPORT_BATCH_SIZE', 1000))
+# Only the first errors are kept so a bad upload cannot exhaust memory
+MAX_REPORTED_ERRORS = int(os.getenv('WARDROBE_IMPORT_MAX_ERRORS', 100))
+# Longer lines are rejected without being buffered, so one huge row cannot exhaust memory
+MAX_LINE_LENGTH = int(os.getenv('WARDROBE_IMPORT_MAX_LINE_LENGTH', 64 * 1024))
+
+class RowError(Exception):
+    """Raised when an input row does not match the wardrobe schema."""
+
+class ImportReport:
+    """Outcome of an import: counts plus the first errors by line number."""
+
+    __slots__ = ("rows", "inserted", "rejected", "errors", "max_errors")
+
+    def __init__(self, max_errors: int = MAX_REPORTED_ERRORS):
+        self.rows = 0
+        self.inserted = 0
+        self.rejected = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.max_errors = max_errors
+
+    def add_error(self, line: int, error: str):
+        """Record a rejected row."""
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "error": error})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "errors_truncated": self.rejected > len(self.errors)
+        }
+
+# Callbacks notified with each batch of inserted rows (dicts keyed by COLUMNS)
+_import_listeners: List[Callable[[List[Dict[str, Any]]], None]] = []
+
+def add_import_listener(callback: Callable[[List[Dict[str, Any]]], None]):
+    """Register a callback that receives each committed batch of wardrobe rows.
+
+    In-memory wardrobe caches subscribe here to apply imports incrementally.
+    """
+    _import_listeners.append(callback)
+
+def _text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+def validate_row(raw: Dict[str, Any], user_id: str) -> Tuple:
+    """Validate an input row and convert it to a COPY record (without id).
+
+    Args:
+        raw: Row as parsed from the input
+        user_id: Owner of the imported items
+
+    Raises:
+        RowError: If a field is missing, too long, not a valid ENUM value or
+            a price DECIMAL(10,2) cannot hold
+    """
+    if _text(raw.get("user_id")) not in (None, user_id):
+        raise RowError("user_id does not match the importing user")
+    row = {name: _text(raw.get(name)) for name in COLUMNS[1:-1]}
+    row["user_id"] = user_id
+    for name in REQUIRED:
+        if row[name] is None:
+            raise RowError(f"missing {name}")
+    for name, limit in MAX_LENGTHS.items():
+        if row[name] is not None and len(row[name]) > limit:
+            raise RowError(f"{name} longer than {limit} characters")
+    for name, enum in ENUMS.items():
+        try:
+            row[name] = enum(row[name]).value
+        except ValueError:
+            raise RowError(f"invalid {name} {row[name]!r}")
+    if row["price"] is not None:
+        try:
+            price = Decimal(row["price"].lstrip("$"))
+        except InvalidOperation:
+            raise RowError(f"invalid price {row['price']!r}")
+        # COPY would reject the whole batch otherwise
+        if not price.is_finite():
+            raise RowError(f"invalid price {row['price']!r}")
+        if abs(price) >= MAX_PRICE:
+            raise RowError(f"price {row['price']!r} out of range")
+        if price != price.quantize(CENT):
+            raise RowError(f"price {row['price']!r} has more than 2 decimal places")
+        row["price"] = price
+    if row["purchase_date"] is not None:
+        try:
+            row["purchase_date"] = date.fromisoformat(row["purchase_date"])
+        except ValueError:
+            raise RowError(f"invalid purchase_date {row['purchase_date']!r}, expected YYYY-MM-DD")
+    return tuple(row[name] for name in COLUMNS[1:])
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_length: int = None) -> AsyncIterator[Any]:
+    """Split a stream of byte chunks into text lines without buffering the whole body.
+
+    A line longer than max_length characters is yielded as a RowError in its
+    place, and at most max_length characters of it are ever held.
+    """
+    max_length = max_length or MAX_LINE_LENGTH
+    # Multibyte characters may be split across chunks
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending, oversized = "", False
+    async for chunk in chunks:
+        pending += decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            if oversized or len(line) > max_length:
+                oversized = False
+                yield RowError(f"line longer than {max_length} characters")
+            else:
+                yield line + "\n"
+        if len(pending) > max_length:
+            pending, oversized = "", True
+    pending += decoder.decode(b"", final=True)
+    if oversized or len(pending) > max_length:
+        yield RowError(f"line longer than {max_length} characters")
+    elif pending:
+        yield pending
+
+async def parse_ndjson(lines: AsyncIterator[Any]) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield (line number, row dict or RowError) for NDJSON input."""
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if isinstance(line, RowError):
+            yield line_no, line
+            continue
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_no, RowError(f"invalid JSON: {e}")
+            continue
+        yield line_no, row if isinstance(row, dict) else RowError("expected a JSON object")
+
+async def parse_csv(lines: AsyncIterator[Any]) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield (line number, row dict or RowError) for CSV input with a header row."""
+    header = None
+    line_no = 0
+    record, start = "", 0
+    # Inside the quoted field of a rejected record, whose remaining lines are skipped
+    skipping = False
+    async for line in lines:
+        line_no += 1
+        if isinstance(line, RowError):
+            record, skipping = "", False
+            yield line_no, line
+            continue
+        if skipping:
+            skipping = line.count('"') % 2 == 0
+            continue
+        if not record:
+            start = line_no
+        if len(record) + len(line) > MAX_LINE_LENGTH:
+            skipping = (record + line).count('"') % 2 == 1
+            record = ""
+            yield start, RowError(f"record longer than {MAX_LINE_LENGTH} characters")
+            continue
+        record += line
+        # A quoted field may contain newlines; wait for its closing quote
+        if record.count('"') % 2:
+            continue
+        text, record = record, ""
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip().lower() for name in values]
+            continue
+        if len(values) != len(header):
+            yield start, RowError(f"expected {len(header)} fields, got {len(values)}")
+            continue
+        yield start, dict(zip(header, values))
+    if record.strip():
+        yield start, RowError("unterminated quoted field")
+
+async def _copy_batch(batch: List[Tuple], report: ImportReport, lines: List[int]):
+    """Load one batch through COPY and notify the import listeners."""
+    pool = await db.get_db_pool()
+    try:
+        async with get_admission_controller().slot("db"):
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    # Allocate ids up front so listeners get complete rows without RETURNING
+                    ids = await conn.fetch(
+                        "SELECT nextval('wardrobe_id_seq') AS id FROM generate_series(1, $1)", len(batch)
+                    )
+                    records = [(row["id"],) + values for row, values in zip(ids, batch)]
+                    await conn.copy_records_to_table("wardrobe", records=records, columns=COLUMNS)
+    except Exception as e:
+        for line in lines:
+            report.add_error(line, f"batch rejected by database: {e}")
+        return
+    report.inserted += len(records)
+    inserted = [dict(zip(COLUMNS, record)) for record in records]
+    for listener in _import_listeners:
+        try:
+            listener(inserted)
+        except Exception as e:
+            print(f"Wardrobe import listener failed: {e}")
+
+async def import_rows(rows: AsyncIterator[Tuple[int, Any]], batch_size: int = None,
+                      dry_run: bool = False, user_id: str = None) -> ImportReport:
+    """Validate parsed rows and load them in COPY batches.
+
+    Args:
+        rows: (line number, row dict or RowError) pairs from a parser
+        batch_size: Rows per COPY
+        dry_run: Validate only, without writing
+        user_id: Owner of the imported items (defaults to the current tenant)
+
+    Returns:
+        ImportReport: Counts and per-row errors
+    """
+    batch_size = batch_size or DEFAULT_BATCH_SIZE
+    user_id = user_id or current_tenant.get()
+    report = ImportReport()
+    batch: List[Tuple] = []
+    lines: List[int] = []
+    async for line, row in rows:
+        report.rows += 1
+        try:
+            if isinstance(row, RowError):
+                raise row
+            batch.append(validate_row(row, user_id))
+            lines.append(line)
+        except RowError as e:
+            report.add_error(line, str(e))
+            continue
+        if len(batch) >= batch_size:
+            if dry_run:
+                report.inserted += len(batch)
+            else:
+                await _copy_batch(batch, report, lines)
+            batch, lines = [], []
+    if batch:
+        if dry_run:
+            report.inserted += len(batch)
+        else:
+            await _copy_batch(batch, report, lines)
+    return report
+
+async def import_stream(chunks: AsyncIterator[bytes], fmt: str = "csv", batch_size: int = None,
+                        dry_run: bool = False, user_id: str = None) -> ImportReport:
+    """Import a CSV or NDJSON byte stream into the wardrobe table."""
+    parser = parse_ndjson if fmt.lower() in ("ndjson", "jsonl") else parse_csv
+    return await import_rows(parser(iter_lines(chunks)), batch_size, dry_run, user_id)
+
+async def _file_chunks(path: str, size: int = 64 * 1024) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while chunk := f.read(size):
+            yield chunk
+
+async def main(argv: Iterable[str] = None):
+    parser = argparse.ArgumentParser(description="Bulk import wardrobe items from CSV or NDJSON")
+    parser.add_argument("path", help="CSV (with header) or NDJSON file")
+    parser.add_argument("--format", choices=("csv", "ndjson"),
+                        help="Input format (default: from the file extension)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Rows per COPY")
+    parser.add_argument("--dry-run", action="store_true", help="Validate without writing")
+    parser.add_argument("--user-id", help="Owner of the imported items (default: DEFAULT_TENANT)")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    try:
+        report = await import_stream(_file_chunks(args.path), fmt, args.batch_size, args.dry_run, args.user_id)
+    finally:
+        await db.close_db_pool()
+    print(json.dumps(report.to_dict(), indent=2))
+    return 1 if report.rejected else 0
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
@@ -0,0 +1,236 @@
+"""
+Weather Shards
+Routes weather lookups across weather agent replicas by consistent hashing on
+the canonical city. Each city has one owning replica, so a replica's query
+cache only holds its own shard instead of every city. Replicas that fail
+their health check leave the ring and rejoin once healthy; only the cities
+they owned move, and those are re-warmed on their new owner. A call whose
+owner is down or fails falls back to the next replica on the ring.
+"""
+
+import asyncio
+import bisect
+import hashlib
+import os
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+import aiohttp
+from google.adk.agents.base_agent import BaseAgent
+
+from city_resolver import normalize
+from resilience import CircuitBreaker
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.sha1(key.encode("utf-8")).digest()[:8], "big")
+
+def replica_urls(default_url: str = None) -> List[str]:
+    """Weather agent replicas from WEATHER_AGENT_URLS (comma-separated), else WEATHER_AGENT_URL."""
+    urls = [url.strip().rstrip("/") for url in os.getenv('WEATHER_AGENT_URLS', '').split(",") if url.strip()]
+    return urls or [(default_url or os.getenv('WEATHER_AGENT_URL', 'http://localhost:8001')).rstrip("/")]
+
+class HashRing:
+    """Consistent-hash ring with virtual nodes.
+
+    Adding or removing a node only moves the keys that node gains or owned.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = None):
+        """Initialize the ring.
+
+        Args:
+            nodes: Initial nodes
+            vnodes: Points per node; more points spread keys more evenly
+        """
+        self.vnodes = vnodes or int(os.getenv('WEATHER_RING_VNODES', 160))
+        self.nodes: set = set()
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: str):
+        """Add a node to the ring."""
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        for i in range(self.vnodes):
+            point = _hash(f"{node}#{i}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node: str):
+        """Remove a node from the ring."""
+        if node not in self.nodes:
+            return
+        self.nodes.discard(node)
+        kept = [(point, owner) for point, owner in zip(self._points, self._owners) if owner != node]
+        self._points = [point for point, _ in kept]
+        self._owners = [owner for _, owner in kept]
+
+    def preference(self, key: str) -> List[str]:
+        """Nodes in ring order from the owner of a key: the owner first, then its fallbacks."""
+        if not self._points:
+            return []
+        start = bisect.bisect(self._points, _hash(key))
+        found = []
+        for i in range(len(self._points)):
+            node = self._owners[(start + i) % len(self._points)]
+            if node not in found:
+                found.append(node)
+                if len(found) == len(self.nodes):
+                    break
+        return found
+
+    def owner(self, key: str) -> Optional[str]:
+        """Node owning a key, or None if the ring is empty."""
+        if not self._points:
+            return None
+        return self._owners[bisect.bisect(self._points, _hash(key)) % len(self._points)]
+
+class Replica:
+    """One weather agent replica with its own agent client and circuit breaker."""
+
+    def __init__(self, url: str, agent: BaseAgent, breaker: CircuitBreaker):
+        self.url = url
+        self.agent = agent
+        self.breaker = breaker
+        self.healthy = True
+        self.stats = Counter()
+
+class WeatherShardRouter:
+    """Routes cities to weather agent replicas and tracks replica membership.
+
+    Every configured replica starts in the ring. A background task checks each
+    replica's /health and removes replicas that fail it, adding them back once
+    they pass. When the ring changes, the known cities that moved are handed
+    to `on_rebalance` so they can be warmed on their new owner.
+    """
+
+    def __init__(self, urls: Iterable[str], build_agent: Callable[[str, CircuitBreaker], BaseAgent],
+                 cities: Callable[[], Iterable[str]] = None, health_interval: float = None, vnodes: int = None):
+        """Initialize the router.
+
+        Args:
+            urls: Replica base URLs
+            build_agent: Creates the agent client of a replica from its URL and breaker
+            cities: Known canonical cities, for finding the ones a rebalance moves
+            health_interval: Seconds between health checks
+            vnodes: Virtual nodes per replica
+        """
+        self.replicas: Dict[str, Replica] = {}
+        for url in urls:
+            if url not in self.replicas:
+                breaker = CircuitBreaker(f"weather_agent@{url}")
+                self.replicas[url] = Replica(url, build_agent(url, breaker), breaker)
+        self.ring = HashRing(self.replicas, vnodes)
+        self.cities = cities or (lambda: ())
+        self.health_interval = health_interval or float(os.getenv('WEATHER_RING_HEALTH_INTERVAL', 10))
+        self.warm_limit = int(os.getenv('WEATHER_SHARD_WARM_LIMIT', 20))
+        self.on_rebalance: Optional[Callable[[List[str]], Awaitable[Any]]] = None
+        self.rebalances = 0
+        self.moved = 0
+        self._task: Optional[asyncio.Task] = None
+        self._warming: Optional[asyncio.Task] = None
+
+    @property
+    def primary(self) -> Replica:
+        """The first configured replica."""
+        return next(iter(self.replicas.values()))
+
+    def route(self, city: str) -> List[Replica]:
+        """Replicas to try for a city, in order.
+
+        The ring owner comes first and the rest of the ring follows.
+        Replicas whose circuit is open, or that are out of the ring, come
+        last so a call can still fall back to any replica.
+        """
+        order = [self.replicas[url] for url in self.ring.preference(normalize(city))]
+        order += [replica for replica in self.replicas.values() if replica.url not in self.ring.nodes]
+        return sorted(order, key=lambda replica: not replica.breaker.is_available())
+
+    def owner(self, city: str) -> Optional[Replica]:
+        """Ring owner of a city."""
+        url = self.ring.owner(normalize(city))
+        return self.replicas[url] if url is not None else None
+
+    def record(self, city: str, replica: Replica):
+        """Count a call answered by a replica, and whether it was the city's owner."""
+        replica.stats["calls"] += 1
+        replica.stats["owned" if replica is self.owner(city) else "fallback"] += 1
+
+    async def _check(self, session: aiohttp.ClientSession, replica: Replica) -> bool:
+        try:
+            async with session.get(f"{replica.url}/health", timeout=aiohttp.ClientTimeout(total=5)) as response:
+                # Replicas answer 503 while their models warm up; they join once ready
+                return response.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return False
+
+    async def check_health(self):
+        """Check every replica and rebalance the ring if membership changed."""
+        async with aiohttp.ClientSession() as session:
+            results = await asyncio.gather(*(self._check(session, replica) for replica in self.replicas.values()))
+        before = {city: self.ring.owner(normalize(city)) for city in self.cities()}
+        changed = False
+        for replica, healthy in zip(self.replicas.values(), results):
+            replica.healthy = healthy
+            if healthy and replica.url not in self.ring.nodes:
+                print(f"Weather replica {replica.url} joined the ring")
+                self.ring.add(replica.url)
+                changed = True
+            elif not healthy and replica.url in self.ring.nodes:
+                print(f"Weather replica {replica.url} left the ring")
+                self.ring.remove(replica.url)
+                changed = True
+        if not changed:
+            return
+        self.rebalances += 1
+        moved = [city for city, owner in before.items() if self.ring.owner(normalize(city)) not in (owner, None)]
+        self.moved += len(moved)
+        print(f"Weather ring rebalanced: {len(self.ring.nodes)} replicas, {len(moved)} cities moved")
+        if moved and self.on_rebalance is not None and self.warm_limit > 0:
+            # A newer rebalance supersedes warming for an older one
+            if self._warming is not None:
+                self._warming.cancel()
+            self._warming = asyncio.create_task(self.on_rebalance(moved[:self.warm_limit]))
+
+    async def run(self):
+        """Check replica health forever."""
+        while True:
+            try:
+                await self.check_health()
+            except Exception as e:
+                print(f"Weather ring health check error: {e}")
+            await asyncio.sleep(self.health_interval)
+
+    def start(self):
+        """Start health checks as a background task; a single replica needs none."""
+        if self._task is None and len(self.replicas) > 1:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Stop health checks and any warming in progress."""
+        for task in (self._task, self._warming):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._warming = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Ring membership, per-replica calls and circuit state, and rebalances."""
+        return {
+            "ring": sorted(self.ring.nodes),
+            "rebalances": self.rebalances,
+            "cities_moved": self.moved,
+            "replicas": {
+                url: {"healthy": replica.healthy, "in_ring": url in self.ring.nodes,
+                      "circuit": replica.breaker.snapshot(), **dict(replica.stats)}
+                for url, replica in self.replicas.items()
+            }
+        }
@@ -0,0 +1,241 @@
+"""
+Workflow Graph
+Declarative DAG of agents, tools and functions that exchange named state keys.
+Independent nodes run concurrently and every run records per-node timings.
+"""
+
+import asyncio
+import inspect
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+class WorkflowError(Exception):
+    """Raised when a workflow is invalid or one of its nodes fails."""
+
+    def __init__(self, message: str, node: str = None):
+        super().__init__(message)
+        self.node = node
+
+class Node:
+    """A workflow step.
+
+    The node runs once all of its `inputs` are in the state, receives them as
+    keyword arguments and stores its return value under `output`.
+    """
+
+    KINDS = ("agent", "tool", "function")
+
+    def __init__(self, name: str, fn: Callable[..., Any], inputs: Iterable[str] = (),
+                 output: str = None, kind: str = "function", timeout: float = None):
+        """Initialize the node.
+
+        Args:
+            name: Unique node name
+            fn: Sync or async callable taking the input keys as keyword arguments
+            inputs: State keys the node consumes
+            output: State key the result is stored under (defaults to the node name)
+            kind: "agent", "tool" or "function", for reporting
+            timeout: Seconds before the node fails
+        """
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown node kind {kind!r}")
+        self.name = name
+        self.fn = fn
+        self.inputs = tuple(inputs)
+        self.output = output or name
+        self.kind = kind
+        self.timeout = timeout
+
+    async def run(self, state: Dict[str, Any]) -> Any:
+        result = self.fn(**{key: state[key] for key in self.inputs})
+        if inspect.isawaitable(result):
+            result = await (asyncio.wait_for(result, self.timeout) if self.timeout else result)
+        return result
+
+def agent_node(name: str, fn: Callable[..., Awaitable[Any]], inputs: Iterable[str], output: str = None,
+               timeout: float = None) -> Node:
+    """A node that calls a sub-agent."""
+    return Node(name, fn, inputs, output, kind="agent", timeout=timeout)
+
+def tool_node(name: str, fn: Callable[..., Any], inputs: Iterable[str], output: str = None,
+              timeout: float = None) -> Node:
+    """A node that calls a tool."""
+    return Node(name, fn, inputs, output, kind="tool", timeout=timeout)
+
+def function_node(name: str, fn: Callable[..., Any], inputs: Iterable[str], output: str = None) -> Node:
+    """A node that runs a pure function."""
+    return Node(name, fn, inputs, output, kind="function")
+
+class WorkflowRun:
+    """State and per-node timings of one execution."""
+
+    __slots__ = ("workflow", "state", "timings", "started_at", "duration")
+
+    def __init__(self, workflow: str, state: Dict[str, Any]):
+        self.workflow = workflow
+        self.state = state
+        self.timings: Dict[str, Dict[str, Any]] = {}
+        self.started_at = time.monotonic()
+        self.duration = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"workflow": self.workflow, "duration": self.duration, "nodes": self.timings}
+
+class Workflow:
+    """A validated DAG of nodes.
+
+    Edges are implied by state keys: a node depends on the node whose output
+    it consumes. Keys that no node produces must be supplied as initial state.
+    """
+
+    def __init__(self, name: str, nodes: List[Node], history: int = 1000):
+        """Initialize and validate the workflow.
+
+        Args:
+            name: Workflow name
+            nodes: Nodes of the graph
+            history: Runs kept per node for latency percentiles
+
+        Raises:
+            WorkflowError: On duplicate names or outputs, or a cycle
+        """
+        self.name = name
+        self.nodes = {node.name: node for node in nodes}
+        if len(self.nodes) != len(nodes):
+            raise WorkflowError(f"Duplicate node names in workflow {name}")
+        self.producers: Dict[str, str] = {}
+        for node in nodes:
+            if node.output in self.producers:
+                raise WorkflowError(f"State key {node.output!r} is produced by more than one node")
+            self.producers[node.output] = node.name
+        self.dependencies = {
+            node.name: {self.producers[key] for key in node.inputs if key in self.producers}
+            for node in nodes
+        }
+        self.initial_keys = {key for node in nodes for key in node.inputs if key not in self.producers}
+        self.order = self._topological_order()
+        self.latencies = {node.name: deque(maxlen=history) for node in nodes}
+        self.runs = 0
+        self.failures = 0
+
+    def _topological_order(self) -> List[str]:
+        remaining = {name: set(deps) for name, deps in self.dependencies.items()}
+        order = []
+        while remaining:
+            ready = sorted(name for name, deps in remaining.items() if not deps)
+            if not ready:
+                raise WorkflowError(f"Workflow {self.name} has a cycle among {sorted(remaining)}")
+            for name in ready:
+                del remaining[name]
+                order.append(name)
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        return order
+
+    async def run(self, **initial: Any) -> WorkflowRun:
+        """Execute the graph, starting each node as soon as its inputs are ready.
+
+        Args:
+            **initial: Initial state; must include every key no node produces
+
+        Returns:
+            WorkflowRun: Final state and per-node timings
+
+        Raises:
+            WorkflowError: If initial state is missing or a node fails
+        """
+        missing = self.initial_keys - initial.keys()
+        if missing:
+            raise WorkflowError(f"Workflow {self.name} needs initial state {sorted(missing)}")
+        run = WorkflowRun(self.name, dict(initial))
+        self.runs += 1
+        pending = {name: set(deps) for name, deps in self.dependencies.items()}
+        running: Dict[asyncio.Task, str] = {}
+
+        def start_ready():
+            for name in [name for name, deps in pending.items() if not deps]:
+                del pending[name]
+                running[asyncio.create_task(self._run_node(self.nodes[name], run))] = name
+
+        try:
+            start_ready()
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = running.pop(task)
+                    task.result()
+                    for deps in pending.values():
+                        deps.discard(name)
+                start_ready()
+        except BaseException:
+            self.failures += 1
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+            raise
+        finally:
+            run.duration = time.monotonic() - run.started_at
+        return run
+
+    async def _run_node(self, node: Node, run: WorkflowRun):
+        start = time.monotonic()
+        timing = run.timings[node.name] = {"kind": node.kind, "start": start - run.started_at}
+        try:
+            run.state[node.output] = await node.run(run.state)
+            timing["status"] = "ok"
+        except asyncio.CancelledError:
+            timing["status"] = "cancelled"
+            raise
+        except Exception as e:
+            timing["status"] = "error"
+            timing["error"] = str(e)
+            if isinstance(e, WorkflowError):
+                raise
+            raise WorkflowError(f"Node {node.name} failed: {e}", node.name) from e
+        finally:
+            timing["duration"] = time.monotonic() - start
+            # Failed and cancelled runs would skew the percentiles of the node's real work
+            if timing.get("status") == "ok":
+                self.latencies[node.name].append(timing["duration"])
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Graph shape and per-node latency percentiles of successful runs."""
+        nodes = {}
+        for name in self.order:
+            ordered = sorted(self.latencies[name])
+            nodes[name] = {
+                "kind": self.nodes[name].kind,
+                "depends_on": sorted(self.dependencies[name]),
+                "latency_p50": ordered[len(ordered) // 2] if ordered else 0.0,
+                "latency_p95": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] if ordered else 0.0
+            }
+        return {"runs": self.runs, "failures": self.failures, "nodes": nodes}
+
+class IntentRouter:
+    """Maps requests to workflows with rules instead of a router LLM."""
+
+    def __init__(self):
+        self.routes: List[Tuple[str, Callable[[str], Optional[Dict[str, Any]]], Workflow]] = []
+
+    def add(self, intent: str, match: Callable[[str], Optional[Dict[str, Any]]], workflow: Workflow):
+        """Register a workflow for an intent.
+
+        Args:
+            intent: Intent name
+            match: Returns the workflow's initial state for a matching request, else None
+            workflow: Workflow to run
+        """
+        self.routes.append((intent, match, workflow))
+
+    def route(self, user_input: str) -> Optional[Tuple[str, Workflow, Dict[str, Any]]]:
+        """Find the first intent matching the request.
+
+        Returns:
+            (intent, workflow, initial state), or None for unknown intents
+        """
+        for intent, match, workflow in self.routes:
+            initial = match(user_input)
+            if initial is not None:
+                return intent, workflow, initial
+        return None